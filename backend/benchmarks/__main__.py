@@ -0,0 +1,56 @@
+"""
+Run the benchmark suite:
+
+    python -m backend.benchmarks [--stages sandbox parser ...] [--iterations N]
+                                 [--baseline baseline.json] [--threshold 0.25] [--save out.json]
+
+Exits with status 1 when a stage regressed against the baseline by more
+than the threshold.
+"""
+import argparse
+import os
+import sys
+
+from backend.benchmarks.runner import DEFAULT_THRESHOLD, STAGES, compare, format_table, load, run_suite, save
+from backend.benchmarks.corpus import CORPUS
+from backend.core.worker_pool import shutdown_pool
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m backend.benchmarks")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--cases", nargs="+", choices=list(CORPUS), default=None)
+    parser.add_argument("--iterations", type=int, default=200,
+                        help="iterations for in-process stages; sandbox and repair run fewer")
+    parser.add_argument("--baseline", help="JSON baseline to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown as a fraction (default: %(default)s)")
+    parser.add_argument("--save", help="write the results to this JSON file (e.g. a new baseline)")
+    args = parser.parse_args(argv)
+
+    try:
+        current = run_suite(args.stages, args.iterations, args.cases)
+    finally:
+        shutdown_pool()
+    print(format_table(current))
+
+    if args.save:
+        save(current, args.save)
+        print(f"\nResults saved to {args.save}")
+
+    if args.baseline:
+        if not os.path.exists(args.baseline):
+            print(f"\nNo baseline at {args.baseline}; nothing to compare.")
+            return 0
+        regressions = compare(current, load(args.baseline), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for message in regressions:
+                print(f"  {message}")
+            return 1
+        print(f"\nNo regressions beyond {args.threshold:.0%}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+from typing import Dict, NamedTuple
+
+from backend.core.limitations import MAX_CODE_LENGTH
+
+
+class Case(NamedTuple):
+    code: str
+    error_type: str  # what the program raises; "" if it runs cleanly
+
+
+def large_program(size: int = MAX_CODE_LENGTH - 200) -> str:
+    """A valid program close to MAX_CODE_LENGTH that fails with a NameError on its last line."""
+    blocks = []
+    i = 0
+    while sum(len(block) for block in blocks) < size:
+        blocks.append(
+            f"def helper_{i}(values):\n"
+            f"    total = 0\n"
+            f"    for value in values:\n"
+            f"        total += value * {i % 7 + 1}\n"
+            f"    return total\n\n"
+        )
+        i += 1
+    blocks.append(f"print(helper_0([1, 2, 3]) + helper_{i - 1}(range(10)))\nprint(totl)\n")
+    return "".join(blocks)
+
+
+# One program per error type generate_patch handles, plus a clean run (pure
+# sandbox overhead), a large input near the size limit and a program with
+# several errors at once.
+CORPUS: Dict[str, Case] = {
+    "clean": Case("print('ok')", ""),
+    "name_error": Case(
+        "def total(items):\n"
+        "    result = 0\n"
+        "    for item in items:\n"
+        "        result += item\n"
+        "    return result\n"
+        "\n"
+        "values = [1, 2, 3]\n"
+        "print(totl(values))\n",
+        "NameError",
+    ),
+    "zero_division": Case(
+        "def average(values):\n"
+        "    count = len(values)\n"
+        "    return sum(values) / count\n"
+        "\n"
+        "print(average([]))\n",
+        "ZeroDivisionError",
+    ),
+    "recursion": Case(
+        "def countdown(n):\n"
+        "    return countdown(n - 1)\n"
+        "\n"
+        "print(countdown(5))\n",
+        "RecursionError",
+    ),
+    "index_error": Case(
+        "def pick(items, i):\n"
+        "    return items[i]\n"
+        "\n"
+        "print(pick([1, 2, 3], 5))\n",
+        "IndexError",
+    ),
+    "type_error": Case('count = 42\nprint("Total: " + 42)\n', "TypeError"),
+    "large": Case(large_program(), "NameError"),
+    # Several independent errors: one sandbox round-trip each without the static pass
+    "multi_error": Case(
+        "def report(values):\n"
+        "    print(\"Items: \" + 3)\n"
+        "    return sum(values) / 0\n"
+        "\n"
+        "print(report([width, height, depth]))\n"
+        "print(scale)\n",
+        "NameError",
+    ),
+}
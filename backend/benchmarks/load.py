@@ -0,0 +1,231 @@
+"""
+Load generator: replays a JSONL corpus of requests against the app, either
+in-process through httpx's ASGI transport or against a running server.
+
+    python -m backend.benchmarks.load [--corpus requests.jsonl] [--url http://127.0.0.1:8000]
+                                      [--concurrency 50] [--rate 0] [--requests 500]
+                                      [--sample-interval 1.0] [--json report.json]
+
+Each corpus line is ``{"path": "/repair", "json": {...}}`` (``method``
+defaults to POST). Without ``--corpus`` the benchmark corpus is turned into
+/run, /patch and /repair requests. With ``--rate`` requests arrive as a
+Poisson process at that many per second (open loop, bounded by
+``--concurrency``); without it ``--concurrency`` users send back to back.
+
+Sandbox CPU saturation is sampled from ``/metrics`` while the load runs:
+sandbox CPU seconds per wall second divided by the core count. The counter
+only moves when a run finishes, so short intervals look bursty.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from backend.benchmarks.corpus import CORPUS
+from backend.benchmarks.runner import percentile
+from backend.core.sandbox import execute_code
+
+CPU_METRIC = "recodex_sandbox_cpu_seconds_total"
+
+
+def default_corpus() -> List[dict]:
+    entries = []
+    for case in CORPUS.values():
+        entries.append({"path": "/run", "json": {"code": case.code, "use_cache": False}})
+        if case.error_type:
+            result = execute_code(case.code)
+            entries.append({"path": "/patch", "json": {
+                "code": case.code, "error": result.error or "", "stack_trace": result.stack_trace or "",
+            }})
+            entries.append({"path": "/repair", "json": {"code": case.code}})
+    return entries
+
+
+def load_corpus(path: str) -> List[dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def sandbox_cpu_seconds(metrics_text: str) -> float:
+    total = 0.0
+    for line in metrics_text.splitlines():
+        if line.startswith(CPU_METRIC):
+            total += float(line.rsplit(" ", 1)[1])
+    return total
+
+
+class LoadReport:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.statuses: Dict[str, Dict[str, int]] = {}
+        self.saturation: List[dict] = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def record(self, path: str, status: str, latency: float) -> None:
+        self.latencies.setdefault(path, []).append(latency)
+        counts = self.statuses.setdefault(path, {})
+        counts[status] = counts.get(status, 0) + 1
+
+    def summary(self) -> dict:
+        endpoints = {}
+        for path in sorted(self.latencies):
+            endpoints[path] = self._stats(self.latencies[path], self.statuses[path])
+        all_latencies = [latency for values in self.latencies.values() for latency in values]
+        all_statuses: Dict[str, int] = {}
+        for counts in self.statuses.values():
+            for status, count in counts.items():
+                all_statuses[status] = all_statuses.get(status, 0) + count
+        return {
+            "elapsed": self.elapsed,
+            "overall": self._stats(all_latencies, all_statuses),
+            "endpoints": endpoints,
+            "sandbox_cpu_saturation": self.saturation,
+        }
+
+    def _stats(self, latencies: List[float], statuses: Dict[str, int]) -> dict:
+        count = len(latencies)
+        rejected = statuses.get("429", 0)
+        errors = sum(n for status, n in statuses.items() if status != "429" and not status.startswith("2"))
+        return {
+            "requests": count,
+            "p50_ms": percentile(latencies, 50) * 1000 if latencies else 0.0,
+            "p95_ms": percentile(latencies, 95) * 1000 if latencies else 0.0,
+            "p99_ms": percentile(latencies, 99) * 1000 if latencies else 0.0,
+            "throughput": count / self.elapsed if self.elapsed else 0.0,
+            "error_rate": errors / count if count else 0.0,
+            "rejected_rate": rejected / count if count else 0.0,
+            "statuses": statuses,
+        }
+
+
+async def send(client: httpx.AsyncClient, entry: dict, report: LoadReport) -> None:
+    start = time.perf_counter()
+    try:
+        response = await client.request(entry.get("method", "POST"), entry["path"], json=entry.get("json"))
+        status = str(response.status_code)
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    report.record(entry["path"], status, time.perf_counter() - start)
+
+
+async def sample_saturation(client: httpx.AsyncClient, report: LoadReport, interval: float,
+                            stop: asyncio.Event) -> None:
+    cores = os.cpu_count() or 1
+    previous = None
+    while not stop.is_set():
+        try:
+            now = time.perf_counter()
+            cpu = sandbox_cpu_seconds((await client.get("/metrics")).text)
+        except httpx.HTTPError:
+            cpu = None
+        if cpu is not None:
+            if previous is not None:
+                wall = now - previous[0]
+                report.saturation.append({
+                    "t": round(now - report.started, 3),
+                    "saturation": (cpu - previous[1]) / (wall * cores) if wall > 0 else 0.0,
+                })
+            previous = (now, cpu)
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_load(client: httpx.AsyncClient, corpus: List[dict], total: int, concurrency: int,
+                   rate: float = 0.0, sample_interval: float = 1.0, seed: Optional[int] = None) -> LoadReport:
+    report = LoadReport()
+    rng = random.Random(seed)
+    slots = asyncio.Semaphore(max(1, concurrency))
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_saturation(client, report, sample_interval, stop))
+
+    async def one(entry: dict) -> None:
+        try:
+            await send(client, entry, report)
+        finally:
+            slots.release()
+
+    tasks = []
+    next_arrival = time.perf_counter()
+    for i in range(total):
+        if rate > 0:
+            next_arrival += rng.expovariate(rate)
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        await slots.acquire()
+        tasks.append(asyncio.create_task(one(corpus[i % len(corpus)])))
+    await asyncio.gather(*tasks)
+
+    report.elapsed = time.perf_counter() - report.started
+    stop.set()
+    await sampler
+    return report
+
+
+def format_report(summary: dict) -> str:
+    lines = [
+        f"{'endpoint':<16} {'requests':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+        f"{'req/s':>8} {'errors':>7} {'429s':>7}"
+    ]
+    rows = list(summary["endpoints"].items()) + [("overall", summary["overall"])]
+    for name, stats in rows:
+        lines.append(
+            f"{name:<16} {stats['requests']:>8} {stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} "
+            f"{stats['p99_ms']:>9.1f} {stats['throughput']:>8.1f} {stats['error_rate']:>7.1%} "
+            f"{stats['rejected_rate']:>7.1%}"
+        )
+    if summary["sandbox_cpu_saturation"]:
+        lines.append("\nsandbox CPU saturation:")
+        for sample in summary["sandbox_cpu_saturation"]:
+            lines.append(f"  t={sample['t']:>7.1f}s  {sample['saturation']:>6.1%}")
+    return "\n".join(lines)
+
+
+def make_client(url: Optional[str]) -> httpx.AsyncClient:
+    if url:
+        return httpx.AsyncClient(base_url=url, timeout=60)
+    from backend.main import app
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://recodex", timeout=60)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m backend.benchmarks.load")
+    parser.add_argument("--corpus", help="JSONL file of {path, json[, method]} requests")
+    parser.add_argument("--url", help="server to load (default: the app in-process)")
+    parser.add_argument("--requests", type=int, default=200, help="total requests to send")
+    parser.add_argument("--concurrency", type=int, default=50, help="maximum requests in flight")
+    parser.add_argument("--rate", type=float, default=0.0, help="Poisson arrival rate in req/s (0: closed loop)")
+    parser.add_argument("--sample-interval", type=float, default=1.0, help="seconds between CPU samples")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.corpus) if args.corpus else default_corpus()
+    if not corpus:
+        print("Empty corpus.")
+        return 1
+
+    async def scenario() -> LoadReport:
+        async with make_client(args.url) as client:
+            return await run_load(client, corpus, args.requests, args.concurrency, args.rate,
+                                  args.sample_interval, args.seed)
+
+    summary = asyncio.run(scenario()).summary()
+    print(format_report(summary))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
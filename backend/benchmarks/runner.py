@@ -0,0 +1,186 @@
+"""
+Micro-benchmarks for the sandbox, parser, validator, patch engine, the
+end-to-end repair loop and response serialization, driven by the corpus in
+``corpus.py``.
+
+Results are ``{stage: {case: stats}}`` dicts where stats hold latency
+percentiles in milliseconds and throughput in operations per second; repair
+stats also hold the number of loop iterations the case needs, serialize stats
+the size of the repair response before and after compaction and compression. They can be
+saved as JSON baselines and compared against later runs.
+"""
+import json
+import platform
+import statistics
+import sys
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from backend.benchmarks.corpus import CORPUS, Case
+from backend.core.parser import parse_error
+from backend.core.result_cache import result_cache
+from backend.core.sandbox import execute_code
+from backend.core.validator import validate_code
+from backend.engine.patch_generator import generate_patch
+from backend.engine.patch_memo import patch_memo
+from backend.engine.repair_loop import repair_code
+from backend.models.repair_response import RepairResponse
+from backend.utils.compression import compress
+from backend.utils.serialization import FastJSONResponse
+
+STAGES = ("sandbox", "parser", "validator", "patch", "repair", "serialize")
+# Slow stages get fewer iterations than the in-process ones
+ITERATION_SCALE = {"sandbox": 0.2, "repair": 0.1}
+DEFAULT_THRESHOLD = 0.25
+# Percentiles compared against the baseline
+GATED_STATS = ("p50", "p90")
+# Slowdowns smaller than this are timer noise, whatever the ratio
+MIN_REGRESSION_MS = 0.05
+
+
+def percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure(func: Callable[[], object], iterations: int, warmup: int = 2) -> Dict[str, float]:
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    total = sum(samples)
+    return {
+        "iterations": iterations,
+        "p50": percentile(samples, 50) * 1000,
+        "p90": percentile(samples, 90) * 1000,
+        "p99": percentile(samples, 99) * 1000,
+        "mean": statistics.mean(samples) * 1000,
+        "throughput": iterations / total if total else 0.0,
+    }
+
+
+def stage_functions(stage: str, case: Case) -> Optional[Callable[[], object]]:
+    """The operation a stage times for one corpus case, or None if it doesn't apply."""
+    if stage == "sandbox":
+        return lambda: execute_code(case.code, use_cache=False)
+    if stage == "validator":
+        return lambda: validate_code(case.code)
+    if not case.error_type:
+        return None
+
+    # Real tracebacks, produced once outside the timed loop
+    trace = execute_code(case.code, use_cache=False).stack_trace
+    if stage == "parser":
+        return lambda: parse_error(trace)
+    if stage == "patch":
+        parsed = parse_error(trace)
+        return lambda: generate_patch(case.code, parsed)
+    if stage == "repair":
+        def repair():
+            # Every repair starts cold, as a new request would
+            result_cache.clear()
+            patch_memo.clear()
+            return repair_code(case.code)
+        return repair
+    if stage == "serialize":
+        response = repair_code(case.code)
+        return lambda: serialize(response)
+    raise ValueError(f"Unknown stage: {stage}")
+
+
+def serialize(response: RepairResponse) -> bytes:
+    """A /repair response body as the app sends it to a client accepting gzip."""
+    return compress(FastJSONResponse(response.model_dump(mode="json")).body, "gzip")
+
+
+def response_sizes(code: str) -> Dict[str, int]:
+    """Bytes of a /repair response: with full snapshots through the stdlib encoder, compact, and compressed."""
+    patch_memo.clear()
+    full = repair_code(code, snapshots=True)
+    compact = repair_code(code)
+    return {
+        "snapshot_bytes": len(json.dumps(full.model_dump(mode="json")).encode()),
+        "bytes": len(FastJSONResponse(compact.model_dump(mode="json")).body),
+        "wire_bytes": len(serialize(compact)),
+    }
+
+
+def run_suite(stages: Iterable[str] = STAGES, iterations: int = 200,
+              cases: Optional[Iterable[str]] = None) -> dict:
+    results = {}
+    for stage in stages:
+        results[stage] = {}
+        count = max(3, int(iterations * ITERATION_SCALE.get(stage, 1.0)))
+        for name in cases or CORPUS:
+            func = stage_functions(stage, CORPUS[name])
+            if func is not None:
+                results[stage][name] = measure(func, count)
+                if stage == "repair":
+                    patch_memo.clear()
+                    results[stage][name]["repair_iterations"] = repair_code(CORPUS[name].code).total_iterations
+                if stage == "serialize":
+                    results[stage][name].update(response_sizes(CORPUS[name].code))
+    return {"environment": environment(), "results": results}
+
+
+def environment() -> dict:
+    return {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD,
+            min_regression_ms: float = MIN_REGRESSION_MS) -> List[str]:
+    """Regressions of more than ``threshold`` (a fraction) against ``baseline``, as messages."""
+    regressions = []
+    for stage, cases in current["results"].items():
+        for name, stats in cases.items():
+            before = baseline.get("results", {}).get(stage, {}).get(name)
+            if before is None:
+                continue
+            for key in GATED_STATS:
+                slower = stats[key] - before[key]
+                if before[key] > 0 and slower > min_regression_ms and stats[key] > before[key] * (1 + threshold):
+                    regressions.append(
+                        f"{stage}/{name} {key}: {stats[key]:.3f}ms vs baseline {before[key]:.3f}ms "
+                        f"(+{(stats[key] / before[key] - 1) * 100:.0f}%)"
+                    )
+    return regressions
+
+
+def format_table(current: dict) -> str:
+    lines = [f"{'stage':<10} {'case':<14} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'ops/s':>9}"]
+    for stage, cases in current["results"].items():
+        for name, stats in cases.items():
+            lines.append(
+                f"{stage:<10} {name:<14} {stats['p50']:>9.3f} {stats['p90']:>9.3f} "
+                f"{stats['p99']:>9.3f} {stats['throughput']:>9.1f}"
+            )
+    counts = [stats["repair_iterations"] for stats in current["results"].get("repair", {}).values()
+              if "repair_iterations" in stats]
+    if counts:
+        average = statistics.mean(counts)
+        lines.append(f"\naverage repair iterations: {average:.2f}")
+    sizes = current["results"].get("serialize", {})
+    if sizes:
+        lines.append("\nrepair response bytes (snapshots -> compact -> gzip):")
+        for name, stats in sizes.items():
+            if "wire_bytes" in stats:
+                lines.append(f"  {name:<14} {stats['snapshot_bytes']:>9} {stats['bytes']:>9} {stats['wire_bytes']:>9}")
+    return "\n".join(lines)
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def save(results: dict, path: str) -> None:
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
@@ -0,0 +1,133 @@
+"""
+Aggregates the traces written by the tracing middleware (``RECODEX_TRACE_PATH``)
+into per-stage latency tables.
+
+    python -m backend.benchmarks.traces [trace.jsonl ...] [--request "POST /repair"]
+                                        [--since 3600] [--json summary.json]
+
+Without paths the configured trace file and its rotated backups are read.
+For every request the time of each stage is summed over its spans (a repair
+has a sandbox span per iteration and candidate), then the percentiles of
+those per-request totals are taken per request name and stage. ``share`` is
+a stage's time as a fraction of the requests' total time; parallel stages
+(speculative candidates, batch items) can add up to more than 100%.
+"""
+import argparse
+import glob
+import json
+import sys
+import time
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from backend.benchmarks.runner import percentile
+from backend.core.limitations import TRACE_PATH
+
+
+def trace_files(paths: List[str]) -> List[str]:
+    if paths:
+        return paths
+    if not TRACE_PATH:
+        return []
+    # Oldest backup first, so traces come out roughly in time order
+    backups = sorted(glob.glob(f"{TRACE_PATH}.[0-9]*"), key=lambda path: -int(path.rsplit(".", 1)[1]))
+    return backups + [TRACE_PATH]
+
+
+def read_traces(paths: Iterable[str]) -> Iterator[dict]:
+    for path in paths:
+        try:
+            with open(path) as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue  # a line cut short by a crash
+        except FileNotFoundError:
+            continue
+
+
+def stage_totals(trace: dict) -> Dict[str, float]:
+    """Seconds per stage in one trace, with the request's own duration as ``total``."""
+    totals: Dict[str, float] = {}
+    for span in trace.get("spans", []):
+        totals[span["name"]] = totals.get(span["name"], 0.0) + span["duration"]
+    totals["total"] = trace.get("duration") or 0.0
+    return totals
+
+
+def summarize(traces: Iterable[dict], request: Optional[str] = None, since: Optional[float] = None) -> dict:
+    """``{request name: {"requests": n, "stages": {stage: stats}}}`` over the matching traces."""
+    samples: Dict[str, Dict[str, List[float]]] = {}
+    counts: Dict[str, int] = {}
+    for trace in traces:
+        name = trace.get("name", "")
+        if request and name != request:
+            continue
+        if since is not None and trace.get("timestamp", 0) < since:
+            continue
+        counts[name] = counts.get(name, 0) + 1
+        stages = samples.setdefault(name, {})
+        for stage, seconds in stage_totals(trace).items():
+            stages.setdefault(stage, []).append(seconds)
+
+    summary = {}
+    for name in sorted(samples):
+        stages = samples[name]
+        total = sum(stages["total"]) or 1e-12
+        summary[name] = {
+            "requests": counts[name],
+            "stages": {
+                stage: {
+                    # Requests in which the stage ran at all
+                    "requests": len(values),
+                    "p50_ms": percentile(values, 50) * 1000,
+                    "p90_ms": percentile(values, 90) * 1000,
+                    "p99_ms": percentile(values, 99) * 1000,
+                    "share": sum(values) / total,
+                }
+                for stage, values in sorted(stages.items(), key=lambda item: -sum(item[1]))
+            },
+        }
+    return summary
+
+
+def format_summary(summary: dict) -> str:
+    lines = []
+    for name, entry in summary.items():
+        lines.append(f"{name} ({entry['requests']} requests)")
+        lines.append(f"  {'stage':<18} {'requests':>8} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'share':>7}")
+        for stage, stats in entry["stages"].items():
+            lines.append(
+                f"  {stage:<18} {stats['requests']:>8} {stats['p50_ms']:>9.2f} {stats['p90_ms']:>9.2f} "
+                f"{stats['p99_ms']:>9.2f} {stats['share']:>7.1%}"
+            )
+        lines.append("")
+    return "\n".join(lines).rstrip()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m backend.benchmarks.traces")
+    parser.add_argument("paths", nargs="*", help="trace files (default: RECODEX_TRACE_PATH and its backups)")
+    parser.add_argument("--request", help='only requests with this name, e.g. "POST /repair"')
+    parser.add_argument("--since", type=float, help="only requests from the last this many seconds")
+    parser.add_argument("--json", help="also write the summary to this file")
+    args = parser.parse_args(argv)
+
+    paths = trace_files(args.paths)
+    if not paths:
+        print("No trace files; set RECODEX_TRACE_PATH or pass paths.")
+        return 1
+    since = time.time() - args.since if args.since else None
+    summary = summarize(read_traces(paths), args.request, since)
+    if not summary:
+        print("No traces found.")
+        return 1
+    print(format_summary(summary))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
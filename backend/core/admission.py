@@ -0,0 +1,145 @@
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Callable, Deque, Optional, Tuple
+
+import anyio
+from starlette.responses import StreamingResponse
+
+from backend.core.limitations import (
+    ADMISSION_MAX_IN_FLIGHT,
+    ADMISSION_MAX_QUEUE,
+    ADMISSION_RETRY_AFTER_SECONDS,
+)
+
+
+class AdmissionRejected(Exception):
+    """Raised when the wait queue is full. Routers turn this into a 429."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Sandbox queue is full, retry later")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Global concurrency limiter for sandbox work.
+
+    At most ``max_in_flight`` slots are held at a time and at most
+    ``max_queue`` callers wait for them; anyone beyond that is rejected
+    immediately instead of piling up. A caller fanning out (a batch) takes
+    several slots at once, all or nothing. Released slots go straight to the
+    oldest waiter once enough are free, so waiters are served in FIFO order.
+    """
+
+    def __init__(self, max_in_flight: int = ADMISSION_MAX_IN_FLIGHT, max_queue: int = ADMISSION_MAX_QUEUE,
+                 retry_after: int = ADMISSION_RETRY_AFTER_SECONDS):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._waiters: Deque[Tuple[asyncio.Future, int]] = deque()
+
+    async def acquire(self, count: int = 1) -> None:
+        """Take ``count`` slots (at most ``max_in_flight``), waiting in line if they aren't free."""
+        count = min(max(1, count), self.max_in_flight)
+        if self.in_flight + count <= self.max_in_flight and not self._waiters:
+            self.in_flight += count
+            self.admitted += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected(self.retry_after)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append((waiter, count))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if (waiter, count) in self._waiters:
+                self._waiters.remove((waiter, count))
+                # Whoever was queued behind us may fit now
+                self._hand_over()
+            elif waiter.done() and not waiter.cancelled():
+                # The slots were handed to us just before we were cancelled.
+                self.release(count)
+            raise
+        self.admitted += 1
+
+    def release(self, count: int = 1) -> None:
+        self.in_flight -= min(max(1, count), self.max_in_flight)
+        self._hand_over()
+
+    def _hand_over(self) -> None:
+        # The oldest waiter goes first, even if a younger one would fit already
+        while self._waiters:
+            waiter, count = self._waiters[0]
+            if self.in_flight + count > self.max_in_flight:
+                break
+            self._waiters.popleft()
+            self.in_flight += count
+            waiter.get_loop().call_soon_threadsafe(self._wake, waiter, count)
+
+    def _wake(self, waiter: asyncio.Future, count: int) -> None:
+        if waiter.cancelled():
+            self.release(count)
+        else:
+            waiter.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, count: int = 1):
+        await self.acquire(count)
+        try:
+            yield
+        finally:
+            self.release(count)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": len(self._waiters),
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "admitted_total": self.admitted,
+            "rejected_total": self.rejected,
+        }
+
+
+admission = AdmissionController()
+
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """
+    A streamed response whose body runs under admission slots taken before
+    the response was returned, so a full queue is still a 429. The body is
+    closed (killing whatever sandbox it still runs) and then the slots are
+    released when the response ends, also if the client went away before the
+    body started, when a ``finally`` in the generator itself never runs.
+    A ``release`` callable replaces the plain release, e.g. to wait for work
+    the body handed to other threads.
+    """
+
+    def __init__(self, content, *args, controller: Optional[AdmissionController] = None, slots: int = 1,
+                 release: Optional[Callable[[], None]] = None, **kwargs):
+        super().__init__(content, *args, **kwargs)
+        self.controller = controller if controller is not None else admission
+        self.slots = slots
+        self.release = release
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            with anyio.CancelScope(shield=True):
+                try:
+                    aclose = getattr(self.body_iterator, "aclose", None)
+                    if aclose is not None:
+                        await aclose()
+                finally:
+                    if self.release is not None:
+                        self.release()
+                    else:
+                        self.controller.release(self.slots)
@@ -0,0 +1,313 @@
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import functools
+import contextlib
+import threading
+import subprocess
+import contextvars
+import concurrent.futures
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Dict, Optional, Tuple, Union
+
+from backend.core.cpu_scheduler import cpu_scheduler
+from backend.core.limitations import STREAM_QUEUE_SIZE, ADMISSION_MAX_IN_FLIGHT, SANDBOX_POOL_ENABLED, RESULT_CACHE_ENABLED
+from backend.core.output_capture import OutputBuffer
+from backend.core.result_cache import result_cache, cache_key
+from backend.core.sandbox import (
+    execute_code, execute_code_streaming, build_result, store_result, truncation_result, wait_child
+)
+from backend.core.worker_pool import CHILD_SCRIPT, WorkerError, output_buffers, stream_truncation
+from backend.models.run_response import ExecutionResult, ResourceUsage
+from backend.utils.logger import logger
+from backend.utils.tracing import span
+
+# Blocking sandbox work (warm pool jobs, repair loops) runs here rather than in
+# Starlette's shared threadpool, so it can never starve cheap endpoints.
+# Admission control keeps the number of callers at or below its size.
+_executor = ThreadPoolExecutor(max_workers=ADMISSION_MAX_IN_FLIGHT, thread_name_prefix="sandbox")
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run ``func`` on the sandbox executor, keeping the caller's context variables."""
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(_executor, functools.partial(ctx.run, func, *args, **kwargs))
+
+
+async def execute_code_async(code: str, timeout: int = 5, memory_limit_mb: int = 100,
+                             use_cache: bool = True, profile: bool = False) -> ExecutionResult:
+    """
+    Async counterpart of ``execute_code``. Uses the warm worker pool when it
+    is enabled, otherwise spawns the sandbox on the event loop (``spawn_sandbox``).
+    Cache lookups and stores (disk reads and writes, the import scan) run on
+    the executor too.
+    """
+    if SANDBOX_POOL_ENABLED:
+        return await run_blocking(execute_code, code, timeout, memory_limit_mb, use_cache, profile=profile)
+
+    key = None
+    if use_cache and RESULT_CACHE_ENABLED and not profile:
+        key = cache_key(code, timeout, memory_limit_mb)
+        cached = await run_blocking(result_cache.get, key)
+        if cached is not None:
+            return cached
+
+    result = await execute_subprocess_async(code, timeout, memory_limit_mb)
+    if key is not None:
+        await run_blocking(store_result, key, code, result)
+    return result
+
+
+class SandboxProcess:
+    """
+    A one-shot sandbox child read through asyncio pipes. It is reaped with
+    wait4 in a thread instead of by asyncio's child watcher, so, like a warm
+    pool run, its CPU time is known and charged to its placement.
+    """
+
+    def __init__(self, popen: subprocess.Popen, stdout: asyncio.StreamReader, stderr: asyncio.StreamReader):
+        self.popen = popen
+        self.stdout = stdout
+        self.stderr = stderr
+        self.rusage: Optional[dict] = None
+        self._reaped: Optional[asyncio.Future] = None
+
+    @property
+    def pid(self) -> int:
+        return self.popen.pid
+
+    @property
+    def returncode(self) -> Optional[int]:
+        return self.popen.returncode
+
+    async def feed(self, job: bytes) -> None:
+        """Write the job to the child's stdin and close it, off the event loop."""
+        await asyncio.get_running_loop().run_in_executor(None, _feed, self.popen.stdin, job)
+
+    async def wait(self) -> int:
+        if self._reaped is None:
+            self._reaped = asyncio.get_running_loop().run_in_executor(None, self._reap)
+        # Any number of waiters, and a cancelled one doesn't abandon the reap
+        return await asyncio.shield(self._reaped)
+
+    def _reap(self) -> int:
+        self.rusage = wait_child(self.popen)
+        return self.popen.returncode
+
+
+def _feed(stdin, job: bytes) -> None:
+    try:
+        with stdin:
+            stdin.write(job)
+    except BrokenPipeError:
+        pass
+
+
+async def spawn_sandbox(*args: str) -> SandboxProcess:
+    loop = asyncio.get_running_loop()
+    popen = subprocess.Popen(
+        [sys.executable, *args],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=True,
+    )
+    readers = []
+    for pipe in (popen.stdout, popen.stderr):
+        reader = asyncio.StreamReader()
+        await loop.connect_read_pipe(functools.partial(asyncio.StreamReaderProtocol, reader), pipe)
+        readers.append(reader)
+    return SandboxProcess(popen, *readers)
+
+
+async def execute_subprocess_async(code: str, timeout: int = 5, memory_limit_mb: int = 100) -> ExecutionResult:
+    with span("sandbox", cold=True), cpu_scheduler.placement(timeout, memory_limit_mb) as placement:
+        start_time = time.time()
+        job = json.dumps({"code": code, "memory_limit_mb": memory_limit_mb, "cpu": placement.options}).encode()
+
+        process = await spawn_sandbox("-I", CHILD_SCRIPT)
+        buffers = output_buffers()
+
+        async def run() -> None:
+            await process.feed(job)
+            await asyncio.gather(drain(process.stdout, buffers["stdout"]), drain(process.stderr, buffers["stderr"]))
+            await process.wait()
+
+        try:
+            await asyncio.wait_for(run(), timeout)
+        except asyncio.TimeoutError:
+            await kill_process(process)
+            return subprocess_result(124, buffers, start_time, process.rusage, timed_out=True)
+        except BaseException:
+            # Cancelled (e.g. client went away): never leave the child running.
+            await kill_process(process)
+            raise
+        finally:
+            placement.record(process.rusage)
+            for buffer in buffers.values():
+                buffer.close()
+
+        return subprocess_result(process.returncode, buffers, start_time, process.rusage)
+
+
+async def drain(reader: asyncio.StreamReader, buffer: OutputBuffer, queue: Optional[asyncio.Queue] = None,
+                name: str = "") -> None:
+    """Read a child's pipe into a bounded buffer, passing chunks on to ``queue`` if given."""
+    while True:
+        data = await reader.read(65536)
+        if not data:
+            break
+        buffer.write(data)
+        if queue is not None:
+            await queue.put((name, data))
+
+
+def subprocess_result(exit_code: int, buffers: Dict[str, OutputBuffer], start_time: float,
+                      rusage: Optional[dict] = None, timed_out: bool = False) -> ExecutionResult:
+    result = build_result(exit_code, buffers["stdout"].text(), buffers["stderr"].text(), timed_out, start_time,
+                          resources=ResourceUsage(**rusage) if rusage else None)
+    result.truncation = truncation_result(stream_truncation(buffers))
+    return result
+
+
+StreamEvent = Tuple[str, Union[bytes, ExecutionResult]]
+
+
+async def stream_code(code: str, timeout: int = 5, memory_limit_mb: int = 100,
+                      profile: bool = False) -> AsyncIterator[StreamEvent]:
+    """
+    Run ``code`` and yield ``("stdout", bytes)`` / ``("stderr", bytes)`` chunks as
+    they are produced, then a final ``("result", ExecutionResult)``.
+
+    Chunks go through a bounded queue: a slow consumer blocks the reader, and the
+    child then blocks on its full pipe. Closing the generator early (for example
+    when the client disconnects) kills the child immediately.
+
+    If the warm pool fails before anything was streamed, the code runs on a cold
+    interpreter instead (unprofiled), like ``execute_code``; a failure after
+    output was sent ends the stream with an error result.
+    """
+    if SANDBOX_POOL_ENABLED:
+        streamed = False
+        start_time = time.time()
+        try:
+            # Closed right here when our consumer stops, not whenever it is collected
+            async with contextlib.aclosing(_stream_pool(code, timeout, memory_limit_mb, profile)) as stream:
+                async for event in stream:
+                    streamed = True
+                    yield event
+            return
+        except WorkerError as e:
+            if streamed:
+                logger.warning(f"Sandbox worker failed mid-stream: {e}")
+                yield "result", worker_error_result(e, start_time)
+                return
+            logger.warning(f"Sandbox worker failed, falling back to a cold interpreter: {e}")
+    async with contextlib.aclosing(_stream_subprocess(code, timeout, memory_limit_mb)) as stream:
+        async for event in stream:
+            yield event
+
+
+def worker_error_result(error: WorkerError, start_time: float) -> ExecutionResult:
+    return ExecutionResult(
+        status="error",
+        output="",
+        error=f"Sandbox worker failed: {error}",
+        stack_trace=None,
+        execution_time=time.time() - start_time,
+        exit_code=1,
+    )
+
+
+async def _stream_pool(code: str, timeout: int, memory_limit_mb: int, profile: bool) -> AsyncIterator[StreamEvent]:
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+    cancel = threading.Event()
+
+    def on_output(name: str, data: bytes) -> None:
+        put = asyncio.run_coroutine_threadsafe(queue.put((name, data)), loop)
+        while not cancel.is_set():
+            try:
+                put.result(timeout=0.05)
+                return
+            except concurrent.futures.TimeoutError:
+                continue
+        put.cancel()
+
+    job = asyncio.ensure_future(
+        run_blocking(execute_code_streaming, code, timeout, memory_limit_mb, on_output, cancel, profile)
+    )
+    try:
+        while True:
+            get = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait({get, job}, return_when=asyncio.FIRST_COMPLETED)
+            if get in done:
+                yield get.result()
+                continue
+            get.cancel()
+            # Every chunk was queued before the job returned.
+            while not queue.empty():
+                yield queue.get_nowait()
+            yield "result", job.result()
+            return
+    finally:
+        cancel.set()
+        # The run sees the cancel within CANCEL_POLL_INTERVAL and kills the child;
+        # wait for that, so a closed stream has no sandbox left behind.
+        if not job.done():
+            with contextlib.suppress(Exception):
+                await asyncio.shield(job)
+
+
+async def _stream_subprocess(code: str, timeout: int, memory_limit_mb: int) -> AsyncIterator[StreamEvent]:
+    with cpu_scheduler.placement(timeout, memory_limit_mb) as placement:
+        start_time = time.time()
+        process = await spawn_sandbox("-I", "-u", CHILD_SCRIPT)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+        buffers = output_buffers()
+
+        async def run() -> None:
+            await process.feed(json.dumps({"code": code, "memory_limit_mb": memory_limit_mb,
+                                           "cpu": placement.options}).encode())
+            await asyncio.gather(drain(process.stdout, buffers["stdout"], queue, "stdout"),
+                                 drain(process.stderr, buffers["stderr"], queue, "stderr"))
+            await process.wait()
+
+        job = asyncio.ensure_future(asyncio.wait_for(run(), timeout))
+        try:
+            while True:
+                get = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait({get, job}, return_when=asyncio.FIRST_COMPLETED)
+                if get in done:
+                    yield get.result()
+                    continue
+                get.cancel()
+                while not queue.empty():
+                    yield queue.get_nowait()
+                try:
+                    job.result()
+                except asyncio.TimeoutError:
+                    await kill_process(process)
+                    yield "result", subprocess_result(124, buffers, start_time, process.rusage, timed_out=True)
+                    return
+                yield "result", subprocess_result(process.returncode, buffers, start_time, process.rusage)
+                return
+        finally:
+            job.cancel()
+            await kill_process(process)
+            placement.record(process.rusage)
+            for buffer in buffers.values():
+                buffer.close()
+
+
+async def kill_process(process: SandboxProcess) -> None:
+    if process.returncode is None:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    await asyncio.shield(process.wait())
@@ -0,0 +1,235 @@
+import ast
+import socket
+import threading
+import time
+from typing import List, Optional, Tuple, Union
+
+from backend.core.code_unit import CodeUnit, as_unit, start_line
+from backend.core.limitations import (
+    CHECKPOINT_MAX_SNAPSHOTS,
+    CHECKPOINT_MAX_MEMORY_MB,
+    CHECKPOINT_MIN_INTERVAL,
+    RESULT_CACHE_ENABLED,
+)
+from backend.core.result_cache import result_cache, cache_key
+from backend.core.sandbox import execute_code, outcome_result, store_result
+from backend.core.sandbox_child import recv_message
+from backend.core.worker_pool import WorkerError, dispatch_job, get_pool
+from backend.models.run_response import ExecutionResult
+from backend.utils.logger import logger
+
+# (first line, last line, source) of each top-level statement
+Signature = Tuple[Tuple[int, int, str], ...]
+
+
+def statement_signature(unit: CodeUnit) -> Optional[Signature]:
+    """
+    What a snapshot's prefix must match to be resumed. None when the program
+    can't run statement by statement (syntax errors, ``__future__`` imports).
+    """
+    if unit.tree is None:
+        return None
+    for stmt in unit.tree.body:
+        if isinstance(stmt, ast.ImportFrom) and stmt.module == "__future__":
+            return None
+    return tuple((start_line(stmt), stmt.end_lineno, text) for stmt, text in unit.top_level_statements())
+
+
+class Snapshot:
+    """A forked process frozen just before top-level statement ``index``."""
+
+    def __init__(self, index: int, signature: Signature, sock: socket.socket, stdout: str, stderr: str,
+                 elapsed: float, rss: int):
+        self.index = index
+        self.signature = signature
+        self.sock = sock
+        self.stdout = stdout
+        self.stderr = stderr
+        self.elapsed = elapsed
+        self.rss = rss
+        self.busy = False
+        self.last_used = time.monotonic()
+
+    def close(self) -> None:
+        # The snapshot exits as soon as it sees EOF on its socket.
+        self.sock.close()
+
+
+class CheckpointSession:
+    """
+    Snapshots of the programs run by one repair session. Each run forks a
+    snapshot at top-level statement boundaries once enough time has passed
+    since the previous one; a later run whose statements up to a snapshot are
+    unchanged resumes from it instead of starting over, with the snapshot's
+    output and run time added back so the result looks like a full run.
+
+    Snapshots are bounded by count and by resident memory (counted as if
+    nothing were shared, so the bound is conservative) and are all released
+    by ``close()``. Only the worker pool can take snapshots; without it runs
+    go through ``execute_code`` as usual.
+    """
+
+    def __init__(self, max_snapshots: int = CHECKPOINT_MAX_SNAPSHOTS,
+                 max_memory_mb: int = CHECKPOINT_MAX_MEMORY_MB,
+                 min_interval: float = CHECKPOINT_MIN_INTERVAL):
+        self.max_snapshots = max(1, max_snapshots)
+        self.max_memory = max_memory_mb * 1024 * 1024
+        self.min_interval = min_interval
+        self._snapshots: List[Snapshot] = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @property
+    def snapshots(self) -> List[Snapshot]:
+        with self._lock:
+            return list(self._snapshots)
+
+    def execute(self, code: Union[str, CodeUnit], timeout: int = 5, memory_limit_mb: int = 100,
+                cancel: Optional[threading.Event] = None) -> ExecutionResult:
+        unit = as_unit(code)
+        signature = statement_signature(unit)
+        if signature is None or self._closed:
+            return execute_code(unit.source, timeout, memory_limit_mb, cancel=cancel)
+
+        key = None
+        if RESULT_CACHE_ENABLED:
+            key = cache_key(unit.source, timeout, memory_limit_mb)
+            cached = result_cache.get(key)
+            if cached is not None:
+                return cached
+
+        snapshot = self._acquire(signature)
+        try:
+            result = self._run(unit.source, signature, snapshot, timeout, memory_limit_mb, cancel)
+        finally:
+            if snapshot is not None:
+                self._release(snapshot)
+
+        if key is not None:
+            store_result(key, unit.source, result)
+        return result
+
+    def _run(self, code: str, signature: Signature, snapshot: Optional[Snapshot], timeout: int,
+             memory_limit_mb: int, cancel: Optional[threading.Event]) -> ExecutionResult:
+        options = {"checkpoint": {"min_interval": self.min_interval, "max_snapshots": self.max_snapshots}}
+        prefix_out = prefix_err = ""
+        elapsed = 0.0
+        control, child_control = socket.socketpair()
+        try:
+            outcome = None
+            start_time = time.time()
+            if snapshot is not None:
+                try:
+                    job = {"code": code, "memory_limit_mb": memory_limit_mb, "elapsed": snapshot.elapsed, **options}
+                    outcome = dispatch_job(snapshot.sock, job, max(timeout - snapshot.elapsed, 0.01),
+                                           cancel=cancel, extra_fds=[child_control.fileno()])
+                    prefix_out, prefix_err, elapsed = snapshot.stdout, snapshot.stderr, snapshot.elapsed
+                    if outcome.worker_lost:
+                        self._discard(snapshot)
+                except WorkerError as e:
+                    logger.warning(f"Checkpoint snapshot failed, running from the start: {e}")
+                    self._discard(snapshot)
+
+            if outcome is None:
+                start_time = time.time()
+                try:
+                    outcome = get_pool().run(code, timeout, memory_limit_mb, cancel=cancel,
+                                             job_options=options, extra_fds=[child_control.fileno()])
+                except WorkerError as e:
+                    logger.warning(f"Checkpointed run failed, running without checkpoints: {e}")
+                    control.close()
+                    return execute_code(code, timeout, memory_limit_mb, use_cache=False, cancel=cancel)
+        finally:
+            child_control.close()
+
+        result = outcome_result(outcome, start_time - elapsed, prefix_out, prefix_err)
+        if outcome.truncation:
+            # Snapshots are placed by output offsets, which no longer line up
+            control.close()
+        else:
+            self._collect(control, signature, prefix_out + outcome.stdout, prefix_err + outcome.stderr)
+        return result
+
+    def _collect(self, control: socket.socket, signature: Signature, stdout: str, stderr: str) -> None:
+        """Register the snapshots a finished run reported on its control socket."""
+        out, err = stdout.encode(), stderr.encode()
+        control.settimeout(1)
+        try:
+            while True:
+                try:
+                    report, fds = recv_message(control)
+                except OSError:
+                    break
+                if report is None:
+                    break
+                sock = socket.socket(fileno=fds[0])
+                n_out, n_err = report["stdout"], report["stderr"]
+                if n_out > len(out) or n_err > len(err):
+                    # The run was cut short before this snapshot's output was read
+                    sock.close()
+                    continue
+                index = report["snapshot"]
+                self._add(Snapshot(index, signature[:index], sock, out[:n_out].decode(), err[:n_err].decode(),
+                                   report["elapsed"], report["rss"]))
+        finally:
+            control.close()
+
+    def _add(self, snapshot: Snapshot) -> None:
+        evicted = []
+        with self._lock:
+            if self._closed or any(s.signature == snapshot.signature for s in self._snapshots):
+                evicted.append(snapshot)
+            else:
+                self._snapshots.append(snapshot)
+                while len(self._snapshots) > self.max_snapshots or self._memory() > self.max_memory:
+                    idle = [s for s in self._snapshots if not s.busy]
+                    if not idle:
+                        break
+                    victim = min(idle, key=lambda s: s.last_used)
+                    self._snapshots.remove(victim)
+                    evicted.append(victim)
+        for victim in evicted:
+            victim.close()
+
+    def _memory(self) -> int:
+        return sum(s.rss for s in self._snapshots)
+
+    def _acquire(self, signature: Signature) -> Optional[Snapshot]:
+        """The deepest idle snapshot whose prefix is unchanged in ``signature``."""
+        with self._lock:
+            best = None
+            for snapshot in self._snapshots:
+                if snapshot.busy or snapshot.index > len(signature):
+                    continue
+                if signature[:snapshot.index] != snapshot.signature:
+                    continue
+                if best is None or snapshot.index > best.index:
+                    best = snapshot
+            if best is not None:
+                best.busy = True
+                best.last_used = time.monotonic()
+            return best
+
+    def _release(self, snapshot: Snapshot) -> None:
+        with self._lock:
+            snapshot.busy = False
+            closing = self._closed and snapshot in self._snapshots
+            if closing:
+                self._snapshots.remove(snapshot)
+        if closing:
+            snapshot.close()
+
+    def _discard(self, snapshot: Snapshot) -> None:
+        with self._lock:
+            if snapshot in self._snapshots:
+                self._snapshots.remove(snapshot)
+        snapshot.close()
+
+    def close(self) -> None:
+        """Release every snapshot; ones still resuming a run are released when it ends."""
+        with self._lock:
+            self._closed = True
+            idle = [s for s in self._snapshots if not s.busy]
+            self._snapshots = [s for s in self._snapshots if s.busy]
+        for snapshot in idle:
+            snapshot.close()
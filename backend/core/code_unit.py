@@ -0,0 +1,148 @@
+import ast
+import threading
+from typing import Dict, List, Optional, Tuple, Union
+
+# ast.parse holds the GIL for the whole parse, so serialising parses costs nothing,
+# and CPython 3.11 can fail concurrent ones ("AST constructor recursion depth mismatch").
+_parse_lock = threading.Lock()
+
+def parse_source(text: str) -> ast.Module:
+    """``ast.parse`` for code that may run in several threads at once."""
+    with _parse_lock:
+        return ast.parse(text)
+
+class CodeUnit:
+    """
+    One version of a program, analysed once and shared by the validator, the
+    parser and the patch engine. The AST, the line index and the validation
+    result are computed on first use and cached on the instance.
+
+    ``derive()`` builds the next version from this one: top-level statements
+    that end before the first changed line (and can't be extended by it) are
+    reused as-is and only the rest of the file is parsed again. Validation
+    results are cached per top-level statement text, so unchanged statements
+    are never re-checked.
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self.lines = source.split('\n')
+        self.validation: Optional[Tuple[bool, List[str]]] = None
+        # Security errors per top-level statement source. A derived unit starts from its
+        # parent's; validation keeps only the entries of this unit's own statements.
+        self.statement_errors: Dict[str, List[str]] = {}
+        self._tree: Optional[ast.Module] = None
+        self._syntax_error: Optional[SyntaxError] = None
+        self._parsed = False
+        self._line_index: Optional[Dict[int, List[ast.AST]]] = None
+
+    @property
+    def tree(self) -> Optional[ast.Module]:
+        """The module AST, or None if the source doesn't parse."""
+        if not self._parsed:
+            self._parse()
+        return self._tree
+
+    @property
+    def parsed(self) -> bool:
+        """Whether the source has been parsed yet (without parsing it)."""
+        return self._parsed
+
+    @property
+    def syntax_error(self) -> Optional[SyntaxError]:
+        if not self._parsed:
+            self._parse()
+        return self._syntax_error
+
+    def _parse(self, reuse: Optional[List[ast.stmt]] = None, first_line: int = 1) -> None:
+        """
+        Parse the source, or only the part from ``first_line`` on when the
+        statements in ``reuse`` already cover everything before it. The
+        skipped lines are replaced by blank lines so line numbers stay exact.
+
+        Units are shared between threads (session endpoints): the source is
+        parsed once, and ``_parsed`` is only set once the result is in place.
+        """
+        with _parse_lock:
+            if self._parsed:
+                return
+            text = self.source
+            if reuse:
+                text = '\n' * (first_line - 1) + '\n'.join(self.lines[first_line - 1:])
+            try:
+                tree = ast.parse(text)
+            except SyntaxError as e:
+                self._syntax_error = e
+            else:
+                if reuse:
+                    tree.body = reuse + tree.body
+                self._tree = tree
+            self._parsed = True
+
+    def line(self, line_number: int) -> Optional[str]:
+        if 1 <= line_number <= len(self.lines):
+            return self.lines[line_number - 1]
+        return None
+
+    def top_level_statements(self) -> List[Tuple[ast.stmt, str]]:
+        """Top-level statements paired with their source text."""
+        if self.tree is None:
+            return []
+        return [
+            (stmt, '\n'.join(self.lines[start_line(stmt) - 1:stmt.end_lineno]))
+            for stmt in self.tree.body
+        ]
+
+    def nodes_at(self, line_number: int) -> List[ast.AST]:
+        """All nodes spanning ``line_number``, outermost first."""
+        if self._line_index is None:
+            # Built aside and published whole, like the tree
+            index: Dict[int, List[ast.AST]] = {}
+            if self.tree is not None:
+                for node in ast.walk(self.tree):
+                    if getattr(node, "lineno", None) is None:
+                        continue
+                    for line in range(node.lineno, (node.end_lineno or node.lineno) + 1):
+                        index.setdefault(line, []).append(node)
+            self._line_index = index
+        return self._line_index.get(line_number, [])
+
+    def statement_at(self, line_number: int) -> Optional[ast.stmt]:
+        """The innermost statement spanning ``line_number``."""
+        statements = [node for node in self.nodes_at(line_number) if isinstance(node, ast.stmt)]
+        return statements[-1] if statements else None
+
+    def derive(self, new_source: str) -> "CodeUnit":
+        """Analysis of ``new_source``, reusing whatever is unchanged from this version."""
+        if new_source == self.source:
+            return self
+
+        unit = CodeUnit(new_source)
+        unit.statement_errors = self.statement_errors
+
+        if self.tree is None:
+            return unit
+
+        first_changed = 1
+        for old, new in zip(self.lines, unit.lines):
+            if old != new:
+                break
+            first_changed += 1
+
+        reuse = [stmt for stmt in self.tree.body if stmt.end_lineno < first_changed]
+        if reuse and hasattr(reuse[-1], "body"):
+            # An indented or else/except line may extend a compound statement.
+            reuse.pop()
+        if reuse:
+            unit._parse(reuse, reuse[-1].end_lineno + 1)
+        return unit
+
+def start_line(stmt: ast.stmt) -> int:
+    """First line of a statement, including any decorators."""
+    decorators = getattr(stmt, "decorator_list", None)
+    if decorators:
+        return min(stmt.lineno, *(d.lineno for d in decorators))
+    return stmt.lineno
+
+def as_unit(code: Union[str, CodeUnit]) -> CodeUnit:
+    return code if isinstance(code, CodeUnit) else CodeUnit(code)
@@ -0,0 +1,213 @@
+import os
+import time
+import uuid
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Sequence
+
+from backend.core.limitations import (
+    CGROUP_CPU_PERIOD_US,
+    CPU_PINNING_ENABLED,
+    SANDBOX_CGROUP_CPUS,
+    SANDBOX_CGROUP_ROOT,
+    SANDBOX_CPU_SECONDS,
+)
+from backend.utils.logger import logger
+
+CGROUP_CONTROLLERS = ("cpu", "memory")
+
+
+class CgroupManager:
+    """
+    One cgroup v2 child per run under a delegated ``root``, with ``cpu.max``
+    and ``memory.max`` set; the sandbox child moves itself into it. If the
+    root isn't a usable cgroup v2 directory the manager disables itself and
+    runs go without cgroups.
+    """
+
+    def __init__(self, root: Optional[str] = SANDBOX_CGROUP_ROOT, cpus: float = SANDBOX_CGROUP_CPUS):
+        self.root = root
+        self.cpus = cpus
+        self.enabled = bool(root) and self._setup()
+        self._lock = threading.Lock()
+        # Cgroups still holding processes (e.g. checkpoint snapshots) when their run ended
+        self._leftover: List[str] = []
+
+    def _setup(self) -> bool:
+        try:
+            with open(os.path.join(self.root, "cgroup.controllers")) as f:
+                available = f.read().split()
+            missing = [name for name in CGROUP_CONTROLLERS if name not in available]
+            if missing:
+                raise OSError(f"controllers not available: {', '.join(missing)}")
+            with open(os.path.join(self.root, "cgroup.subtree_control")) as f:
+                enabled = f.read().split()
+            if any(name not in enabled for name in CGROUP_CONTROLLERS):
+                with open(os.path.join(self.root, "cgroup.subtree_control"), "w") as f:
+                    f.write(" ".join(f"+{name}" for name in CGROUP_CONTROLLERS))
+        except OSError as e:
+            logger.warning(f"cgroup v2 limits disabled for {self.root}: {e}")
+            return False
+        return True
+
+    def create(self, memory_limit_mb: Optional[int]) -> Optional[str]:
+        """A new cgroup for one run, or None if it can't be made."""
+        if not self.enabled:
+            return None
+        self._remove_leftover()
+        path = os.path.join(self.root, f"run-{uuid.uuid4().hex[:12]}")
+        try:
+            os.mkdir(path)
+            quota = max(1000, int(self.cpus * CGROUP_CPU_PERIOD_US))
+            with open(os.path.join(path, "cpu.max"), "w") as f:
+                f.write(f"{quota} {CGROUP_CPU_PERIOD_US}")
+            if memory_limit_mb:
+                with open(os.path.join(path, "memory.max"), "w") as f:
+                    f.write(str(memory_limit_mb * 1024 * 1024))
+        except OSError as e:
+            logger.warning(f"Could not create cgroup for a sandbox run: {e}")
+            self.remove(path)
+            return None
+        return path
+
+    def remove(self, path: str) -> None:
+        try:
+            os.rmdir(path)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            with self._lock:
+                self._leftover.append(path)
+
+    def _remove_leftover(self) -> None:
+        with self._lock:
+            leftover, self._leftover = self._leftover, []
+        for path in leftover:
+            self.remove(path)
+
+
+class CoreSlot:
+    """One core runs are pinned to, with its accounting."""
+
+    def __init__(self, core: int):
+        self.core = core
+        self.active = 0
+        self.runs = 0
+        self.busy_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self._busy_since: Optional[float] = None
+
+    def busy(self, now: float) -> float:
+        if self._busy_since is None:
+            return self.busy_seconds
+        return self.busy_seconds + now - self._busy_since
+
+
+class Placement:
+    """Where one run goes: the ``cpu`` section of its job, plus accounting."""
+
+    def __init__(self, slot: Optional[CoreSlot], cpu_seconds: float, cgroup: Optional[str]):
+        self.slot = slot
+        self.cgroup = cgroup
+        self.options = {
+            "core": slot.core if slot is not None else None,
+            "seconds": cpu_seconds,
+            "cgroup": cgroup,
+        }
+        self.cpu_used = 0.0
+
+    def record(self, rusage: Optional[dict]) -> None:
+        """Attribute the run's CPU time (from wait4) to its slot."""
+        if rusage:
+            self.cpu_used = rusage.get("user_cpu", 0.0) + rusage.get("system_cpu", 0.0)
+
+
+class CpuScheduler:
+    """
+    Assigns every sandbox run to a core slot: the child pins itself to the
+    slot's core with ``sched_setaffinity``, so runs don't migrate or pile
+    onto one core, and a run beyond the core count shares the least busy
+    slot instead of being spread by the kernel over all of them. Every run
+    also gets an ``RLIMIT_CPU`` (``SANDBOX_CPU_SECONDS`` or its wall-clock
+    timeout) and, when configured, its own cgroup v2 child.
+
+    Slots are only bookkeeping; the worker pool and admission control decide
+    how many runs are in flight.
+    """
+
+    def __init__(self, cores: Optional[Sequence[int]] = None, pinning: bool = CPU_PINNING_ENABLED,
+                 cpu_seconds: float = SANDBOX_CPU_SECONDS, cgroups: Optional[CgroupManager] = None):
+        if cores is None:
+            cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else []
+        self.pinning = pinning and bool(cores)
+        self.cpu_seconds = cpu_seconds
+        self.cgroups = cgroups if cgroups is not None else CgroupManager()
+        self.slots = [CoreSlot(core) for core in cores] if self.pinning else []
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self._next = 0
+
+    @contextmanager
+    def placement(self, timeout: float, memory_limit_mb: Optional[int] = None) -> Iterator[Placement]:
+        slot = self._acquire()
+        cpu_seconds = min(self.cpu_seconds, timeout) if self.cpu_seconds > 0 else timeout
+        cgroup = self.cgroups.create(memory_limit_mb)
+        placement = Placement(slot, cpu_seconds, cgroup)
+        try:
+            yield placement
+        finally:
+            if cgroup is not None:
+                self.cgroups.remove(cgroup)
+            self._release(slot, placement.cpu_used)
+
+    def _acquire(self) -> Optional[CoreSlot]:
+        if not self.slots:
+            return None
+        with self._lock:
+            # Fewest runs in flight; ties go round-robin so idle cores take turns
+            count = len(self.slots)
+            order = [self.slots[(self._next + i) % count] for i in range(count)]
+            slot = min(order, key=lambda s: s.active)
+            self._next = (self.slots.index(slot) + 1) % count
+            if slot.active == 0:
+                slot._busy_since = time.monotonic()
+            slot.active += 1
+            slot.runs += 1
+        return slot
+
+    def _release(self, slot: Optional[CoreSlot], cpu_used: float) -> None:
+        if slot is None:
+            return
+        with self._lock:
+            slot.active -= 1
+            slot.cpu_seconds += cpu_used
+            if slot.active == 0:
+                slot.busy_seconds += time.monotonic() - slot._busy_since
+                slot._busy_since = None
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        uptime = max(now - self.started, 1e-9)
+        with self._lock:
+            slots = [
+                {
+                    "core": slot.core,
+                    "active": slot.active,
+                    "runs": slot.runs,
+                    "busy_seconds": slot.busy(now),
+                    "cpu_seconds": slot.cpu_seconds,
+                    # Share of wall time the slot had a run, and how much of that the runs computed
+                    "utilization": slot.busy(now) / uptime,
+                    "cpu_utilization": slot.cpu_seconds / uptime,
+                }
+                for slot in self.slots
+            ]
+        return {
+            "pinning": self.pinning,
+            "cgroups": self.cgroups.enabled,
+            "cpu_seconds_limit": self.cpu_seconds or None,
+            "slots": slots,
+        }
+
+
+cpu_scheduler = CpuScheduler()
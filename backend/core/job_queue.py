@@ -0,0 +1,250 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from backend.core.limitations import (
+    JOB_LEASE_SECONDS,
+    JOB_MAX_ATTEMPTS,
+    JOB_QUEUE_PATH,
+    JOB_RESULT_TTL_SECONDS,
+    JOB_RETRY_DELAY_SECONDS,
+    JOB_WRITE_BATCH,
+)
+from backend.utils.logger import logger
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    result TEXT,
+    error TEXT,
+    created REAL NOT NULL,
+    not_before REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    lease_until REAL,
+    worker TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, priority DESC, created);
+CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished) WHERE finished IS NOT NULL;
+"""
+
+FINISHED_STATUSES = ("done", "failed", "cancelled")
+COLUMNS = ("id", "kind", "status", "priority", "attempts", "max_attempts", "result", "error",
+           "created", "started", "finished")
+
+
+class JobQueue:
+    """
+    Jobs in a local SQLite database (WAL mode), shared by the API processes
+    that submit them and the worker processes that run them.
+
+    Submissions are group-committed: ``submit`` queues the row and returns
+    once the writer thread has committed it together with whatever else was
+    submitted while the previous batch was being written, so a job id handed
+    out is always durable without a transaction per job. Workers claim jobs
+    in priority order, a few per transaction, under a lease; a job whose
+    worker died is claimed again once the lease runs out. Infrastructure failures are retried up to
+    ``max_attempts`` times, and finished jobs are deleted after ``result_ttl``.
+    """
+
+    def __init__(self, path: str = JOB_QUEUE_PATH, lease: float = JOB_LEASE_SECONDS,
+                 result_ttl: float = JOB_RESULT_TTL_SECONDS, write_batch: int = JOB_WRITE_BATCH):
+        self.path = path
+        self.lease = lease
+        self.result_ttl = result_ttl
+        self.write_batch = write_batch
+        self._local = threading.local()
+        self._pending: List[Tuple[tuple, threading.Event, list]] = []
+        self._pending_lock = threading.Condition()
+        self._writer: Optional[threading.Thread] = None
+        self._closed = False
+        with self._connection() as db:
+            db.executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.row_factory = sqlite3.Row
+            self._local.db = db
+        return db
+
+    def submit(self, kind: str, payload: dict, priority: int = 0, max_attempts: int = JOB_MAX_ATTEMPTS) -> str:
+        """Queue a job and return its id once it is committed."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        row = (job_id, kind, json.dumps(payload), priority, "queued", max(1, max_attempts), now, now)
+        committed, error = threading.Event(), []
+        with self._pending_lock:
+            if self._closed:
+                raise RuntimeError("job queue is closed")
+            self._pending.append((row, committed, error))
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="job-writer", daemon=True)
+                self._writer.start()
+            self._pending_lock.notify()
+        committed.wait()
+        if error:
+            raise error[0]
+        return job_id
+
+    def _write_loop(self) -> None:
+        while True:
+            with self._pending_lock:
+                while not self._pending and not self._closed:
+                    self._pending_lock.wait()
+                if not self._pending and self._closed:
+                    return
+                # Everything submitted while the previous batch was committing
+                batch, self._pending = self._pending[:self.write_batch], self._pending[self.write_batch:]
+            try:
+                db = self._connection()
+                with db:
+                    db.execute("BEGIN IMMEDIATE")
+                    db.executemany(
+                        "INSERT INTO jobs (id, kind, payload, priority, status, max_attempts, created, not_before) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        [row for row, _, _ in batch],
+                    )
+            except sqlite3.Error as e:
+                logger.warning(f"Could not commit {len(batch)} job(s): {e}")
+                for _, _, error in batch:
+                    error.append(e)
+            for _, committed, _ in batch:
+                committed.set()
+
+    def claim(self, worker: str, limit: int = 1) -> List[dict]:
+        """
+        Take up to ``limit`` runnable jobs, highest priority first: queued ones
+        that are due, and running ones whose lease ran out. Each claim counts
+        as an attempt.
+        """
+        now = time.time()
+        db = self._connection()
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            # A job that keeps taking its worker down (or past its lease) isn't handed out forever
+            db.execute(
+                "UPDATE jobs SET status = 'failed', error = 'Worker lease expired', finished = ?, lease_until = NULL "
+                "WHERE status = 'running' AND lease_until < ? AND attempts >= max_attempts",
+                (now, now),
+            )
+            rows = db.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, started = ?, lease_until = ?, worker = ? "
+                "WHERE id IN ("
+                "  SELECT id FROM jobs WHERE (status = 'queued' AND not_before <= ?)"
+                "  OR (status = 'running' AND lease_until < ?)"
+                "  ORDER BY priority DESC, created LIMIT ?"
+                ") RETURNING id, kind, payload, priority, attempts, max_attempts",
+                (now, now + self.lease, worker, now, now, limit),
+            ).fetchall()
+        jobs = [dict(row) for row in rows]
+        for job in jobs:
+            job["payload"] = json.loads(job["payload"])
+        jobs.sort(key=lambda job: -job["priority"])
+        return jobs
+
+    def complete(self, outcomes: List[Tuple[str, str, Optional[dict], Optional[str]]], worker: str) -> None:
+        """
+        Record a worker's finished jobs in one transaction. Each outcome is
+        ``(job_id, status, result, error)`` with status "done", "failed", or
+        "retry" (an infrastructure failure): a job to retry is queued again
+        after a delay while it has attempts left and fails otherwise. Jobs
+        another worker took over (lease expired) are left alone.
+        """
+        if not outcomes:
+            return
+        now = time.time()
+        db = self._connection()
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            for job_id, status, result, error in outcomes:
+                if status == "retry":
+                    retried = db.execute(
+                        "UPDATE jobs SET status = 'queued', error = ?, not_before = ?, lease_until = NULL, worker = NULL "
+                        "WHERE id = ? AND worker = ? AND status = 'running' AND attempts < max_attempts",
+                        (error, now + JOB_RETRY_DELAY_SECONDS, job_id, worker),
+                    ).rowcount
+                    if retried:
+                        continue
+                    status = "failed"
+                db.execute(
+                    "UPDATE jobs SET status = ?, result = ?, error = ?, finished = ?, lease_until = NULL "
+                    "WHERE id = ? AND worker = ? AND status = 'running'",
+                    (status, json.dumps(result) if result is not None else None, error, now, job_id, worker),
+                )
+
+    def get(self, job_id: str) -> Optional[dict]:
+        row = self._connection().execute(
+            f"SELECT {', '.join(COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job that hasn't started. Returns whether it was cancelled."""
+        db = self._connection()
+        with db:
+            return db.execute(
+                "UPDATE jobs SET status = 'cancelled', finished = ? WHERE id = ? AND status = 'queued'",
+                (time.time(), job_id),
+            ).rowcount > 0
+
+    def cleanup(self) -> int:
+        """Delete finished jobs older than the result TTL. Returns how many were deleted."""
+        db = self._connection()
+        with db:
+            return db.execute("DELETE FROM jobs WHERE finished IS NOT NULL AND finished < ?",
+                              (time.time() - self.result_ttl,)).rowcount
+
+    def stats(self) -> Dict[str, int]:
+        rows = self._connection().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {status: 0 for status in ("queued", "running", *FINISHED_STATUSES)}
+        counts.update({status: count for status, count in rows})
+        return counts
+
+    def close(self) -> None:
+        with self._pending_lock:
+            self._closed = True
+            self._pending_lock.notify()
+        if self._writer is not None:
+            self._writer.join()
+        db = getattr(self._local, "db", None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+
+_queue: Optional[JobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """The queue at ``JOB_QUEUE_PATH``, opened on first use."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
+
+
+def job_queue_stats() -> Optional[Dict[str, int]]:
+    """Job counts by status, or None if no queue database exists yet."""
+    if _queue is None and not os.path.exists(JOB_QUEUE_PATH):
+        return None
+    return get_job_queue().stats()
@@ -1,3 +1,6 @@
+import os
+import sys
+
 MAX_TIMEOUT_SECONDS = 10
 MAX_MEMORY_MB = 256
 MAX_CODE_LENGTH = 10000
@@ -15,3 +18,128 @@ FORBIDDEN_BUILTINS = {
 
 # Allowed standard libraries (safelist approach is safer, but blocklist is requested/implied)
 # We stick to blocklist for now as per PRD "Restrict dangerous builtins"
+
+# Warm sandbox worker pool (backend/core/worker_pool.py)
+SANDBOX_POOL_ENABLED = sys.platform.startswith("linux") and os.environ.get("RECODEX_SANDBOX_POOL", "1") != "0"
+SANDBOX_POOL_SIZE = int(os.environ.get("RECODEX_SANDBOX_POOL_SIZE", os.cpu_count() or 1))
+SANDBOX_WORKER_MAX_JOBS = int(os.environ.get("RECODEX_SANDBOX_WORKER_MAX_JOBS", 100))
+
+# CPU placement of sandbox runs (backend/core/cpu_scheduler.py): each run is pinned to one core slot
+CPU_PINNING_ENABLED = hasattr(os, "sched_setaffinity") and os.environ.get("RECODEX_CPU_PINNING", "1") != "0"
+# RLIMIT_CPU per run in seconds; 0 uses the run's wall-clock timeout
+SANDBOX_CPU_SECONDS = float(os.environ.get("RECODEX_SANDBOX_CPU_SECONDS", 0))
+# Optional delegated cgroup v2 directory; each run gets a child with cpu.max and memory.max
+SANDBOX_CGROUP_ROOT = os.environ.get("RECODEX_CGROUP_ROOT") or None
+# CPUs a run's cgroup may use (cpu.max quota per period)
+SANDBOX_CGROUP_CPUS = float(os.environ.get("RECODEX_CGROUP_CPUS", 1.0))
+CGROUP_CPU_PERIOD_US = 100000
+
+# Admission control in front of the sandbox (backend/core/admission.py)
+ADMISSION_MAX_IN_FLIGHT = int(os.environ.get("RECODEX_MAX_IN_FLIGHT", os.cpu_count() or 1))
+ADMISSION_MAX_QUEUE = int(os.environ.get("RECODEX_MAX_QUEUE", 4 * ADMISSION_MAX_IN_FLIGHT))
+ADMISSION_RETRY_AFTER_SECONDS = 1
+
+# Execution result cache (backend/core/result_cache.py)
+RESULT_CACHE_ENABLED = os.environ.get("RECODEX_RESULT_CACHE", "1") != "0"
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("RECODEX_RESULT_CACHE_MAX_ENTRIES", 1024))
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("RECODEX_RESULT_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+RESULT_CACHE_TTL_SECONDS = int(os.environ.get("RECODEX_RESULT_CACHE_TTL", 600))
+# Optional on-disk tier; unset keeps the cache in memory only
+RESULT_CACHE_DIR = os.environ.get("RECODEX_RESULT_CACHE_DIR") or None
+RESULT_CACHE_DISK_MAX_ENTRIES = int(os.environ.get("RECODEX_RESULT_CACHE_DISK_MAX_ENTRIES", 10000))
+RESULT_CACHE_EXCLUDE_TIMEOUTS = os.environ.get("RECODEX_RESULT_CACHE_EXCLUDE_TIMEOUTS", "1") != "0"
+# Code importing any of these is treated as non-deterministic and never cached
+RESULT_CACHE_NONDETERMINISTIC_MODULES = {"time", "random", "datetime", "uuid", "secrets"}
+
+# Output chunks buffered per streaming run before the reader applies backpressure
+STREAM_QUEUE_SIZE = 64
+
+# Batch endpoints (backend/engine/batch.py)
+MAX_BATCH_SIZE = int(os.environ.get("RECODEX_MAX_BATCH_SIZE", 500))
+BATCH_MAX_WORKERS = int(os.environ.get("RECODEX_BATCH_WORKERS", os.cpu_count() or 1))
+
+# Patch candidates the repair loop executes in parallel per iteration
+SPECULATIVE_CANDIDATES = int(os.environ.get("RECODEX_SPECULATIVE_CANDIDATES", 3))
+# Most a request may ask for with max_candidates
+MAX_SPECULATIVE_CANDIDATES = max(SPECULATIVE_CANDIDATES, int(os.environ.get("RECODEX_MAX_SPECULATIVE_CANDIDATES", 8)))
+
+# Checkpoint/replay for repair sessions (Linux, needs the worker pool)
+CHECKPOINT_ENABLED = SANDBOX_POOL_ENABLED
+CHECKPOINT_MAX_SNAPSHOTS = int(os.environ.get("RECODEX_CHECKPOINT_MAX_SNAPSHOTS", 8))
+CHECKPOINT_MAX_MEMORY_MB = int(os.environ.get("RECODEX_CHECKPOINT_MAX_MEMORY_MB", 512))
+# A snapshot is only taken after this much run time since the previous one
+CHECKPOINT_MIN_INTERVAL = float(os.environ.get("RECODEX_CHECKPOINT_MIN_INTERVAL", 0.2))
+
+# Profiling (opt-in per run): rows of the hot-spot table returned
+PROFILE_MAX_ENTRIES = 50
+
+# Memo of verified fixes keyed by error fingerprint (backend/engine/patch_memo.py)
+PATCH_MEMO_ENABLED = os.environ.get("RECODEX_PATCH_MEMO", "1") != "0"
+PATCH_MEMO_MAX_ENTRIES = int(os.environ.get("RECODEX_PATCH_MEMO_MAX_ENTRIES", 4096))
+# Optional on-disk tier so known fixes survive restarts; unset keeps the memo in memory only
+PATCH_MEMO_DIR = os.environ.get("RECODEX_PATCH_MEMO_DIR") or None
+PATCH_MEMO_DISK_MAX_ENTRIES = int(os.environ.get("RECODEX_PATCH_MEMO_DISK_MAX_ENTRIES", 100000))
+
+# Output kept in memory per stream and run: the first and last bytes (backend/core/output_capture.py)
+OUTPUT_HEAD_BYTES = int(os.environ.get("RECODEX_OUTPUT_HEAD_BYTES", 64 * 1024))
+OUTPUT_TAIL_BYTES = int(os.environ.get("RECODEX_OUTPUT_TAIL_BYTES", 64 * 1024))
+# Optional directory where truncated streams are written in full, fetchable via GET /output/{id}
+OUTPUT_SPILL_DIR = os.environ.get("RECODEX_OUTPUT_SPILL_DIR") or None
+OUTPUT_SPILL_MAX_BYTES = int(os.environ.get("RECODEX_OUTPUT_SPILL_MAX_BYTES", 16 * 1024 * 1024))
+OUTPUT_SPILL_TTL_SECONDS = int(os.environ.get("RECODEX_OUTPUT_SPILL_TTL", 600))
+OUTPUT_SPILL_MAX_FILES = int(os.environ.get("RECODEX_OUTPUT_SPILL_MAX_FILES", 1000))
+# Cap on the JSON report a sandbox child sends back (profile, exception)
+REPORT_MAX_BYTES = 4 * 1024 * 1024
+
+# Timeouts: the sandbox reports where the code is stuck this long before the deadline
+HANG_REPORT_MARGIN = 0.25
+# After a timeout, the repair loop runs the next version with this fraction of the previous timeout...
+ADAPTIVE_TIMEOUT_FACTOR = float(os.environ.get("RECODEX_ADAPTIVE_TIMEOUT_FACTOR", 0.5))
+# ...but never less than this many seconds
+ADAPTIVE_TIMEOUT_MIN = float(os.environ.get("RECODEX_ADAPTIVE_TIMEOUT_MIN", 1.0))
+# Iterations a loop guard added to a hanging loop allows
+LOOP_GUARD_LIMIT = 100000
+
+# Response compression (backend/utils/compression.py): complete bodies at least this large
+# are compressed with zstd (if installed) or gzip when the client accepts it
+COMPRESSION_MIN_BYTES = int(os.environ.get("RECODEX_COMPRESSION_MIN_BYTES", 1024))
+GZIP_LEVEL = int(os.environ.get("RECODEX_GZIP_LEVEL", 6))
+ZSTD_LEVEL = int(os.environ.get("RECODEX_ZSTD_LEVEL", 3))
+# Bodies at least this large are compressed in a worker thread rather than on the event loop
+COMPRESSION_THREAD_MIN_BYTES = int(os.environ.get("RECODEX_COMPRESSION_THREAD_MIN_BYTES", 64 * 1024))
+
+# Editing sessions holding the current code server-side (backend/core/sessions.py)
+SESSION_MAX_ENTRIES = int(os.environ.get("RECODEX_SESSION_MAX_ENTRIES", 1000))
+SESSION_MAX_BYTES = int(os.environ.get("RECODEX_SESSION_MAX_BYTES", 64 * 1024 * 1024))
+SESSION_IDLE_TTL_SECONDS = int(os.environ.get("RECODEX_SESSION_IDLE_TTL", 1800))
+
+# Durable background jobs (backend/core/job_queue.py, workers: python -m backend.engine.job_worker)
+JOB_QUEUE_PATH = os.environ.get("RECODEX_JOB_QUEUE_PATH", os.path.join(os.getcwd(), "recodex_jobs.sqlite3"))
+JOB_WORKERS = int(os.environ.get("RECODEX_JOB_WORKERS", os.cpu_count() or 1))
+# Attempts per job before an infrastructure failure is final
+JOB_MAX_ATTEMPTS = int(os.environ.get("RECODEX_JOB_MAX_ATTEMPTS", 3))
+JOB_RETRY_DELAY_SECONDS = 1.0
+# A running job whose worker hasn't finished it by then is handed to another worker
+JOB_LEASE_SECONDS = int(os.environ.get("RECODEX_JOB_LEASE_SECONDS", 600))
+# Finished jobs are deleted this long after they finished
+JOB_RESULT_TTL_SECONDS = int(os.environ.get("RECODEX_JOB_RESULT_TTL", 24 * 3600))
+JOB_CLEANUP_INTERVAL_SECONDS = 60
+# Most submissions committed in one transaction
+JOB_WRITE_BATCH = 256
+# A worker records its finished jobs together until this long has passed
+JOB_WRITE_INTERVAL_SECONDS = 0.01
+# Jobs a worker claims per transaction, and how long an idle worker sleeps between polls
+JOB_CLAIM_BATCH = int(os.environ.get("RECODEX_JOB_CLAIM_BATCH", 4))
+JOB_POLL_INTERVAL_SECONDS = 0.1
+# Longest long-poll on GET /jobs/{id}?wait=
+JOB_MAX_WAIT_SECONDS = 30
+
+# Request tracing (backend/utils/tracing.py): per-stage spans and a Server-Timing header
+TRACING_ENABLED = os.environ.get("RECODEX_TRACING", "1") != "0"
+# Sampled traces are appended to this JSONL file (none are written while unset)
+TRACE_PATH = os.environ.get("RECODEX_TRACE_PATH") or None
+TRACE_SAMPLE_RATE = float(os.environ.get("RECODEX_TRACE_SAMPLE_RATE", 0.01))
+# Requests slower than this are always written
+TRACE_SLOW_MS = float(os.environ.get("RECODEX_TRACE_SLOW_MS", 2000))
+TRACE_MAX_BYTES = int(os.environ.get("RECODEX_TRACE_MAX_BYTES", 50 * 1024 * 1024))
+TRACE_BACKUPS = int(os.environ.get("RECODEX_TRACE_BACKUPS", 5))
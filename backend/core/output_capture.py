@@ -0,0 +1,188 @@
+import os
+import re
+import time
+import uuid
+import threading
+from typing import BinaryIO, Optional
+
+from backend.core.limitations import (
+    OUTPUT_HEAD_BYTES,
+    OUTPUT_TAIL_BYTES,
+    OUTPUT_SPILL_DIR,
+    OUTPUT_SPILL_MAX_BYTES,
+    OUTPUT_SPILL_MAX_FILES,
+    OUTPUT_SPILL_TTL_SECONDS,
+)
+from backend.utils.logger import logger
+
+SPILL_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+SPILL_PRUNE_INTERVAL = 50
+
+
+class SpillStore:
+    """
+    Temp files holding the complete output of runs whose output was
+    truncated, addressed by a random id. Files older than ``ttl`` or beyond
+    ``max_files`` are pruned. Without a directory nothing is spilled.
+    """
+
+    def __init__(self, directory: Optional[str] = OUTPUT_SPILL_DIR, max_bytes: int = OUTPUT_SPILL_MAX_BYTES,
+                 ttl: float = OUTPUT_SPILL_TTL_SECONDS, max_files: int = OUTPUT_SPILL_MAX_FILES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_files = max_files
+        self._lock = threading.Lock()
+        self._created = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def create(self) -> Optional[tuple]:
+        """A new spill file as ``(spill_id, file)``, or None if spilling is off or failing."""
+        if not self.directory:
+            return None
+        spill_id = uuid.uuid4().hex
+        try:
+            f = open(self.path(spill_id), 'wb')
+        except OSError as e:
+            logger.warning(f"Could not create output spill file: {e}")
+            return None
+
+        with self._lock:
+            self._created += 1
+            prune = self._created % SPILL_PRUNE_INTERVAL == 0
+        if prune:
+            self.prune()
+        return spill_id, f
+
+    def path(self, spill_id: str) -> str:
+        return os.path.join(self.directory, f"{spill_id}.out")
+
+    def find(self, spill_id: str) -> Optional[str]:
+        """Path of an unexpired spill file, or None."""
+        if not self.directory or not SPILL_ID_PATTERN.match(spill_id):
+            return None
+        path = self.path(spill_id)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                return None
+        except OSError:
+            return None
+        return path
+
+    def prune(self) -> None:
+        try:
+            entries = [e for e in os.scandir(self.directory) if e.name.endswith(".out")]
+        except OSError:
+            return
+        now = time.time()
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        excess = len(entries) - self.max_files
+        for i, entry in enumerate(entries):
+            if i < excess or now - entry.stat().st_mtime > self.ttl:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+
+spill_store = SpillStore()
+
+
+class OutputBuffer:
+    """
+    Bounded capture of one output stream: the first ``head_bytes`` and the
+    last ``tail_bytes`` are kept in memory and the middle is dropped, so a run
+    costs at most their sum however much it prints. With a ``spill`` store,
+    a stream that overflows is also written in full (up to the store's
+    ``max_bytes``) to a file that can be fetched by its id.
+    """
+
+    def __init__(self, head_bytes: int = OUTPUT_HEAD_BYTES, tail_bytes: int = OUTPUT_TAIL_BYTES,
+                 spill: Optional[SpillStore] = None):
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total = 0
+        self.spill_id: Optional[str] = None
+        self._spill = spill
+        self._spill_file: Optional[BinaryIO] = None
+        self._spilled = 0
+
+    def write(self, data: bytes) -> None:
+        if self._spill is not None and self.total + len(data) > self.head_bytes + self.tail_bytes:
+            self._write_spill(data)
+        self.total += len(data)
+
+        room = self.head_bytes - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        if data:
+            self.tail += data
+            if len(self.tail) > self.tail_bytes:
+                del self.tail[:len(self.tail) - self.tail_bytes]
+
+    def _write_spill(self, data: bytes) -> None:
+        if self._spill_file is None:
+            if self.spill_id is not None:
+                return  # spilling stopped at the size limit
+            created = self._spill.create()
+            if created is None:
+                self._spill = None
+                return
+            self.spill_id, self._spill_file = created
+            # Nothing has been dropped yet, so memory still holds everything seen so far
+            self._spill_write(self.getvalue())
+        if self._spill_file is not None:
+            self._spill_write(data)
+
+    def _spill_write(self, data: bytes) -> None:
+        data = data[:max(0, self._spill.max_bytes - self._spilled)]
+        try:
+            self._spill_file.write(data)
+        except OSError as e:
+            logger.warning(f"Could not write output spill file: {e}")
+            self.close()
+            return
+        self._spilled += len(data)
+        if self._spilled >= self._spill.max_bytes:
+            self.close()
+
+    def close(self) -> None:
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+
+    @property
+    def kept(self) -> int:
+        return len(self.head) + len(self.tail)
+
+    @property
+    def truncated(self) -> bool:
+        return self.total > self.kept
+
+    def getvalue(self) -> bytes:
+        return bytes(self.head) + bytes(self.tail)
+
+    def text(self) -> str:
+        """The kept output, with a marker where the middle was dropped."""
+        if not self.truncated:
+            return self.getvalue().decode(errors="replace")
+        return (
+            self.head.decode(errors="replace")
+            + f"\n... [{self.total - self.kept} bytes truncated] ...\n"
+            + self.tail.decode(errors="replace")
+        )
+
+    def truncation(self) -> Optional[dict]:
+        if not self.truncated:
+            return None
+        return {
+            "total_bytes": self.total,
+            "kept_bytes": self.kept,
+            "spill_id": self.spill_id,
+            "spilled_bytes": self._spilled if self.spill_id else None,
+        }
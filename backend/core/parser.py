@@ -1,6 +1,12 @@
 import re
+from collections import Counter
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
+from backend.models.run_response import ExceptionFrame, ExceptionInfo, HangSite
+from backend.utils.tracing import traced
+
+FILE_LINE_PATTERN = re.compile(r'File "(.*?)", line (\d+)')
+SYNTAX_ERRORS = {"SyntaxError", "IndentationError", "TabError"}
 
 class ParsedError(BaseModel):
     type: str
@@ -8,8 +14,22 @@ class ParsedError(BaseModel):
     line_number: Optional[int] = None
     file: Optional[str] = None
     category: str = "runtime"
+    # Full stack, when the sandbox reported the exception itself
+    frames: Optional[List[ExceptionFrame]] = None
+
+@traced("parse_error")
+def parse_error(stack_trace: str, exception: Optional[ExceptionInfo] = None,
+                hang: Optional[HangSite] = None) -> ParsedError:
+    """
+    Classify an error. The structured ``exception`` (or, for a timeout, the
+    ``hang`` site) reported by the sandbox is used when available; the stderr
+    text is only parsed as a fallback.
+    """
+    if hang is not None:
+        return parse_hang(hang)
+    if exception is not None:
+        return parse_exception(exception)
 
-def parse_error(stack_trace: str) -> ParsedError:
     if not stack_trace:
         return ParsedError(type="Unknown", message="No stack trace provided")
 
@@ -32,7 +52,7 @@ def parse_error(stack_trace: str) -> ParsedError:
     
     # Iterate backwards to find the location
     for line in reversed(lines):
-        match = re.search(r'File "(.*?)", line (\d+)', line)
+        match = FILE_LINE_PATTERN.search(line)
         if match:
             file_name = match.group(1)
             line_number = int(match.group(2))
@@ -41,8 +61,10 @@ def parse_error(stack_trace: str) -> ParsedError:
                 break
     
     category = "runtime"
-    if error_type in ["SyntaxError", "IndentationError"]:
+    if error_type in SYNTAX_ERRORS:
         category = "syntax"
+    elif error_type == "Hang":
+        category = "hang"
     
     return ParsedError(
         type=error_type,
@@ -51,3 +73,45 @@ def parse_error(stack_trace: str) -> ParsedError:
         file=file_name,
         category=category
     )
+
+def parse_exception(exception: ExceptionInfo) -> ParsedError:
+    file_name = None
+    if exception.line_number is not None:
+        file_name = "<string>"
+    elif exception.frames:
+        file_name = exception.frames[-1].file
+
+    return ParsedError(
+        type=exception.type,
+        message=exception.message,
+        line_number=exception.line_number,
+        file=file_name,
+        category="syntax" if exception.type in SYNTAX_ERRORS else "runtime",
+        frames=exception.frames
+    )
+
+def parse_hang(hang: HangSite) -> ParsedError:
+    """A timeout with a known hang site, as an error the patch engine can target."""
+    message = "still running"
+    if hang.line_number is not None:
+        message = f"still running at line {hang.line_number}"
+    return ParsedError(
+        type="Hang",
+        message=message,
+        line_number=hang.line_number,
+        file="<string>" if hang.line_number is not None else None,
+        category="hang",
+        frames=hang.frames
+    )
+
+def recursive_function(frames: List[ExceptionFrame]) -> Optional[ExceptionFrame]:
+    """The innermost frame of the user function that repeats most on the stack."""
+    user_frames = [frame for frame in frames if frame.file == "<string>" and frame.function != "<module>"]
+    if not user_frames:
+        return None
+    counts = Counter(frame.function for frame in user_frames)
+    most = max(counts.values())
+    for frame in reversed(user_frames):
+        if counts[frame.function] == most:
+            return frame
+    return None
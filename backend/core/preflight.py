@@ -0,0 +1,54 @@
+import time
+from typing import Optional, Union
+from backend.core.code_unit import CodeUnit, as_unit
+from backend.core.parser import ParsedError
+from backend.core.validator import validate_unit
+from backend.models.run_response import ExecutionResult
+from backend.utils.tracing import traced
+
+@traced("preflight")
+def preflight(code: Union[str, CodeUnit]) -> Optional[ParsedError]:
+    """
+    In-process checks run before a sandbox is started: parsing, compiling and
+    the security validator. Returns the error that stops the code, or None if
+    it has to be executed to find out.
+    """
+    unit = as_unit(code)
+    if unit.syntax_error is not None:
+        return syntax_error(unit.syntax_error)
+
+    # Some errors only surface when compiling ('return' outside function, ...)
+    try:
+        compile(unit.tree, "<string>", "exec")
+    except SyntaxError as e:
+        return syntax_error(e)
+
+    is_valid, errors = validate_unit(unit)
+    if not is_valid:
+        return ParsedError(type="ValidationError", message="; ".join(errors), category="policy")
+    return None
+
+def syntax_error(e: SyntaxError) -> ParsedError:
+    return ParsedError(
+        type=type(e).__name__,
+        message=e.msg,
+        line_number=e.lineno,
+        file="<string>",
+        category="syntax"
+    )
+
+def preflight_result(parsed_error: ParsedError, start_time: float) -> ExecutionResult:
+    """The ExecutionResult recorded for code stopped by the pre-flight stage."""
+    error = f"{parsed_error.type}: {parsed_error.message}"
+    stack_trace = error
+    if parsed_error.line_number is not None:
+        stack_trace = f'  File "<string>", line {parsed_error.line_number}\n{error}'
+    return ExecutionResult(
+        status="error",
+        output="",
+        error=error,
+        stack_trace=stack_trace,
+        execution_time=time.time() - start_time,
+        exit_code=1,
+        termination="preflight"
+    )
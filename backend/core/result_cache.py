@@ -0,0 +1,212 @@
+import os
+import re
+import ast
+import sys
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from backend.core.code_unit import parse_source
+from backend.core.limitations import (
+    RESULT_CACHE_MAX_ENTRIES,
+    RESULT_CACHE_MAX_BYTES,
+    RESULT_CACHE_TTL_SECONDS,
+    RESULT_CACHE_DIR,
+    RESULT_CACHE_DISK_MAX_ENTRIES,
+    RESULT_CACHE_EXCLUDE_TIMEOUTS,
+    RESULT_CACHE_NONDETERMINISTIC_MODULES,
+)
+from backend.models.run_response import ExecutionResult
+from backend.utils.logger import logger
+
+IMPORT_PATTERN = re.compile(r"^\s*(?:from|import)\s+([A-Za-z_][\w]*)", re.MULTILINE)
+DISK_PRUNE_INTERVAL = 100
+
+
+def cache_key(code: str, timeout: float, memory_limit_mb: int) -> str:
+    payload = json.dumps([code, timeout, memory_limit_mb, sys.version])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def imported_modules(code: str) -> set:
+    try:
+        tree = parse_source(code)
+    except SyntaxError:
+        return set(IMPORT_PATTERN.findall(code))
+
+    modules = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules.update(alias.name.split('.')[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            modules.add(node.module.split('.')[0])
+    return modules
+
+
+def is_cacheable(code: str, result: ExecutionResult) -> bool:
+    """Only deterministic outcomes are cached."""
+    if result.status == "cancelled":
+        return False
+    if result.status == "timeout" and RESULT_CACHE_EXCLUDE_TIMEOUTS:
+        return False
+    if result.exit_code < 0:
+        # Killed by a signal: depends on host load, not on the code.
+        return False
+    if result.truncation and any(info.spill_id for info in result.truncation.values()):
+        # Spill files expire before cache entries would
+        return False
+    return not (imported_modules(code) & RESULT_CACHE_NONDETERMINISTIC_MODULES)
+
+
+def _entry_size(result: ExecutionResult) -> int:
+    return len(result.output) + len(result.stack_trace or "") + len(result.error or "")
+
+
+class ResultCache:
+    """
+    Content-addressed cache of ``ExecutionResult``s.
+
+    The memory tier is an LRU bounded by entry count and total output size;
+    entries older than ``ttl`` are dropped on access. The optional disk tier
+    stores one JSON file per key so a restarted process doesn't start cold.
+    """
+
+    def __init__(self, max_entries: int = RESULT_CACHE_MAX_ENTRIES, max_bytes: int = RESULT_CACHE_MAX_BYTES,
+                 ttl: float = RESULT_CACHE_TTL_SECONDS, disk_dir: Optional[str] = RESULT_CACHE_DIR,
+                 disk_max_entries: int = RESULT_CACHE_DISK_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self.disk_max_entries = disk_max_entries
+        self._entries: "OrderedDict[str, Tuple[float, int, ExecutionResult]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._disk_writes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def get(self, key: str) -> Optional[ExecutionResult]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, _, result = entry
+                if now - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return result.model_copy(update={"cached": True})
+                self._remove(key)
+                self.expirations += 1
+
+        result, stored_at = self._disk_get(key, now)
+        with self._lock:
+            if result is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._insert(key, result, stored_at)
+        return result.model_copy(update={"cached": True})
+
+    def put(self, key: str, result: ExecutionResult) -> None:
+        now = time.time()
+        with self._lock:
+            self._insert(key, result, now)
+        self._disk_put(key, result)
+
+    def _insert(self, key: str, result: ExecutionResult, stored_at: float) -> None:
+        size = _entry_size(result)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (stored_at, size, result)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _disk_get(self, key: str, now: float) -> Tuple[Optional[ExecutionResult], float]:
+        if not self.disk_dir:
+            return None, now
+        path = self._disk_path(key)
+        try:
+            stored_at = os.path.getmtime(path)
+            if now - stored_at > self.ttl:
+                os.remove(path)
+                return None, now
+            with open(path, 'r', encoding='utf-8') as f:
+                return ExecutionResult.model_validate_json(f.read()), stored_at
+        except (OSError, ValueError):
+            return None, now
+
+    def _disk_put(self, key: str, result: ExecutionResult) -> None:
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(result.model_dump_json())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write result cache entry: {e}")
+            return
+
+        with self._lock:
+            self._disk_writes += 1
+            prune = self._disk_writes % DISK_PRUNE_INTERVAL == 0
+        if prune:
+            self._disk_prune()
+
+    def _disk_prune(self) -> None:
+        try:
+            entries = [e for e in os.scandir(self.disk_dir) if e.name.endswith(".json")]
+        except OSError:
+            return
+        now = time.time()
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        excess = len(entries) - self.disk_max_entries
+        for i, entry in enumerate(entries):
+            if i < excess or now - entry.stat().st_mtime > self.ttl:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+
+result_cache = ResultCache()
@@ -1,99 +1,242 @@
+import os
 import sys
+import json
+import signal
+import threading
 import subprocess
 import time
-import tempfile
-import os
-from backend.models.run_response import ExecutionResult
+from typing import Optional
+from backend.core.cpu_scheduler import cpu_scheduler
+from backend.core.limitations import SANDBOX_POOL_ENABLED, RESULT_CACHE_ENABLED, PROFILE_MAX_ENTRIES
+from backend.core.parser import parse_hang
+from backend.core.result_cache import result_cache, cache_key, is_cacheable
+from backend.core.sandbox_child import rusage_dict
+from backend.core.worker_pool import (
+    CHILD_SCRIPT, JobOutcome, OutputCallback, WorkerError, get_pool, read_pipes, stream_truncation
+)
+from backend.models.run_response import (
+    ExceptionInfo, ExecutionResult, HangSite, OutputTruncation, ProfileEntry, ResourceUsage
+)
+from backend.utils.logger import logger
+from backend.utils.metrics import SANDBOX_CPU, SANDBOX_EXECUTIONS, SANDBOX_MAX_RSS, SANDBOX_SPAWN
+from backend.utils.tracing import span
+
+def execute_code(code: str, timeout: int = 5, memory_limit_mb: int = 100, use_cache: bool = True,
+                 cancel: Optional[threading.Event] = None, profile: bool = False) -> ExecutionResult:
+    key = None
+    # Profiles are timings, so profiled runs are never cached
+    if use_cache and RESULT_CACHE_ENABLED and not profile:
+        key = cache_key(code, timeout, memory_limit_mb)
+        cached = result_cache.get(key)
+        if cached is not None:
+            return cached
+
+    result = _execute(code, timeout, memory_limit_mb, cancel, profile)
+    if key is not None:
+        store_result(key, code, result)
+    return result
 
-def execute_code(code: str, timeout: int = 5, memory_limit_mb: int = 100) -> ExecutionResult:
+def store_result(key: str, code: str, result: ExecutionResult) -> None:
+    if is_cacheable(code, result):
+        result_cache.put(key, result)
+
+def profile_options(profile: bool) -> Optional[dict]:
+    return {"profile": {"max_entries": PROFILE_MAX_ENTRIES}} if profile else None
+
+def _execute(code: str, timeout: int, memory_limit_mb: int, cancel: Optional[threading.Event],
+             profile: bool = False) -> ExecutionResult:
     start_time = time.time()
-    
-    # Create a temporary file for the user code
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as temp_file:
-        # We wrap the user code to restrict builtins and set memory limits
-        wrapper_code = f"""
-import sys
-import resource
-import traceback
-
-def set_memory_limit(max_mem_mb):
-    if sys.platform.startswith('linux'):
-        try:
-            soft, hard = resource.getrlimit(resource.RLIMIT_AS)
-            resource.setrlimit(resource.RLIMIT_AS, (max_mem_mb * 1024 * 1024, hard))
-        except Exception:
-            pass # Ignore if we can't set limits (e.g. not on Linux or permission issues)
-
-def restrict_builtins():
-    import builtins
-    forbidden = ['open', 'eval', 'exec', 'help', 'input']
-    for name in forbidden:
-        if hasattr(builtins, name):
+
+    with span("sandbox"):
+        # Profiling needs the worker's report pipe; the cold fallback runs unprofiled.
+        if SANDBOX_POOL_ENABLED:
             try:
-                delattr(builtins, name)
-            except AttributeError:
-                pass
+                outcome = get_pool().run(code, timeout, memory_limit_mb, cancel=cancel,
+                                         job_options=profile_options(profile))
+                return outcome_result(outcome, start_time)
+            except WorkerError as e:
+                logger.warning(f"Sandbox worker failed, falling back to a cold interpreter: {e}")
 
-if __name__ == "__main__":
-    set_memory_limit({memory_limit_mb})
-    # Save exec before restricting builtins
-    safe_exec = exec
-    restrict_builtins()
-    
-    # Execute user code
-    try:
-        user_code = {repr(code)}
-        safe_exec(user_code, {{'__name__': '__main__'}})
-    except Exception:
-        # Print exception to stderr so we can capture it
-        traceback.print_exc()
-        sys.exit(1)
-"""
-        temp_file.write(wrapper_code)
-        temp_file_path = temp_file.name
+        return _execute_cold(code, timeout, memory_limit_mb, start_time)
+
+def execute_code_streaming(code: str, timeout: int, memory_limit_mb: int, on_output: OutputCallback,
+                           cancel: Optional[threading.Event] = None, profile: bool = False) -> ExecutionResult:
+    """
+    Run ``code`` on a warm worker with unbuffered output, passing each chunk of
+    stdout/stderr to ``on_output`` as it is produced. Setting ``cancel`` kills
+    the child right away. Streaming runs are never cached.
+    """
+    start_time = time.time()
+    with span("sandbox", stream=True):
+        outcome = get_pool().run(code, timeout, memory_limit_mb, stream=True, on_output=on_output, cancel=cancel,
+                                 job_options=profile_options(profile))
+    return outcome_result(outcome, start_time)
 
+def _execute_cold(code: str, timeout: int, memory_limit_mb: int, start_time: float) -> ExecutionResult:
+    with cpu_scheduler.placement(timeout, memory_limit_mb) as placement:
+        job = {"code": code, "memory_limit_mb": memory_limit_mb, "cpu": placement.options}
+        result = _run_cold(json.dumps(job), timeout, start_time)
+        placement.record(result.resources.model_dump() if result.resources else None)
+        return result
+
+def wait_child(process: subprocess.Popen) -> dict:
+    """Reap a one-shot sandbox child with wait4 and return its resource usage."""
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return rusage_dict(usage)
+
+def _run_cold(job: str, timeout: int, start_time: float) -> ExecutionResult:
+    deadline = time.monotonic() + timeout
     try:
-        process = subprocess.run(
-            [sys.executable, temp_file_path],
-            capture_output=True,
-            text=True,
-            timeout=timeout
+        with span("spawn", cold=True):
+            process = subprocess.Popen(
+                [sys.executable, "-I", CHILD_SCRIPT],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE
+            )
+    except Exception as e:
+        return ExecutionResult(
+            status="error",
+            output="",
+            error=str(e),
+            stack_trace=str(e),
+            execution_time=time.time() - start_time,
+            exit_code=1
+        )
+
+    # Output is read into bounded buffers, not collected whole
+    with process:
+        with span("job_io"):
+            try:
+                process.stdin.write(job.encode())
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+        # The cold child still has to start its interpreter here
+        with span("user_code", cold=True):
+            output, timed_out = read_pipes(
+                {"stdout": process.stdout.fileno(), "stderr": process.stderr.fileno()}, deadline
+            )
+            if timed_out:
+                process.kill()
+            resources = ResourceUsage(**wait_child(process))
+
+    if timed_out:
+        result = build_result(124, output["stdout"].text(), output["stderr"].text(), True, start_time,
+                              resources=resources)
+    else:
+        result = build_result(process.returncode, output["stdout"].text(), output["stderr"].text(), False, start_time,
+                              resources=resources)
+    result.truncation = truncation_result(stream_truncation(output))
+    return result
+
+def truncation_result(truncation: Optional[dict]) -> Optional[dict]:
+    if not truncation:
+        return None
+    return {name: OutputTruncation(**info) for name, info in truncation.items()}
+
+def outcome_result(outcome: JobOutcome, start_time: float, stdout_prefix: str = "",
+                   stderr_prefix: str = "") -> ExecutionResult:
+    """Result of a pool or snapshot run, with what the child reported out-of-band attached."""
+    result = build_result(
+        outcome.exit_code,
+        stdout_prefix + outcome.stdout,
+        stderr_prefix + outcome.stderr,
+        outcome.timed_out,
+        start_time,
+        outcome.cancelled,
+        resources=ResourceUsage(**outcome.rusage) if outcome.rusage else None,
+        spawn_time=outcome.spawn_time,
+    )
+    result.truncation = truncation_result(outcome.truncation)
+    if outcome.timed_out and "hang" in outcome.report:
+        result.hang = HangSite(**outcome.report["hang"])
+        result.stack_trace = format_hang(result.hang)
+    if "exception" in outcome.report:
+        result.exception = ExceptionInfo(**outcome.report["exception"])
+    if "profile" in outcome.report:
+        result.profile = [ProfileEntry(**entry) for entry in outcome.report["profile"]]
+        result.profile_truncated = outcome.report["profile_truncated"]
+    return result
+
+def format_hang(hang: HangSite) -> str:
+    """The hang site as a traceback, ending in a ``Hang: ...`` line parse_error understands."""
+    lines = [f"Stack {hang.after:.2f}s into the run, shortly before the timeout (most recent call last):"]
+    for frame in hang.frames:
+        lines.append(f'  File "{frame.file}", line {frame.line}, in {frame.function}')
+        if frame.source:
+            lines.append(f"    {frame.source}")
+    lines.append(f"Hang: {parse_hang(hang).message}")
+    return "\n".join(lines)
+
+def termination_reason(exit_code: int, error: Optional[str], timed_out: bool, cancelled: bool) -> str:
+    if cancelled:
+        return "cancelled"
+    if timed_out:
+        return "timeout"
+    if error and error.startswith("MemoryError"):
+        # RLIMIT_AS makes allocations fail inside the interpreter
+        return "memory"
+    if exit_code == -signal.SIGXCPU:
+        # RLIMIT_CPU set by the CPU scheduler
+        return "cpu"
+    if exit_code < 0:
+        return "signal"
+    return "exit"
+
+def build_result(exit_code: int, stdout: str, stderr: str, timed_out: bool, start_time: float,
+                 cancelled: bool = False, resources: Optional[ResourceUsage] = None,
+                 spawn_time: Optional[float] = None) -> ExecutionResult:
+    if cancelled:
+        result = ExecutionResult(
+            status="cancelled",
+            output=stdout,
+            error="Execution cancelled",
+            stack_trace=None,
+            execution_time=time.time() - start_time,
+            exit_code=exit_code
         )
-        
-        output = process.stdout
-        stack_trace = process.stderr if process.returncode != 0 else None
-        exit_code = process.returncode
-        status = "success" if exit_code == 0 else "error"
-        
+    elif timed_out:
+        # Whatever was printed before the deadline is kept
+        result = ExecutionResult(
+            status="timeout",
+            output=stdout,
+            error="Execution timed out",
+            stack_trace=None,
+            execution_time=time.time() - start_time,
+            exit_code=124
+        )
+    else:
+        stack_trace = stderr if exit_code != 0 else None
         error_msg = None
         if stack_trace:
-            lines = stack_trace.strip().split('\\n')
+            lines = stack_trace.strip().split('\n')
             if lines:
                 error_msg = lines[-1]
 
-    except subprocess.TimeoutExpired:
-        status = "timeout"
-        output = ""
-        error_msg = "Execution timed out"
-        stack_trace = None
-        exit_code = 124
-    except Exception as e:
-        status = "error"
-        output = ""
-        error_msg = str(e)
-        stack_trace = str(e)
-        exit_code = 1
-    finally:
-        if os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
-
-    execution_time = time.time() - start_time
-    
-    return ExecutionResult(
-        status=status,
-        output=output,
-        error=error_msg,
-        stack_trace=stack_trace,
-        execution_time=execution_time,
-        exit_code=exit_code
-    )
+        result = ExecutionResult(
+            status="success" if exit_code == 0 else "error",
+            output=stdout,
+            error=error_msg,
+            stack_trace=stack_trace,
+            execution_time=time.time() - start_time,
+            exit_code=exit_code
+        )
+
+    result.termination = termination_reason(exit_code, result.error, timed_out, cancelled)
+    if result.termination == "cpu" and not result.error:
+        result.error = "CPU time limit exceeded"
+    result.resources = resources
+    result.spawn_time = spawn_time
+    record_execution(result)
+    return result
+
+def record_execution(result: ExecutionResult) -> None:
+    SANDBOX_EXECUTIONS.inc(termination=result.termination)
+    if result.spawn_time is not None:
+        SANDBOX_SPAWN.observe(result.spawn_time)
+    if result.resources is not None:
+        SANDBOX_CPU.inc(result.resources.user_cpu, mode="user")
+        SANDBOX_CPU.inc(result.resources.system_cpu, mode="system")
+        SANDBOX_MAX_RSS.observe(result.resources.max_rss_kb * 1024)
@@ -0,0 +1,521 @@
+"""
+Sandbox child runtime.
+
+This file is executed by a fresh interpreter and must only depend on the
+standard library: it never imports ``backend``. It runs in two modes:
+
+* one-shot (no arguments): a JSON job is read from stdin and executed in
+  this process.
+* zygote (``--zygote FD``): jobs arrive over the Unix socket ``FD`` together
+  with the pipes to use as stdout/stderr. Every job runs in a freshly forked
+  child, so the zygote itself never executes user code and each job starts
+  from the same clean, already-initialised interpreter.
+
+A job with a ``cpu`` section is pinned to that core, gets an RLIMIT_CPU and
+joins its cgroup before any user code runs (see ``apply_placement``).
+
+A job with ``hang_report_after`` dumps the user code's stack to the report
+pipe that many seconds in, shortly before the parent's deadline, so a run
+killed for timing out still says where it was stuck.
+
+A job with a ``checkpoint`` section runs the module one top-level statement
+at a time and forks a snapshot process at statement boundaries (see
+``Checkpointer``). A snapshot serves resume jobs on its own socket exactly
+like the zygote serves fresh ones, so a patched program can continue from
+the state just before its first changed statement.
+"""
+import io
+import ast
+import sys
+import os
+import time
+import json
+import math
+import socket
+import signal
+import struct
+import resource
+import traceback
+
+FORBIDDEN = ['open', 'eval', 'exec', 'help', 'input']
+HEADER = struct.Struct("!I")
+MAX_FDS = 8
+MAX_NAME_LENGTH = 200
+# Bounds on a reported exception
+MAX_FRAMES = 50
+MAX_CHAIN = 5
+MAX_TEXT_LENGTH = 1000
+
+
+def set_memory_limit(max_mem_mb):
+    if sys.platform.startswith('linux'):
+        try:
+            soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+            resource.setrlimit(resource.RLIMIT_AS, (max_mem_mb * 1024 * 1024, hard))
+        except Exception:
+            pass  # Ignore if we can't set limits (e.g. not on Linux or permission issues)
+
+
+def apply_placement(cpu):
+    """Join the run's cgroup, pin to its core and cap its CPU time, each only where possible."""
+    if not cpu:
+        return
+    if cpu.get("cgroup"):
+        try:
+            with open(os.path.join(cpu["cgroup"], "cgroup.procs"), "w") as f:
+                f.write("0")
+        except OSError:
+            pass
+    if cpu.get("core") is not None and hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, {cpu["core"]})
+        except OSError:
+            pass
+    if cpu.get("seconds"):
+        # SIGXCPU at the soft limit, SIGKILL a second later if it is caught
+        try:
+            soft = max(1, math.ceil(cpu["seconds"]))
+            _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+            if hard != resource.RLIM_INFINITY:
+                soft = min(soft, hard)
+            resource.setrlimit(resource.RLIMIT_CPU, (soft, soft + 1 if hard == resource.RLIM_INFINITY else hard))
+        except (ValueError, OSError):
+            pass
+
+
+def restrict_builtins():
+    import builtins
+    for name in FORBIDDEN:
+        if hasattr(builtins, name):
+            try:
+                delattr(builtins, name)
+            except AttributeError:
+                pass
+
+
+def exit_code_for(exc):
+    """Mirror the interpreter's handling of ``SystemExit`` codes."""
+    if exc.code is None:
+        return 0
+    if isinstance(exc.code, int):
+        return exc.code
+    print(exc.code, file=sys.stderr)
+    return 1
+
+
+class CountingFileIO(io.FileIO):
+    """Raw output that counts the bytes written, so a snapshot knows how much output precedes it."""
+    written = 0
+
+    def write(self, b):
+        n = super().write(b)
+        self.written += n or 0
+        return n
+
+
+def count_output():
+    out = CountingFileIO(1, 'w', closefd=False)
+    err = CountingFileIO(2, 'w', closefd=False)
+    sys.stdout = io.TextIOWrapper(io.BufferedWriter(out), encoding=sys.stdout.encoding, errors=sys.stdout.errors)
+    sys.stderr = io.TextIOWrapper(io.BufferedWriter(err), encoding=sys.stderr.encoding,
+                                  errors=sys.stderr.errors, line_buffering=True)
+    return sys.stdout, sys.stderr, out, err
+
+
+def resident_bytes():
+    try:
+        fd = os.open('/proc/self/statm', os.O_RDONLY)
+        try:
+            return int(os.read(fd, 256).split()[1]) * resource.getpagesize()
+        finally:
+            os.close(fd)
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class Checkpointer:
+    """
+    Forks snapshot processes between top-level statements: at most
+    ``max_snapshots`` per run, and only once ``min_interval`` seconds have
+    passed since the previous one, so cheap programs are never forked.
+    Every snapshot is reported on the control socket along with the amount
+    of output produced before it.
+    """
+
+    def __init__(self, control_fd, report_fd, options, outputs, elapsed=0.0):
+        self.control = socket.socket(fileno=control_fd)
+        self.report_fd = report_fd
+        self.options = options
+        self.outputs = outputs
+        self.remaining = options["max_snapshots"]
+        self.base = elapsed
+        self.started = self.last = time.monotonic()
+
+    def due(self, index):
+        return index > 0 and self.remaining > 0 and time.monotonic() - self.last >= self.options["min_interval"]
+
+    def snapshot(self, index):
+        """
+        Fork a snapshot before statement ``index``. Returns None in the running
+        process; in a child resumed from the snapshot it returns the resume
+        ``(job, fds)``.
+        """
+        stdout, stderr, out, err = self.outputs
+        stdout.flush()
+        stderr.flush()
+        keep, give = socket.socketpair()
+        pid = os.fork()
+        if pid == 0:
+            give.close()
+            self.control.close()
+            os.setpgid(0, 0)
+            # Release the run's pipes so the parent sees EOF when the run ends
+            devnull = os.open(os.devnull, os.O_WRONLY)
+            for fd in (1, 2, self.report_fd):
+                os.dup2(devnull, fd)
+            os.close(devnull)
+            forked = accept_jobs(keep)
+            if forked is None:
+                os._exit(0)
+            return forked
+
+        keep.close()
+        self.remaining -= 1
+        report = {
+            "snapshot": index,
+            "stdout": out.written,
+            "stderr": err.written,
+            "elapsed": self.base + time.monotonic() - self.started,
+            "rss": resident_bytes(),
+        }
+        try:
+            send_message(self.control, report, [give.fileno()])
+        finally:
+            give.close()
+        self.last = time.monotonic()
+        return None
+
+    def resume(self, job, fds):
+        """Wire a resumed child to the new pipes. Returns its own checkpointer."""
+        os.setpgid(0, 0)
+        for fd, target in zip(fds[:3], (1, 2, self.report_fd)):
+            os.dup2(fd, target)
+            os.close(fd)
+        return Checkpointer(fds[3], self.report_fd, job["checkpoint"], self.outputs, job["elapsed"])
+
+
+def run_statements(job, checkpointer, safe_exec):
+    """Run the module one top-level statement at a time, snapshotting between them."""
+    namespace = {'__name__': '__main__'}
+    body = ast.parse(job["code"], "<string>").body
+    index = 0
+    while index < len(body):
+        if checkpointer.due(index):
+            resumed = checkpointer.snapshot(index)
+            if resumed is not None:
+                # Update in place so the caller reports against the new source
+                job.update(resumed[0])
+                checkpointer = checkpointer.resume(job, resumed[1])
+                apply_placement(job.get("cpu"))
+                # Timers don't survive fork(); the resumed run has its own deadline
+                arm_hang_report(job, checkpointer.report_fd)
+                body = ast.parse(job["code"], "<string>").body
+        statement = ast.Module(body=[body[index]], type_ignores=[])
+        safe_exec(compile(statement, "<string>", "exec"), namespace)
+        index += 1
+
+
+def unbuffer_output():
+    """Send every write straight to the pipe so a streaming client sees it immediately."""
+    sys.stdout = io.TextIOWrapper(io.FileIO(1, 'w', closefd=False), write_through=True)
+    sys.stderr = io.TextIOWrapper(io.FileIO(2, 'w', closefd=False), write_through=True)
+
+
+def profile_table(profiler, limit):
+    """Hot spots in the user's code, by self time. Returns ``(entries, truncated)``."""
+    entries = [
+        {
+            "function": entry.code.co_name[:MAX_NAME_LENGTH],
+            "line": entry.code.co_firstlineno,
+            "calls": entry.callcount,
+            "self_time": entry.inlinetime,
+            "cumulative_time": entry.totaltime,
+        }
+        for entry in profiler.getstats()
+        if not isinstance(entry.code, str) and entry.code.co_filename == "<string>"
+    ]
+    entries.sort(key=lambda e: (e["self_time"], e["cumulative_time"]), reverse=True)
+    return entries[:limit], len(entries) > limit
+
+
+def exception_type_name(exc):
+    cls = type(exc)
+    if cls.__module__ in ("builtins", "__main__"):
+        return cls.__qualname__
+    return f"{cls.__module__}.{cls.__qualname__}"
+
+
+def exception_message(exc):
+    if isinstance(exc, SyntaxError):
+        return str(exc.msg)
+    try:
+        return str(exc)[:MAX_TEXT_LENGTH]
+    except BaseException:
+        return "<unprintable exception>"
+
+
+def describe_frames(summary, source_lines):
+    """
+    Frames below the sandbox runtime, with their source lines, as plain data.
+    Returns ``(frames, omitted)``.
+    """
+    frames = []
+    for frame in summary:
+        if frame.filename == __file__:
+            continue
+        if frame.filename == "<string>" and 0 < frame.lineno <= len(source_lines):
+            source = source_lines[frame.lineno - 1].strip()
+        else:
+            source = frame.line
+        frames.append({
+            "file": frame.filename,
+            "line": frame.lineno,
+            "function": frame.name,
+            "source": source[:MAX_TEXT_LENGTH] if source else None,
+        })
+
+    omitted = 0
+    if len(frames) > MAX_FRAMES:
+        # Deep recursion: keep where it started and where it ended
+        omitted = len(frames) - MAX_FRAMES
+        frames = frames[:MAX_FRAMES // 5] + frames[-(MAX_FRAMES - MAX_FRAMES // 5):]
+    return frames, omitted
+
+
+def innermost_user_line(frames):
+    user_lines = [frame["line"] for frame in frames if frame["file"] == "<string>"]
+    return user_lines[-1] if user_lines else None
+
+
+def describe_exception(exc, source_lines, depth=0):
+    """
+    The exception as plain data: type, message, the frames below the sandbox
+    runtime (with their source lines), the line in the user's code it points
+    at, and the exception it was raised from or during, if any.
+    """
+    frames, omitted = describe_frames(traceback.extract_tb(exc.__traceback__), source_lines)
+    line_number = None
+    if isinstance(exc, SyntaxError) and exc.filename == "<string>":
+        line_number = exc.lineno
+    else:
+        line_number = innermost_user_line(frames)
+
+    info = {
+        "type": exception_type_name(exc),
+        "message": exception_message(exc),
+        "line_number": line_number,
+        "frames": frames,
+        "frames_omitted": omitted,
+        "cause": None,
+        "relation": None,
+    }
+    chained, relation = exc.__cause__, "cause"
+    if chained is None and not exc.__suppress_context__:
+        chained, relation = exc.__context__, "context"
+    if chained is not None and depth < MAX_CHAIN:
+        info["cause"] = describe_exception(chained, source_lines, depth + 1)
+        info["relation"] = relation
+    return info
+
+
+def arm_hang_report(job, report_fd):
+    """
+    After ``hang_report_after`` seconds, flush the output so far and report
+    the stack of the running user code. The run carries on; the parent kills
+    it at its deadline, or ignores the report if it finishes in time.
+    """
+    after = job.get("hang_report_after")
+    if not after or report_fd is None:
+        return
+
+    def report_stack(signum, frame):
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except (OSError, ValueError, RuntimeError):
+                pass  # e.g. interrupted in the middle of a write to the same stream
+        frames, omitted = describe_frames(traceback.extract_stack(frame), job["code"].split('\n'))
+        write_report(report_fd, {"hang": {
+            "after": job.get("elapsed", 0.0) + after,
+            "line_number": innermost_user_line(frames),
+            "frames": frames,
+            "frames_omitted": omitted,
+        }})
+
+    signal.signal(signal.SIGALRM, report_stack)
+    signal.setitimer(signal.ITIMER_REAL, after)
+
+
+def write_report(fd, report):
+    # One JSON object per line: a hang report may precede the final one
+    data = json.dumps(report).encode() + b"\n"
+    while data:
+        data = data[os.write(fd, data):]
+
+
+def run_job(job, report_fd=None, control_fd=None):
+    """Apply the limits, strip the builtins and run the user code. Returns the exit code."""
+    if job.get("stream"):
+        unbuffer_output()
+    checkpointer = None
+    if job.get("checkpoint") and control_fd is not None:
+        checkpointer = Checkpointer(control_fd, report_fd, job["checkpoint"], count_output())
+    profiler = None
+    if job.get("profile") and report_fd is not None:
+        # Imported only when asked for, and before the builtins are stripped
+        import cProfile
+        profiler = cProfile.Profile()
+    apply_placement(job.get("cpu"))
+    set_memory_limit(job["memory_limit_mb"])
+    arm_hang_report(job, report_fd)
+    # Save exec before restricting builtins
+    safe_exec = exec
+    restrict_builtins()
+
+    report = {}
+    try:
+        if profiler is not None:
+            profiler.enable()
+        if checkpointer is not None:
+            run_statements(job, checkpointer, safe_exec)
+        else:
+            safe_exec(job["code"], {'__name__': '__main__'})
+    except SystemExit as e:
+        return exit_code_for(e)
+    except BaseException as e:
+        # Print exception to stderr so we can capture it
+        traceback.print_exc()
+        if report_fd is not None:
+            report["exception"] = describe_exception(e, job["code"].split('\n'))
+        return 1
+    finally:
+        if job.get("hang_report_after"):
+            signal.setitimer(signal.ITIMER_REAL, 0)
+        if profiler is not None:
+            profiler.disable()
+            report["profile"], report["profile_truncated"] = profile_table(profiler, job["profile"]["max_entries"])
+        if report:
+            write_report(report_fd, report)
+    return 0
+
+
+def send_message(sock, payload, fds=()):
+    data = json.dumps(payload).encode()
+    message = HEADER.pack(len(data)) + data
+    if fds:
+        sent = socket.send_fds(sock, [message], list(fds))
+        message = message[sent:]
+    sock.sendall(message)
+
+
+def recv_exactly(sock, size, fds):
+    data = b""
+    while len(data) < size:
+        chunk, new_fds, _, _ = socket.recv_fds(sock, size - len(data), MAX_FDS)
+        if not chunk:
+            return None
+        data += chunk
+        fds.extend(new_fds)
+    return data
+
+
+def recv_message(sock):
+    """Read one length-prefixed JSON message. Returns ``(payload, fds)`` or ``(None, [])`` on EOF."""
+    fds = []
+    header = recv_exactly(sock, HEADER.size, fds)
+    if header is None:
+        return None, fds
+    body = recv_exactly(sock, HEADER.unpack(header)[0], fds)
+    if body is None:
+        return None, fds
+    return json.loads(body), fds
+
+
+def run_forked(job, fds):
+    """Child side of a zygote fork: wire up the pipes, run the job and never return."""
+    code = 1
+    try:
+        os.setpgid(0, 0)
+        os.dup2(fds[0], 1)
+        os.dup2(fds[1], 2)
+        for fd in fds[:2]:
+            os.close(fd)
+        # fds[2] carries the JSON report, fds[3] (checkpoint mode) the control socket
+        code = run_job(job, *fds[2:4])
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(code & 0xFF)
+
+
+def rusage_dict(usage):
+    return {
+        "user_cpu": usage.ru_utime,
+        "system_cpu": usage.ru_stime,
+        "max_rss_kb": usage.ru_maxrss,
+        "voluntary_switches": usage.ru_nvcsw,
+        "involuntary_switches": usage.ru_nivcsw,
+    }
+
+
+def accept_jobs(sock):
+    """
+    Fork a child for every job received on ``sock`` and report its pid and
+    exit status. Returns ``(job, fds)`` in the child, or None in the parent
+    once the socket is closed.
+    """
+    while True:
+        job, fds = recv_message(sock)
+        if job is None:
+            return None
+
+        pid = os.fork()
+        if pid == 0:
+            sock.close()
+            return job, fds
+
+        for fd in fds:
+            os.close(fd)
+        # The child makes itself a group leader too, but the parent may killpg the
+        # reported pid before the child gets to run at all
+        try:
+            os.setpgid(pid, pid)
+        except OSError:
+            pass  # already exited
+        send_message(sock, {"pid": pid})
+        _, status, usage = os.wait4(pid, 0)
+        send_message(sock, {"pid": pid, "status": status, "rusage": rusage_dict(usage)})
+
+
+def serve(sock):
+    forked = accept_jobs(sock)
+    if forked is not None:
+        run_forked(*forked)
+
+
+def main():
+    if len(sys.argv) == 3 and sys.argv[1] == "--zygote":
+        serve(socket.socket(fileno=int(sys.argv[2])))
+        return
+
+    job = json.loads(sys.stdin.read())
+    code = run_job(job)
+    sys.stdout.flush()
+    sys.stderr.flush()
+    sys.exit(code)
+
+
+if __name__ == "__main__":
+    main()
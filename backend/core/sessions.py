@@ -0,0 +1,185 @@
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from backend.core.code_unit import CodeUnit
+from backend.core.limitations import SESSION_IDLE_TTL_SECONDS, SESSION_MAX_BYTES, SESSION_MAX_ENTRIES
+from backend.core.result_cache import is_cacheable
+from backend.engine.diff_apply import apply_diff
+from backend.models.run_response import ExecutionResult
+
+# (timeout, memory_limit_mb) of a run whose result a version keeps
+RunKey = Tuple[float, int]
+
+# Memory of a parsed module per byte of its source; measured at 30-70 for typical code
+AST_BYTES_PER_SOURCE_BYTE = 40
+
+
+class SessionNotFound(Exception):
+    """Unknown or expired session id. Routers turn this into a 404."""
+
+
+class VersionConflict(Exception):
+    """An update was based on a version that is no longer current. Routers turn this into a 409."""
+
+    def __init__(self, current: int):
+        super().__init__(f"Session is at version {current}")
+        self.current = current
+
+
+class CodeVersion:
+    """
+    One version of a session's code with what was derived from it: the
+    CodeUnit (AST, validation), and the last deterministic run per limits.
+    """
+
+    def __init__(self, number: int, unit: CodeUnit):
+        self.number = number
+        self.unit = unit
+        self._results: Dict[RunKey, ExecutionResult] = {}
+        self._lock = threading.Lock()
+
+    def result(self, key: RunKey) -> Optional[ExecutionResult]:
+        with self._lock:
+            result = self._results.get(key)
+        return result.model_copy(update={"cached": True}) if result is not None else None
+
+    @property
+    def size(self) -> int:
+        """
+        Bytes of code, parsed AST (estimated), per-statement validation cache
+        and stored output this version holds.
+        """
+        unit = self.unit
+        size = len(unit.source)
+        if unit.parsed and unit.tree is not None:
+            size += AST_BYTES_PER_SOURCE_BYTE * len(unit.source)
+        for segment, errors in unit.statement_errors.items():
+            size += len(segment) + sum(len(error) for error in errors)
+        with self._lock:
+            for result in self._results.values():
+                size += len(result.output) + len(result.error or "") + len(result.stack_trace or "")
+        return size
+
+    def store_result(self, key: RunKey, result: ExecutionResult) -> None:
+        if is_cacheable(self.unit.source, result):
+            with self._lock:
+                self._results[key] = result
+
+
+class EditSession:
+    """The current code of one editor, updated by whole programs or by diffs against a version."""
+
+    def __init__(self, session_id: str, code: str):
+        self.id = session_id
+        self.current = CodeVersion(1, CodeUnit(code))
+        self.last_used = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return self.current.size
+
+    def update(self, base_version: int, diff: Optional[str] = None, code: Optional[str] = None) -> CodeVersion:
+        """
+        A new version from ``code`` or from ``diff`` applied to ``base_version``,
+        which must be the current one. Raises VersionConflict if it isn't and
+        DiffError if the diff doesn't match. Analysis of the unchanged part of
+        the program is reused.
+        """
+        with self._lock:
+            current = self.current
+            if base_version != current.number:
+                raise VersionConflict(current.number)
+            new_code = code if code is not None else apply_diff(current.unit.source, diff or "", max_offset=0)
+            if new_code != current.unit.source:
+                self.current = CodeVersion(current.number + 1, current.unit.derive(new_code))
+            return self.current
+
+
+class SessionStore:
+    """
+    Editing sessions in an LRU bounded by count and total size (code, its
+    AST, validation cache and results); a session unused for ``idle_ttl``
+    seconds expires.
+    """
+
+    def __init__(self, max_entries: int = SESSION_MAX_ENTRIES, max_bytes: int = SESSION_MAX_BYTES,
+                 idle_ttl: float = SESSION_IDLE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self._sessions: "OrderedDict[str, EditSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def create(self, code: str) -> EditSession:
+        session = EditSession(uuid.uuid4().hex, code)
+        with self._lock:
+            self._expire()
+            self._sessions[session.id] = session
+            self.created += 1
+            self._evict()
+        return session
+
+    def get(self, session_id: str) -> EditSession:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                raise SessionNotFound(session_id)
+            now = time.monotonic()
+            if now - session.last_used > self.idle_ttl:
+                del self._sessions[session_id]
+                self.expired += 1
+                raise SessionNotFound(session_id)
+            session.last_used = now
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def updated(self) -> None:
+        """Re-apply the size bound after a session's code, validation or results changed."""
+        with self._lock:
+            self._evict()
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            if self._sessions.pop(session_id, None) is None:
+                raise SessionNotFound(session_id)
+
+    def _expire(self) -> None:
+        # Least recently used first, so expired sessions are at the front
+        now = time.monotonic()
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_used <= self.idle_ttl:
+                break
+            self._sessions.popitem(last=False)
+            self.expired += 1
+
+    def _evict(self) -> None:
+        total = sum(session.size for session in self._sessions.values())
+        while self._sessions and (len(self._sessions) > self.max_entries or total > self.max_bytes):
+            _, session = self._sessions.popitem(last=False)
+            total -= session.size
+            self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sessions.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "bytes": sum(session.size for session in self._sessions.values()),
+                "created": self.created,
+                "expired": self.expired,
+                "evictions": self.evictions,
+            }
+
+
+session_store = SessionStore()
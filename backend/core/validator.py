@@ -1,6 +1,8 @@
 import ast
 from typing import Tuple, List
+from backend.core.code_unit import CodeUnit
 from backend.core.limitations import FORBIDDEN_IMPORTS, FORBIDDEN_BUILTINS
+from backend.utils.tracing import span
 
 class SecurityVisitor(ast.NodeVisitor):
     def __init__(self):
@@ -24,15 +26,32 @@ class SecurityVisitor(ast.NodeVisitor):
         self.generic_visit(node)
 
 def validate_code(code: str) -> Tuple[bool, List[str]]:
-    try:
-        tree = ast.parse(code)
-    except SyntaxError as e:
-        return False, [f"Syntax Error: {e}"]
-
-    visitor = SecurityVisitor()
-    visitor.visit(tree)
-    
-    if visitor.errors:
-        return False, visitor.errors
-    
-    return True, []
+    return validate_unit(CodeUnit(code))
+
+def validate_unit(unit: CodeUnit) -> Tuple[bool, List[str]]:
+    """Validate a CodeUnit, caching the result on it (and per top-level statement)."""
+    if unit.validation is not None:
+        return unit.validation
+
+    if unit.syntax_error is not None:
+        unit.validation = (False, [f"Syntax Error: {unit.syntax_error}"])
+        return unit.validation
+
+    errors = []
+    # A fresh dict, so entries of statements that were edited away don't pile up along derive() chains
+    checked = {}
+    with span("validate"):
+        for stmt, segment in unit.top_level_statements():
+            stmt_errors = checked.get(segment)
+            if stmt_errors is None:
+                stmt_errors = unit.statement_errors.get(segment)
+            if stmt_errors is None:
+                visitor = SecurityVisitor()
+                visitor.visit(stmt)
+                stmt_errors = visitor.errors
+            checked[segment] = stmt_errors
+            errors.extend(stmt_errors)
+
+    unit.statement_errors = checked
+    unit.validation = (not errors, errors)
+    return unit.validation
@@ -0,0 +1,352 @@
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import atexit
+import selectors
+import threading
+import subprocess
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from backend.core.cpu_scheduler import cpu_scheduler
+from backend.core.limitations import HANG_REPORT_MARGIN, REPORT_MAX_BYTES, SANDBOX_POOL_SIZE, SANDBOX_WORKER_MAX_JOBS
+from backend.core.output_capture import OutputBuffer, spill_store
+from backend.core.sandbox_child import send_message, recv_message
+from backend.utils.logger import logger
+from backend.utils.tracing import span
+
+CHILD_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sandbox_child.py")
+# How often a blocked read checks whether the job was cancelled
+CANCEL_POLL_INTERVAL = 0.05
+# How long the worker gets to report the exit of a run it finished or we killed
+FINISH_TIMEOUT = 5
+
+OutputCallback = Callable[[str, bytes], None]
+
+
+class WorkerError(Exception):
+    """Raised when a pool worker dies or stops answering."""
+
+
+class JobOutcome:
+    def __init__(self, exit_code: int, stdout: str, stderr: str, timed_out: bool, cancelled: bool = False,
+                 rusage: Optional[dict] = None, spawn_time: Optional[float] = None, report: Optional[dict] = None,
+                 truncation: Optional[dict] = None, worker_lost: bool = False):
+        self.exit_code = exit_code
+        self.stdout = stdout
+        self.stderr = stderr
+        self.timed_out = timed_out
+        self.cancelled = cancelled
+        # Resource usage of the forked child alone, from wait4()
+        self.rusage = rusage
+        # Time from handing over the job until the child was running
+        self.spawn_time = spawn_time
+        # Structured data the child wrote to its report pipe (e.g. a profile)
+        self.report = report or {}
+        # Per stream ("stdout"/"stderr"), how much output was dropped from the middle
+        self.truncation = truncation or {}
+        # The worker never confirmed the end of a run we killed; it mustn't get another job
+        self.worker_lost = worker_lost
+
+    @property
+    def limit_violation(self) -> bool:
+        killed = self.exit_code < 0 and not self.cancelled
+        return self.timed_out or killed or "MemoryError" in self.stderr
+
+
+def output_buffers() -> Dict[str, OutputBuffer]:
+    """Bounded buffers for a run's stdout, stderr and report pipes."""
+    return {
+        "stdout": OutputBuffer(spill=spill_store),
+        "stderr": OutputBuffer(spill=spill_store),
+        # A report that doesn't fit is discarded by parse_report
+        "report": OutputBuffer(head_bytes=REPORT_MAX_BYTES, tail_bytes=0),
+    }
+
+
+def read_pipes(fds: Dict[str, int], deadline: float, on_output: Optional[OutputCallback] = None,
+               cancel: Optional[threading.Event] = None,
+               buffers: Optional[Dict[str, OutputBuffer]] = None) -> Tuple[Dict[str, OutputBuffer], bool]:
+    """
+    Drain the given pipes until they all reach EOF, the deadline passes or
+    ``cancel`` is set. Every chunk is also passed to ``on_output`` as it arrives.
+    Returns the output per pipe name, in bounded ``buffers`` (default: the
+    limits of ``output_buffers()``), and whether reading was cut short.
+    """
+    if buffers is None:
+        buffers = output_buffers()
+    selector = selectors.DefaultSelector()
+    for name, fd in fds.items():
+        selector.register(fd, selectors.EVENT_READ, name)
+
+    interrupted = False
+    try:
+        while selector.get_map():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or (cancel is not None and cancel.is_set()):
+                interrupted = True
+                break
+            if cancel is not None:
+                remaining = min(remaining, CANCEL_POLL_INTERVAL)
+            for key, _ in selector.select(remaining):
+                data = os.read(key.fd, 65536)
+                if data:
+                    buffers[key.data].write(data)
+                    if on_output is not None:
+                        on_output(key.data, data)
+                else:
+                    selector.unregister(key.fd)
+    finally:
+        selector.close()
+        for buffer in buffers.values():
+            buffer.close()
+
+    return buffers, interrupted
+
+
+def dispatch_job(sock: socket.socket, job: dict, timeout: float, on_output: Optional[OutputCallback] = None,
+                 cancel: Optional[threading.Event] = None, extra_fds: Sequence[int] = ()) -> JobOutcome:
+    """
+    Hand ``job`` to the forking server at the other end of ``sock`` (a zygote
+    or a checkpoint snapshot) and collect the child's output and exit status.
+    ``extra_fds`` are passed to the child after its stdout, stderr and report pipes.
+    The run is placed on a core slot, with CPU limits, by the CPU scheduler.
+    """
+    with cpu_scheduler.placement(timeout, job.get("memory_limit_mb")) as placement:
+        outcome = _dispatch(sock, {**job, "cpu": placement.options}, timeout, on_output, cancel, extra_fds)
+        placement.record(outcome.rusage)
+    return outcome
+
+
+def _dispatch(sock: socket.socket, job: dict, timeout: float, on_output: Optional[OutputCallback],
+              cancel: Optional[threading.Event], extra_fds: Sequence[int]) -> JobOutcome:
+    # The child reports where it is stuck just before the deadline
+    job = {**job, "hang_report_after": max(timeout - HANG_REPORT_MARGIN, timeout * 0.75)}
+    started = time.monotonic()
+    out_r, out_w = os.pipe()
+    err_r, err_w = os.pipe()
+    report_r, report_w = os.pipe()
+    deadline = started + timeout
+    try:
+        try:
+            with span("job_io"):
+                sock.settimeout(timeout)
+                send_message(sock, job, [out_w, err_w, report_w, *extra_fds])
+        finally:
+            os.close(out_w)
+            os.close(err_w)
+            os.close(report_w)
+        with span("spawn"):
+            pid = _receive(sock)["pid"]
+        spawn_time = time.monotonic() - started
+
+        def forward(name: str, data: bytes) -> None:
+            if name != "report":
+                on_output(name, data)
+
+        pipes = {"stdout": out_r, "stderr": err_r, "report": report_r}
+        with span("user_code") as user_code:
+            output, interrupted = read_pipes(pipes, deadline, forward if on_output else None, cancel)
+            cancelled = interrupted and cancel is not None and cancel.is_set()
+            timed_out = interrupted and not cancelled
+            if interrupted:
+                user_code.set(interrupted="cancelled" if cancelled else "timeout")
+                try:
+                    os.killpg(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+            sock.settimeout(FINISH_TIMEOUT)
+            try:
+                finished = _receive(sock)
+            except (OSError, WorkerError) as e:
+                if not interrupted:
+                    raise
+                # The run was killed for timing out or being cancelled: that is its
+                # result, not a worker failure to retry the code elsewhere for
+                logger.warning(f"Sandbox worker lost after killing its run: {e}")
+                finished = {"status": int(signal.SIGKILL), "lost": True}  # wait status: killed by SIGKILL
+            status = finished["status"]
+    except (OSError, KeyError, TypeError) as e:
+        raise WorkerError(str(e)) from e
+    finally:
+        os.close(out_r)
+        os.close(err_r)
+        os.close(report_r)
+
+    return JobOutcome(
+        exit_code=os.waitstatus_to_exitcode(status),
+        stdout=output["stdout"].text(),
+        stderr=output["stderr"].text(),
+        timed_out=timed_out,
+        cancelled=cancelled,
+        rusage=finished.get("rusage"),
+        spawn_time=spawn_time,
+        report=parse_report(output["report"]),
+        truncation=stream_truncation(output),
+        worker_lost=finished.get("lost", False),
+    )
+
+
+def parse_report(report: OutputBuffer) -> Optional[dict]:
+    """
+    Merge the JSON lines the child reported. Empty when it had nothing to
+    report; a line cut short because the child was killed is skipped.
+    """
+    if report.truncated or not report.total:
+        return None
+    merged = {}
+    for line in report.getvalue().splitlines():
+        try:
+            merged.update(json.loads(line))
+        except ValueError:
+            continue
+    return merged or None
+
+
+def stream_truncation(output: Dict[str, OutputBuffer]) -> Optional[dict]:
+    truncation = {name: output[name].truncation() for name in ("stdout", "stderr") if output[name].truncated}
+    return truncation or None
+
+
+def _receive(sock: socket.socket) -> dict:
+    message, _ = recv_message(sock)
+    if message is None:
+        raise WorkerError("sandbox worker exited unexpectedly")
+    return message
+
+
+class SandboxWorker:
+    """
+    A pre-started zygote interpreter. It forks a fresh child for every job,
+    so no state leaks between jobs while the interpreter start-up is paid once.
+    """
+
+    def __init__(self):
+        parent_sock, child_sock = socket.socketpair()
+        self.process = subprocess.Popen(
+            [sys.executable, "-I", CHILD_SCRIPT, "--zygote", str(child_sock.fileno())],
+            pass_fds=(child_sock.fileno(),),
+            stdin=subprocess.DEVNULL,
+        )
+        child_sock.close()
+        self.sock = parent_sock
+        self.jobs_run = 0
+
+    def run(self, code: str, timeout: float, memory_limit_mb: int, stream: bool = False,
+            on_output: Optional[OutputCallback] = None, cancel: Optional[threading.Event] = None,
+            job_options: Optional[dict] = None, extra_fds: Sequence[int] = ()) -> JobOutcome:
+        job = {"code": code, "memory_limit_mb": memory_limit_mb, "stream": stream, **(job_options or {})}
+        outcome = dispatch_job(self.sock, job, timeout, on_output, cancel, extra_fds)
+        self.jobs_run += 1
+        return outcome
+
+    @property
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def close(self) -> None:
+        try:
+            self.sock.close()
+        finally:
+            try:
+                self.process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+
+
+class WorkerPool:
+    """
+    Fixed-size pool of warm sandbox workers. Workers are recycled after
+    ``max_jobs`` jobs or as soon as a job hits a limit (timeout, memory, signal).
+    """
+
+    def __init__(self, size: int = SANDBOX_POOL_SIZE, max_jobs: int = SANDBOX_WORKER_MAX_JOBS):
+        self.size = max(1, size)
+        self.max_jobs = max(1, max_jobs)
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._idle: List[SandboxWorker] = []
+        self._closed = False
+
+    def start(self) -> None:
+        """Pre-start every worker so the first requests don't pay the cold start."""
+        with self._lock:
+            while len(self._idle) < self.size:
+                self._idle.append(SandboxWorker())
+
+    def run(self, code: str, timeout: float, memory_limit_mb: int, stream: bool = False,
+            on_output: Optional[OutputCallback] = None, cancel: Optional[threading.Event] = None,
+            job_options: Optional[dict] = None, extra_fds: Sequence[int] = ()) -> JobOutcome:
+        with self._slots:
+            worker = self._checkout()
+            try:
+                outcome = worker.run(code, timeout, memory_limit_mb, stream, on_output, cancel, job_options, extra_fds)
+            except WorkerError:
+                worker.close()
+                self._replace()
+                raise
+            self._checkin(worker, outcome)
+            return outcome
+
+    def _checkout(self) -> SandboxWorker:
+        with self._lock:
+            if self._closed:
+                raise WorkerError("worker pool is shut down")
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.alive:
+                    return worker
+                worker.close()
+        return SandboxWorker()
+
+    def _checkin(self, worker: SandboxWorker, outcome: JobOutcome) -> None:
+        if outcome.limit_violation or outcome.worker_lost or worker.jobs_run >= self.max_jobs:
+            worker.close()
+            self._replace()
+            return
+        with self._lock:
+            if self._closed:
+                worker.close()
+            else:
+                self._idle.append(worker)
+
+    def _replace(self) -> None:
+        # Start the replacement right away so it is warm by the next job.
+        with self._lock:
+            if not self._closed and len(self._idle) < self.size:
+                self._idle.append(SandboxWorker())
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.close()
+
+
+_pool: Optional[WorkerPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(size: int = SANDBOX_POOL_SIZE) -> WorkerPool:
+    """The process's pool, started on first use with ``size`` workers."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            logger.info(f"Starting sandbox worker pool (size={size})")
+            _pool = WorkerPool(size)
+            _pool.start()
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
@@ -1,6 +1,6 @@
 import ast
-import ast
-from typing import Optional
+from typing import Optional, Union
+from backend.core.code_unit import CodeUnit, as_unit
 
 class ASTModifier:
     """
@@ -8,11 +8,15 @@ class ASTModifier:
     """
     
     @staticmethod
-    def add_import(code: str, module_name: str) -> str:
+    def add_import(code: Union[str, CodeUnit], module_name: str) -> str:
         """
         Adds an import statement at the top of the file if not present.
         """
-        tree = ast.parse(code)
+        unit = as_unit(code)
+        code = unit.source
+        tree = unit.tree
+        if tree is None:
+            raise unit.syntax_error
         
         # Check if already imported
         for node in tree.body:
@@ -28,15 +32,16 @@ class ASTModifier:
         return f"import {module_name}\n" + code
 
     @staticmethod
-    def wrap_in_try_except(code: str, line_no: int, exception_type: str = "Exception") -> str:
+    def wrap_in_try_except(code: Union[str, CodeUnit], line_no: int, exception_type: str = "Exception") -> str:
         """
         Wraps a specific line in a try-except block.
         Note: This is a simplified string manipulation based on line number.
         True AST manipulation for this is complex because we need to preserve formatting/comments.
         """
-        lines = code.splitlines()
+        unit = as_unit(code)
+        lines = unit.lines[:]
         if line_no < 1 or line_no > len(lines):
-            return code
+            return unit.source
             
         idx = line_no - 1
         target_line = lines[idx]
@@ -48,7 +53,7 @@ class ASTModifier:
         
         new_lines = [
             f"{indent_str}try:",
-            f"    {target_line.lstrip()}",
+            f"{indent_str}    {target_line.lstrip()}",
             f"{indent_str}except {exception_type}:",
             f"{indent_str}    pass  # Handle error"
         ]
@@ -57,13 +62,14 @@ class ASTModifier:
         return "\n".join(lines)
 
     @staticmethod
-    def insert_statement(code: str, line_no: int, statement: str) -> str:
+    def insert_statement(code: Union[str, CodeUnit], line_no: int, statement: str) -> str:
         """
         Inserts a statement before the given line number.
         """
-        lines = code.splitlines()
+        unit = as_unit(code)
+        lines = unit.lines[:]
         if line_no < 1 or line_no > len(lines) + 1:
-            return code
+            return unit.source
             
         idx = line_no - 1
         
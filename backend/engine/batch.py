@@ -0,0 +1,95 @@
+import asyncio
+import threading
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import AsyncIterator, Callable, List, Optional, Sequence, Type, TypeVar
+
+from backend.core.limitations import BATCH_MAX_WORKERS
+from backend.core.sandbox import execute_code
+from backend.core.code_unit import CodeUnit
+from backend.core.validator import validate_unit
+from backend.engine.repair_loop import repair_code
+from backend.models.code_request import RunCodeRequest
+from backend.models.repair_response import RepairRequest, RepairResponse
+from backend.models.run_response import ExecutionResult
+from backend.utils.logger import logger
+
+Item = TypeVar("Item")
+
+# Each item runs in its own sandbox process (a warm pool worker); these threads
+# only feed the pool, so the fan-out is bounded by the core count.
+_executor = ThreadPoolExecutor(max_workers=BATCH_MAX_WORKERS, thread_name_prefix="batch")
+
+def run_item(request: RunCodeRequest) -> ExecutionResult:
+    is_valid, errors = validate_unit(CodeUnit(request.code))
+    if not is_valid:
+        return ExecutionResult(
+            status="error",
+            output="",
+            error="Validation Error: " + "; ".join(errors),
+            stack_trace=None,
+            execution_time=0.0,
+            exit_code=1
+        )
+    return execute_code(request.code, request.timeout, request.memory_limit_mb, request.use_cache,
+                        profile=request.profile)
+
+def repair_item(request: RepairRequest, snapshots: bool = False) -> RepairResponse:
+    return repair_code(request.code, request.max_iterations, request.timeout, request.max_candidates,
+                       request.checkpoint, request.adaptive_timeout, snapshots)
+
+def _guarded(index: int, func: Callable, request, item_cls: Type[Item]) -> Item:
+    # A failing item is reported in place; it never fails the whole batch.
+    try:
+        return item_cls(index=index, result=func(request))
+    except Exception as e:
+        logger.warning(f"Batch item {index} failed: {e}")
+        return item_cls(index=index, error=str(e))
+
+def run_batch(func: Callable, requests: Sequence, item_cls: Type[Item]) -> List[Item]:
+    """Run ``func`` over ``requests`` in parallel and return the items in input order."""
+    # Items keep the request's context (e.g. its trace) in the batch threads
+    futures = [
+        _executor.submit(contextvars.copy_context().run, _guarded, i, func, request, item_cls)
+        for i, request in enumerate(requests)
+    ]
+    return [future.result() for future in futures]
+
+async def iter_batch(func: Callable, requests: Sequence, item_cls: Type[Item],
+                     futures: Optional[List[Future]] = None) -> AsyncIterator[Item]:
+    """
+    Yield items as they complete. Items that haven't started are dropped if
+    the consumer stops early; the ones already running finish in their
+    threads. The items' futures are added to ``futures`` if given, so the
+    caller can wait for those (see ``when_done``).
+    """
+    submitted = futures if futures is not None else []
+    submitted.extend(
+        _executor.submit(contextvars.copy_context().run, _guarded, i, func, request, item_cls)
+        for i, request in enumerate(requests)
+    )
+    try:
+        for next_done in asyncio.as_completed([asyncio.wrap_future(future) for future in submitted]):
+            yield await next_done
+    finally:
+        for future in submitted:
+            future.cancel()
+
+def when_done(futures: Sequence[Future], callback: Callable[[], None]) -> None:
+    """Call ``callback`` once every future is done: right away, or in the thread finishing the last one."""
+    pending = [future for future in futures if not future.done()]
+    if not pending:
+        callback()
+        return
+    remaining = [len(pending)]
+    lock = threading.Lock()
+
+    def finished(_):
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            callback()
+
+    for future in pending:
+        future.add_done_callback(finished)
@@ -1,58 +1,80 @@
 import re
+import difflib
+from typing import List, Tuple
 
-def apply_diff(original_code: str, diff: str) -> str:
+HUNK_HEADER_PATTERN = re.compile(r'@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+
+class DiffError(ValueError):
+    """A diff that is malformed or doesn't match the code it is applied to."""
+
+def make_diff(code: str, fixed_code: str) -> str:
+    return "\n".join(difflib.unified_diff(code.split('\n'), fixed_code.split('\n'),
+                                          fromfile='original', tofile='fixed', lineterm=''))
+
+def parse_hunks(diff: str) -> List[Tuple[int, List[str]]]:
+    """
+    The hunks of a unified diff as ``(old_start, body)`` pairs, each body line
+    keeping its ' ', '-' or '+' prefix. The line counts in every header are
+    checked against its body.
+    """
+    hunks: List[Tuple[int, List[str], int, int]] = []
+    for line in diff.split('\n'):
+        match = HUNK_HEADER_PATTERN.match(line)
+        if match:
+            old_len = int(match.group(2)) if match.group(2) is not None else 1
+            new_len = int(match.group(4)) if match.group(4) is not None else 1
+            hunks.append((int(match.group(1)), [], old_len, new_len))
+        elif not hunks:
+            continue  # ---/+++ header; a removed line starting with "--" only appears inside a hunk
+        elif line.startswith((' ', '-', '+')):
+            hunks[-1][1].append(line)
+        elif line.startswith('\\') or line == '':
+            continue  # "\ No newline at end of file", or the diff's trailing newline
+        else:
+            raise DiffError(f"Unexpected line in diff: {line!r}")
+
+    for old_start, body, old_len, new_len in hunks:
+        old_count = sum(1 for line in body if line[0] != '+')
+        new_count = sum(1 for line in body if line[0] != '-')
+        if (old_count, new_count) != (old_len, new_len):
+            raise DiffError(f"Hunk at line {old_start} has {old_count}/{new_count} lines, "
+                            f"its header says {old_len}/{new_len}")
+    return [(old_start, body) for old_start, body, _, _ in hunks]
+
+def find_hunk(lines: List[str], old: List[str], expected: int, start: int, max_offset: int) -> int:
+    """Where ``old`` occurs at or after ``start``, as close to ``expected`` as possible."""
+    last = len(lines) - len(old)
+    for offset in range(max_offset + 1):
+        for pos in (expected + offset, expected - offset) if offset else (expected,):
+            if start <= pos <= last and lines[pos:pos + len(old)] == old:
+                return pos
+    raise DiffError(f"Hunk at line {expected + 1} doesn't match the code")
+
+def apply_diff(original_code: str, diff: str, max_offset: int = 100) -> str:
     """
-    Apply a unified diff to the original code.
+    Apply a unified diff to the original code. Every context and removed line
+    must match; a hunk whose lines moved is searched for up to ``max_offset``
+    lines away from where its header puts it, and later hunks keep that
+    offset. Raises DiffError if the diff doesn't apply, so a result is always
+    exactly the code the diff was made from with the change applied.
     """
     if not diff:
         return original_code
 
-    original_lines = original_code.splitlines()
-    diff_lines = diff.splitlines()
-    
-    result_lines = []
+    lines = original_code.split('\n')
+    result_lines: List[str] = []
     src_idx = 0
-    
-    i = 0
-    while i < len(diff_lines):
-        line = diff_lines[i]
-        
-        if line.startswith('---') or line.startswith('+++'):
-            i += 1
-            continue
-            
-        if line.startswith('@@'):
-            # Parse chunk header: @@ -old_start,old_len +new_start,new_len @@
-            match = re.search(r'@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@', line)
-            if match:
-                old_start = int(match.group(1))
-                # Adjust to 0-indexed
-                target_src_idx = old_start - 1
-                
-                # Copy lines from src until we reach the chunk start
-                while src_idx < target_src_idx and src_idx < len(original_lines):
-                    result_lines.append(original_lines[src_idx])
-                    src_idx += 1
-            i += 1
-            continue
-            
-        if line.startswith(' '):
-            # Context line
-            if src_idx < len(original_lines):
-                result_lines.append(original_lines[src_idx])
-                src_idx += 1
-        elif line.startswith('-'):
-            # Deleted line
-            src_idx += 1
-        elif line.startswith('+'):
-            # Added line
-            result_lines.append(line[1:])
-        
-        i += 1
-        
-    # Append any remaining lines from original
-    while src_idx < len(original_lines):
-        result_lines.append(original_lines[src_idx])
-        src_idx += 1
-        
+    shift = 0
+    for old_start, body in parse_hunks(diff):
+        old = [line[1:] for line in body if line[0] != '+']
+        # A hunk that removes nothing goes after line old_start
+        expected = (old_start if not old else old_start - 1) + shift
+        pos = find_hunk(lines, old, expected, src_idx, max_offset)
+        shift = pos - (old_start if not old else old_start - 1)
+
+        result_lines.extend(lines[src_idx:pos])
+        result_lines.extend(line[1:] for line in body if line[0] != '-')
+        src_idx = pos + len(old)
+
+    result_lines.extend(lines[src_idx:])
     return '\n'.join(result_lines)
@@ -0,0 +1,154 @@
+"""
+Worker processes for the background job queue, separate from the API:
+
+    python -m backend.engine.job_worker [--workers N] [--claim-batch N]
+
+Each worker claims a few jobs at a time, runs them one after another in its
+own warm sandbox pool, and writes the outcomes back in as few transactions
+as the jobs' durations allow.
+"""
+import os
+import sys
+import time
+import signal
+import argparse
+import threading
+import multiprocessing
+from typing import List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from backend.core.job_queue import JobQueue, get_job_queue
+from backend.core.limitations import (
+    JOB_CLAIM_BATCH,
+    JOB_CLEANUP_INTERVAL_SECONDS,
+    JOB_POLL_INTERVAL_SECONDS,
+    JOB_WORKERS,
+    JOB_WRITE_INTERVAL_SECONDS,
+    SANDBOX_POOL_ENABLED,
+)
+from backend.core.worker_pool import get_pool, shutdown_pool
+from backend.engine.batch import repair_item, run_item
+from backend.models.code_request import RunCodeRequest
+from backend.models.repair_response import RepairRequest
+from backend.utils.logger import logger
+
+# (job_id, status, result, error), as taken by JobQueue.complete
+Outcome = Tuple[str, str, Optional[dict], Optional[str]]
+
+
+class JobPayloadError(ValueError):
+    """A job that can never run: unknown kind or an invalid request."""
+
+
+def job_request(kind: str, payload: dict):
+    """The request a job's payload describes."""
+    models = {"run": RunCodeRequest, "repair": RepairRequest}
+    if kind not in models:
+        raise JobPayloadError(f"Unknown job kind: {kind}")
+    try:
+        return models[kind].model_validate(payload["request"])
+    except (KeyError, TypeError, ValidationError) as e:
+        raise JobPayloadError(f"Invalid {kind} request: {e}") from e
+
+
+def run_job(kind: str, payload: dict) -> dict:
+    """Run one job and return its result as JSON data."""
+    request = job_request(kind, payload)
+    if kind == "run":
+        return run_item(request).model_dump(mode="json")
+    return repair_item(request, payload.get("snapshots", False)).model_dump(mode="json")
+
+
+def job_outcome(job: dict) -> Outcome:
+    # A failing program is a successful job (its result says so). A bad payload
+    # fails for good; anything else is the infrastructure's fault and is retried.
+    try:
+        return job["id"], "done", run_job(job["kind"], job["payload"]), None
+    except JobPayloadError as e:
+        return job["id"], "failed", None, str(e)
+    except Exception as e:
+        logger.warning(f"Job {job['id']} attempt {job['attempts']} failed: {e}")
+        return job["id"], "retry", None, f"{type(e).__name__}: {e}"
+
+
+def work_once(queue: JobQueue, worker: str, claim_batch: int = JOB_CLAIM_BATCH) -> int:
+    """Claim and run up to ``claim_batch`` jobs. Returns how many were run."""
+    jobs = queue.claim(worker, claim_batch)
+    outcomes: List[Outcome] = []
+    flushed = time.monotonic()
+    for job in jobs:
+        outcomes.append(job_outcome(job))
+        # Quick jobs are recorded together; a slow one isn't held back behind the rest
+        if time.monotonic() - flushed >= JOB_WRITE_INTERVAL_SECONDS:
+            queue.complete(outcomes, worker)
+            outcomes = []
+            flushed = time.monotonic()
+    queue.complete(outcomes, worker)
+    return len(jobs)
+
+
+def work(queue: JobQueue, worker: str, stop: threading.Event, claim_batch: int = JOB_CLAIM_BATCH) -> None:
+    """Run jobs until ``stop`` is set, polling while the queue is empty."""
+    cleaned = 0.0
+    while not stop.is_set():
+        try:
+            ran = work_once(queue, worker, claim_batch)
+            if time.monotonic() - cleaned >= JOB_CLEANUP_INTERVAL_SECONDS:
+                removed = queue.cleanup()
+                if removed:
+                    logger.info(f"Removed {removed} expired job(s)")
+                cleaned = time.monotonic()
+        except Exception as e:
+            # e.g. the database is locked for longer than the busy timeout
+            logger.warning(f"Job worker {worker} error: {e}")
+            ran = 0
+        if not ran:
+            stop.wait(JOB_POLL_INTERVAL_SECONDS)
+
+
+def worker_main(index: int, claim_batch: int) -> None:
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    if SANDBOX_POOL_ENABLED:
+        # Jobs run one at a time, so one warm sandbox is enough
+        get_pool(size=1)
+    worker = f"{os.uname().nodename}:{os.getpid()}:{index}"
+    logger.info(f"Job worker {worker} started")
+    try:
+        work(get_job_queue(), worker, stop, claim_batch)
+    finally:
+        shutdown_pool()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m backend.engine.job_worker")
+    parser.add_argument("--workers", type=int, default=JOB_WORKERS, help="worker processes (default: %(default)s)")
+    parser.add_argument("--claim-batch", type=int, default=JOB_CLAIM_BATCH,
+                        help="jobs a worker claims at a time (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    # Create the schema once, before the workers race to
+    JobQueue().close()
+    processes = [
+        multiprocessing.Process(target=worker_main, args=(i, args.claim_batch), name=f"job-worker-{i}")
+        for i in range(max(1, args.workers))
+    ]
+    for process in processes:
+        process.start()
+
+    def stop(*_):
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for process in processes:
+        process.join()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
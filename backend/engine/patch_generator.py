@@ -1,10 +1,37 @@
+import ast
 import difflib
 import re
-from backend.core.parser import ParsedError
+from typing import List, Optional, Set, Tuple, Union
+from backend.core.code_unit import CodeUnit, as_unit
+from backend.core.limitations import LOOP_GUARD_LIMIT
+from backend.core.parser import ParsedError, recursive_function
+from backend.engine.ast_modifier import ASTModifier
+from backend.engine.static_analysis import apply_issues, find_issues
 from backend.models.patch_request import PatchResponse
+from backend.utils.tracing import traced
 
-def generate_patch(code: str, parsed_error: ParsedError) -> PatchResponse:
-    lines = code.split('\n')
+NAME_ERROR_PATTERN = re.compile(r"name '(.*?)' is not defined")
+DIVISION_PATTERN = re.compile(r'\s+/\s+')
+IDENTIFIER_PATTERN = re.compile(r'([a-zA-Z0-9_]+)')
+DEF_ARGS_PATTERN = re.compile(r"def \w+\((.*?)\):")
+SUBSCRIPT_PATTERN = re.compile(r'(\w+)\[(.*?)\]')
+INT_CONCAT_PATTERN = re.compile(r'\+ (\d+)')
+NAME_CONCAT_PATTERN = re.compile(r'\+ ([A-Za-z_]\w*)\b(?!\s*\()')
+
+# Errors the loop may fall back to catching around the failing line
+WRAPPABLE_ERRORS = {"ZeroDivisionError", "IndexError", "KeyError", "TypeError", "ValueError", "AttributeError"}
+
+def enclosing_function(unit: CodeUnit, line_number: int):
+    functions = [
+        node for node in unit.nodes_at(line_number)
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))
+    ]
+    return functions[-1] if functions else None
+
+@traced("generate_patch")
+def generate_patch(code: Union[str, CodeUnit], parsed_error: ParsedError) -> PatchResponse:
+    unit = as_unit(code)
+    lines = unit.lines
     fixed_lines = lines[:]
     reasoning = "Could not generate a patch."
     confidence = 0.0
@@ -20,7 +47,7 @@ def generate_patch(code: str, parsed_error: ParsedError) -> PatchResponse:
         
         if parsed_error.type == "NameError":
             # Message: name 'x' is not defined
-            match = re.search(r"name '(.*?)' is not defined", parsed_error.message)
+            match = NAME_ERROR_PATTERN.search(parsed_error.message)
             if match:
                 var_name = match.group(1)
                 # Insert initialization before the line
@@ -32,13 +59,13 @@ def generate_patch(code: str, parsed_error: ParsedError) -> PatchResponse:
         elif parsed_error.type == "ZeroDivisionError":
             # Try to find divisor
             # Pattern: a / b
-            parts = re.split(r'\s+/\s+', line_content)
+            parts = DIVISION_PATTERN.split(line_content)
             if len(parts) > 1:
                 # Take the token immediately after /
                 # This is a simplification
                 divisor_part = parts[1]
                 # Extract first identifier or number
-                match = re.match(r'([a-zA-Z0-9_]+)', divisor_part)
+                match = IDENTIFIER_PATTERN.match(divisor_part)
                 if match:
                     divisor = match.group(1)
                     if divisor != '0': # If it's literal 0, we can't really fix it by checking if 0 == 0
@@ -54,11 +81,15 @@ def generate_patch(code: str, parsed_error: ParsedError) -> PatchResponse:
                         confidence = 0.6
 
         elif parsed_error.type == "RecursionError":
-            # Walk back to find function def
-            for i in range(line_idx, -1, -1):
+            # Walk back to find function def, starting at the enclosing one when the AST knows it.
+            # With the sandbox's frames, that is the function repeating on the stack.
+            frame = recursive_function(parsed_error.frames) if parsed_error.frames else None
+            func = enclosing_function(unit, frame.line if frame else parsed_error.line_number)
+            search_from = func.lineno - 1 if func is not None else line_idx
+            for i in range(search_from, -1, -1):
                 if lines[i].strip().startswith("def "):
                     def_line = lines[i]
-                    args_match = re.search(r"def \w+\((.*?)\):", def_line)
+                    args_match = DEF_ARGS_PATTERN.search(def_line)
                     if args_match:
                         args = args_match.group(1).split(',')
                         if args:
@@ -75,7 +106,7 @@ def generate_patch(code: str, parsed_error: ParsedError) -> PatchResponse:
         elif parsed_error.type == "IndexError":
             # list index out of range
             # Try to find array access arr[i]
-            match = re.search(r'(\w+)\[(.*?)\]', line_content)
+            match = SUBSCRIPT_PATTERN.search(line_content)
             if match:
                 arr_name = match.group(1)
                 idx_expr = match.group(2)
@@ -94,13 +125,42 @@ def generate_patch(code: str, parsed_error: ParsedError) -> PatchResponse:
                 # Or just `print(x)` -> `print(str(x))`?
                 # The example is `print("Number: " + 42)`
                 # We can try to find `+ <int>`
-                match = re.search(r'\+ (\d+)', line_content)
+                match = INT_CONCAT_PATTERN.search(line_content)
                 if match:
                     num = match.group(1)
                     fixed_lines[line_idx] = line_content.replace(f"+ {num}", f"+ str({num})")
                     reasoning = "Converted integer to string for concatenation."
                     confidence = 0.7
 
+        elif parsed_error.type == "Hang":
+            # Timed out: the sandbox reported where it was stuck
+            fixes = hang_fixes(unit, parsed_error)
+            if fixes:
+                fixed_lines, reasoning, confidence = fixes[0]
+
+    fixed_lines, reasoning, confidence = with_static_fixes(fixed_lines, reasoning, confidence, fixed_lines != lines)
+    return build_patch_response(lines, fixed_lines, reasoning, confidence)
+
+def with_static_fixes(fixed_lines: List[str], reasoning: str, confidence: float,
+                      fixed: bool = True) -> Tuple[List[str], str, float]:
+    """
+    Also fix every other error the static pass finds in the patched code, so
+    one iteration resolves them all instead of one sandbox run each.
+    """
+    unit = CodeUnit("\n".join(fixed_lines))
+    issues = find_issues(unit)
+    if not issues:
+        return fixed_lines, reasoning, confidence
+    static_lines, applied = apply_issues(unit.lines, issues)
+    if not applied:
+        return fixed_lines, reasoning, confidence
+    reasons = [reasoning] if fixed else []
+    reasons.extend(f"Line {issue.line_number}: {issue.reasoning}" for issue in applied)
+    confidences = [confidence] if fixed else []
+    confidences.extend(issue.confidence for issue in applied)
+    return static_lines, " ".join(reasons), min(confidences)
+
+def build_patch_response(lines: List[str], fixed_lines: List[str], reasoning: str, confidence: float) -> PatchResponse:
     fixed_code = "\n".join(fixed_lines)
     
     # Generate diff
@@ -113,7 +173,7 @@ def generate_patch(code: str, parsed_error: ParsedError) -> PatchResponse:
     )
     patch_text = "\n".join(list(diff))
     
-    if fixed_code == code:
+    if fixed_lines == lines:
         confidence = 0.0
         reasoning = "No fix strategy found for this error."
 
@@ -123,3 +183,180 @@ def generate_patch(code: str, parsed_error: ParsedError) -> PatchResponse:
         fixed_code=fixed_code,
         confidence=confidence
     )
+
+@traced("patch_candidates")
+def generate_patch_candidates(code: Union[str, CodeUnit], parsed_error: ParsedError,
+                              limit: Optional[int] = None) -> List[PatchResponse]:
+    """
+    Every fix the engine can think of for this error, best first: the one
+    ``generate_patch`` returns and the alternative strategies, ranked by
+    confidence together (a likely rename outranks initialising the name).
+    The repair loop tries the first one alone, or races the first few.
+    """
+    unit = as_unit(code)
+    candidates = []
+    primary = generate_patch(unit, parsed_error)
+    if primary.confidence > 0.0:
+        candidates.append(primary)
+
+    seen = {primary.fixed_code}
+    for fixed_lines, reasoning, confidence in alternative_fixes(unit, parsed_error):
+        fixed_lines, reasoning, confidence = with_static_fixes(fixed_lines, reasoning, confidence)
+        candidate = build_patch_response(unit.lines, fixed_lines, reasoning, confidence)
+        if candidate.confidence > 0.0 and candidate.fixed_code not in seen:
+            seen.add(candidate.fixed_code)
+            candidates.append(candidate)
+
+    candidates.sort(key=lambda candidate: candidate.confidence, reverse=True)
+    return candidates[:limit] if limit else candidates
+
+def alternative_fixes(unit: CodeUnit, parsed_error: ParsedError) -> List[Tuple[List[str], str, float]]:
+    line_no = parsed_error.line_number
+    line_content = unit.line(line_no) if line_no is not None else None
+    if line_content is None:
+        return []
+
+    fixes = []
+    if parsed_error.type == "NameError":
+        match = NAME_ERROR_PATTERN.search(parsed_error.message)
+        if match:
+            var_name = match.group(1)
+            close = difflib.get_close_matches(var_name, defined_names(unit) - {var_name}, n=1, cutoff=0.75)
+            if close:
+                fixed_lines = unit.lines[:]
+                fixed_lines[line_no - 1] = re.sub(rf"\b{re.escape(var_name)}\b", close[0], line_content)
+                fixes.append((fixed_lines, f"Renamed '{var_name}' to the similarly named '{close[0]}'.", 0.85))
+
+    if parsed_error.type == "TypeError" and "concatenate str" in parsed_error.message:
+        match = NAME_CONCAT_PATTERN.search(line_content)
+        if match:
+            name = match.group(1)
+            fixed_lines = unit.lines[:]
+            fixed_lines[line_no - 1] = line_content.replace(f"+ {name}", f"+ str({name})", 1)
+            fixes.append((fixed_lines, f"Converted '{name}' to string for concatenation.", 0.5))
+
+    if parsed_error.type == "Hang":
+        fixes.extend(hang_fixes(unit, parsed_error)[1:])
+
+    if parsed_error.type in WRAPPABLE_ERRORS and is_single_line_statement(unit, line_no):
+        fixed_code = ASTModifier.wrap_in_try_except(unit, line_no, parsed_error.type)
+        fixes.append((fixed_code.split('\n'), f"Wrapped line {line_no} in try/except {parsed_error.type}.", 0.4))
+
+    return fixes
+
+def defined_names(unit: CodeUnit) -> Set[str]:
+    names = set()
+    if unit.tree is None:
+        return names
+    for node in ast.walk(unit.tree):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+            names.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, ast.arg):
+            names.add(node.arg)
+        elif isinstance(node, ast.alias):
+            names.add((node.asname or node.name).split('.')[0])
+    return names
+
+def is_single_line_statement(unit: CodeUnit, line_no: int) -> bool:
+    stmt = unit.statement_at(line_no)
+    return (
+        stmt is not None
+        and stmt.lineno == stmt.end_lineno == line_no
+        and not hasattr(stmt, "body")
+    )
+
+def hang_fixes(unit: CodeUnit, parsed_error: ParsedError) -> List[Tuple[List[str], str, float]]:
+    """
+    Fixes for code that timed out, best first: drop a sleep at the hang site,
+    advance the variable a ``while`` condition waits on, or cap the loop the
+    code was stuck in with an iteration guard.
+    """
+    user_lines = [frame.line for frame in reversed(parsed_error.frames or []) if frame.file == "<string>"]
+    if not user_lines and parsed_error.line_number is not None:
+        user_lines = [parsed_error.line_number]
+    if not user_lines or unit.tree is None:
+        return []
+
+    fixes = []
+    sleep_fix = remove_sleep(unit, user_lines[0])
+    if sleep_fix is not None:
+        fixes.append(sleep_fix)
+
+    # The innermost loop around the hang site, looking outwards through the calls
+    loop = None
+    for line_no in user_lines:
+        loops = [node for node in unit.nodes_at(line_no) if isinstance(node, (ast.While, ast.For, ast.AsyncFor))]
+        if loops:
+            loop = loops[-1]
+            break
+    if loop is not None and loop.body[0].lineno > loop.lineno:
+        header = unit.line(loop.lineno).strip()
+        counter_fix = advance_loop_variable(unit, loop, header)
+        if counter_fix is not None:
+            fixes.append(counter_fix)
+        fixes.append(guard_loop(unit, loop, header))
+
+    fixes.sort(key=lambda fix: fix[2], reverse=True)
+    return fixes
+
+def remove_sleep(unit: CodeUnit, line_no: int) -> Optional[Tuple[List[str], str, float]]:
+    stmt = unit.statement_at(line_no)
+    if stmt is None or stmt.lineno != stmt.end_lineno:
+        return None
+    line = unit.lines[line_no - 1]
+    for node in ast.walk(stmt):
+        if not (isinstance(node, ast.Call) and len(node.args) == 1 and not node.keywords):
+            continue
+        name = node.func.attr if isinstance(node.func, ast.Attribute) else getattr(node.func, "id", None)
+        arg = node.args[0]
+        if name != "sleep" or arg.lineno != line_no or not line.isascii():
+            continue
+        fixed_lines = unit.lines[:]
+        fixed_lines[line_no - 1] = line[:arg.col_offset] + "0" + line[arg.end_col_offset:]
+        return fixed_lines, f"Hang in a sleep at line {line_no}; removed the wait.", 0.6
+    return None
+
+def advance_loop_variable(unit: CodeUnit, loop: ast.AST, header: str) -> Optional[Tuple[List[str], str, float]]:
+    """``while i < n:`` whose body never assigns ``i``: step it at the end of the body."""
+    test = getattr(loop, "test", None)
+    if not (isinstance(test, ast.Compare) and len(test.ops) == 1 and isinstance(test.left, ast.Name)):
+        return None
+    if isinstance(test.ops[0], (ast.Lt, ast.LtE)):
+        step = "+= 1"
+    elif isinstance(test.ops[0], (ast.Gt, ast.GtE)):
+        step = "-= 1"
+    else:
+        return None
+
+    name = test.left.id
+    for node in loop.body:
+        for child in ast.walk(node):
+            if isinstance(child, ast.Name) and child.id == name and not isinstance(child.ctx, ast.Load):
+                return None
+            if isinstance(child, (ast.Global, ast.Nonlocal)) and name in child.names:
+                return None
+
+    last = loop.body[-1]
+    body_line = unit.lines[loop.body[0].lineno - 1]
+    indent = body_line[:len(body_line) - len(body_line.lstrip())]
+    fixed_lines = unit.lines[:]
+    fixed_lines.insert(last.end_lineno, f"{indent}{name} {step}")
+    return fixed_lines, f"Hang in loop '{header}' at line {loop.lineno}: '{name}' never changes; stepped it.", 0.65
+
+def guard_loop(unit: CodeUnit, loop: ast.AST, header: str) -> Tuple[List[str], str, float]:
+    counter = f"_loop_guard_{loop.lineno}"
+    loop_line = unit.lines[loop.lineno - 1]
+    body_line = unit.lines[loop.body[0].lineno - 1]
+    loop_indent = loop_line[:len(loop_line) - len(loop_line.lstrip())]
+    body_indent = body_line[:len(body_line) - len(body_line.lstrip())]
+    fixed_lines = unit.lines[:]
+    # Bottom-up, so the loop's line number stays valid
+    fixed_lines[loop.body[0].lineno - 1:loop.body[0].lineno - 1] = [
+        f"{body_indent}{counter} += 1",
+        f"{body_indent}if {counter} > {LOOP_GUARD_LIMIT}: break",
+    ]
+    fixed_lines.insert(loop.lineno - 1, f"{loop_indent}{counter} = 0")
+    return (fixed_lines, f"Hang in loop '{header}' at line {loop.lineno}; capped it at {LOOP_GUARD_LIMIT} iterations.",
+            0.5)
@@ -0,0 +1,228 @@
+import os
+import re
+import ast
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from backend.core.code_unit import CodeUnit
+from backend.core.limitations import PATCH_MEMO_DIR, PATCH_MEMO_DISK_MAX_ENTRIES, PATCH_MEMO_MAX_ENTRIES
+from backend.core.parser import ParsedError
+from backend.engine.diff_apply import DiffError, apply_diff, make_diff
+from backend.utils.logger import logger
+
+ADDRESS_PATTERN = re.compile(r"0x[0-9a-fA-F]+")
+DISK_PRUNE_INTERVAL = 100
+
+# Modules whose fixes the memo replays; editing any of them invalidates stored patches
+STRATEGY_MODULES = ("patch_generator.py", "static_analysis.py", "ast_modifier.py")
+
+
+def strategy_version() -> str:
+    digest = hashlib.sha256()
+    engine_dir = os.path.dirname(os.path.abspath(__file__))
+    for name in STRATEGY_MODULES:
+        with open(os.path.join(engine_dir, name), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+STRATEGY_VERSION = strategy_version()
+
+
+def normalize_message(message: str) -> str:
+    return " ".join(ADDRESS_PATTERN.sub("0x?", message).split())
+
+
+def error_context(unit: CodeUnit, line_number: Optional[int]) -> str:
+    """
+    The AST of the top-level statement holding the failing line, without
+    positions, so comments and formatting don't change it. Falls back to the
+    stripped source lines around it when the code doesn't parse.
+    """
+    if unit.tree is None:
+        if line_number is None:
+            return ""
+        return "\n".join(line.strip() for line in unit.lines[max(0, line_number - 2):line_number + 1])
+    if line_number is None:
+        return ast.dump(unit.tree)
+    for stmt in unit.tree.body:
+        if stmt.lineno <= line_number <= stmt.end_lineno:
+            return ast.dump(stmt)
+    return ""
+
+
+def fingerprint(unit: CodeUnit, parsed_error: ParsedError) -> str:
+    payload = json.dumps([
+        parsed_error.type,
+        normalize_message(parsed_error.message),
+        error_context(unit, parsed_error.line_number),
+    ])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def apply_memo_diff(code: str, diff: str) -> Optional[str]:
+    """
+    Apply a stored diff, or return None unless every context and removed
+    line matches ``code`` exactly (the hunks may have moved).
+    """
+    try:
+        return apply_diff(code, diff)
+    except DiffError:
+        return None
+
+
+class PatchMemo:
+    """
+    Verified fixes keyed by error fingerprint: the error type, its message
+    with addresses normalised away, and the AST of the statement it happened
+    in. A value is the diff from the failing code to code that later ran
+    successfully, so a recurring failure is fixed in one step.
+
+    The memory tier is an LRU bounded by entry count; the optional disk tier
+    keeps one JSON file per fingerprint. Entries recorded under a different
+    ``STRATEGY_VERSION`` are dropped when read.
+    """
+
+    def __init__(self, max_entries: int = PATCH_MEMO_MAX_ENTRIES, disk_dir: Optional[str] = PATCH_MEMO_DIR,
+                 disk_max_entries: int = PATCH_MEMO_DISK_MAX_ENTRIES, version: str = STRATEGY_VERSION):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.disk_max_entries = disk_max_entries
+        self.version = version
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+        self.invalidations = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def lookup(self, key: str, code: str) -> Optional[str]:
+        """The memoized fix applied to ``code``, or None."""
+        with self._lock:
+            diff = self._entries.get(key)
+            if diff is not None:
+                self._entries.move_to_end(key)
+        if diff is None:
+            diff = self._disk_get(key)
+            if diff is not None:
+                with self._lock:
+                    self._insert(key, diff)
+
+        fixed_code = apply_memo_diff(code, diff) if diff is not None else None
+        with self._lock:
+            if fixed_code is None or fixed_code == code:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return fixed_code
+
+    def record(self, key: str, code: str, fixed_code: str) -> None:
+        diff = make_diff(code, fixed_code)
+        with self._lock:
+            self._insert(key, diff)
+        self._disk_put(key, diff)
+
+    def reject(self, key: str) -> None:
+        """Forget a fix that didn't hold up when it was replayed."""
+        with self._lock:
+            self._entries.pop(key, None)
+            self.stale += 1
+        if self.disk_dir:
+            try:
+                os.remove(self._disk_path(key))
+            except OSError:
+                pass
+
+    def _insert(self, key: str, diff: str) -> None:
+        self._entries[key] = diff
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _disk_get(self, key: str) -> Optional[str]:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("version") != self.version:
+            with self._lock:
+                self.invalidations += 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        try:
+            # Touch it so pruning evicts least recently used entries
+            os.utime(path)
+        except OSError:
+            pass
+        return entry["diff"]
+
+    def _disk_put(self, key: str, diff: str) -> None:
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"version": self.version, "diff": diff, "stored_at": time.time()}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write patch memo entry: {e}")
+            return
+
+        with self._lock:
+            self._disk_writes += 1
+            prune = self._disk_writes % DISK_PRUNE_INTERVAL == 0
+        if prune:
+            self._disk_prune()
+
+    def _disk_prune(self) -> None:
+        try:
+            entries = [e for e in os.scandir(self.disk_dir) if e.name.endswith(".json")]
+        except OSError:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[:max(0, len(entries) - self.disk_max_entries)]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "strategy_version": self.version,
+            }
+
+
+patch_memo = PatchMemo()
@@ -1,51 +1,323 @@
+import threading
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Optional, Tuple, Union
+from backend.core.checkpoint import CheckpointSession
+from backend.core.code_unit import CodeUnit, as_unit
+from backend.core.limitations import (
+    ADAPTIVE_TIMEOUT_FACTOR, ADAPTIVE_TIMEOUT_MIN, CHECKPOINT_ENABLED, PATCH_MEMO_ENABLED, SPECULATIVE_CANDIDATES
+)
 from backend.core.sandbox import execute_code
-from backend.core.parser import parse_error
-from backend.engine.patch_generator import generate_patch
-from backend.models.repair_response import RepairResponse, RepairIteration
-
-def repair_code(code: str, max_iterations: int = 3, timeout: int = 5) -> RepairResponse:
-    iterations = []
-    current_code = code
-    repaired = False
-    
-    for i in range(max_iterations):
-        iteration_num = i + 1
-        
-        # 1. Execute
-        result = execute_code(current_code, timeout=timeout)
-        
+from backend.core.parser import ParsedError, parse_error
+from backend.core.preflight import preflight, preflight_result
+from backend.engine.patch_generator import (
+    build_patch_response, generate_patch, generate_patch_candidates, with_static_fixes
+)
+from backend.engine.patch_memo import fingerprint, patch_memo
+from backend.models.patch_request import PatchResponse
+from backend.models.repair_response import RepairResponse, RepairIteration, CandidateOutcome
+from backend.models.run_response import ExecutionResult
+from backend.utils.metrics import REPAIR_ITERATIONS
+from backend.utils.tracing import span
+
+# Candidate runs are sandboxes themselves; these threads only wait on them.
+_candidate_executor = ThreadPoolExecutor(max_workers=4 * max(1, SPECULATIVE_CANDIDATES),
+                                         thread_name_prefix="candidate")
+
+class RepairSession:
+    """
+    The repair loop, one iteration per ``step()`` call, so callers can report
+    progress between iterations or stop early. ``cancel()`` may be called from
+    another thread: it kills the running sandbox and prevents further launches.
+
+    When the patch engine offers several candidates, they are executed in
+    parallel and the winner's result becomes the next iteration's execution,
+    so a wrong first guess doesn't cost an extra serial round-trip.
+
+    Every version of the code, candidates included, first goes through the
+    in-process pre-flight stage: code that doesn't compile or fails validation
+    gets its ParsedError without a sandbox being started, and the iteration's
+    ``stage`` says so.
+
+    A failure whose fingerprint is in the patch memo gets the fix that worked
+    for it before, verified by the next iteration's run; a successful repair
+    records the final code as the fix for every error met on the way.
+
+    A run that times out is repaired from the stack the sandbox reported just
+    before the deadline. With ``adaptive_timeout``, the version after a
+    timeout runs with a shorter timeout (``ADAPTIVE_TIMEOUT_FACTOR`` of the
+    previous one, at least ``ADAPTIVE_TIMEOUT_MIN``), so a fix that still
+    hangs costs less; any other outcome restores the full timeout.
+
+    With ``checkpoint`` set, runs go through a CheckpointSession: a patched
+    program resumes from a snapshot taken before its first changed top-level
+    statement instead of re-running the unchanged prefix. ``close()`` releases
+    the snapshots.
+
+    Iterations are delta-encoded: each carries the diff from the previous
+    iteration's code, so the session holds the original code once and a
+    response can be replayed with ``apply_diff``. With ``snapshots`` set,
+    every iteration also keeps its full code and its patch's ``fixed_code``.
+    """
+
+    def __init__(self, code: Union[str, CodeUnit], max_iterations: int = 3, timeout: int = 5,
+                 max_candidates: int = SPECULATIVE_CANDIDATES, checkpoint: bool = False,
+                 adaptive_timeout: bool = True, snapshots: bool = False):
+        self.max_iterations = max_iterations
+        self.timeout = timeout
+        self.adaptive_timeout = adaptive_timeout
+        # Timeout for the runs started next
+        self.run_timeout: float = timeout
+        self.max_candidates = max(1, max_candidates)
+        # Analysis of the current version; each patch derives the next one incrementally
+        self.unit = as_unit(code)
+        self.original_code = self.unit.source
+        self.snapshots = snapshots
+        # Diff from the last recorded iteration's code to the current code
+        self._diff = ""
+        self.iterations: List[RepairIteration] = []
+        self.repaired = False
+        self.finished = False
+        self._cancel = threading.Event()
+        # Result for the current code already produced by a speculative round
+        self._pending: Optional[Tuple[ExecutionResult, Optional[ParsedError]]] = None
+        self._checkpoints = CheckpointSession() if checkpoint and CHECKPOINT_ENABLED else None
+        self._memo = patch_memo if PATCH_MEMO_ENABLED else None
+        # (fingerprint, code) of each failure the patch engine handled, recorded on success
+        self._failures: List[Tuple[str, str]] = []
+        # Fingerprint whose memoized fix the current code is
+        self._replayed: Optional[str] = None
+
+    @property
+    def current_code(self) -> str:
+        return self.unit.source
+
+    def cancel(self) -> None:
+        self._cancel.set()
+        self.finished = True
+        self.close()
+
+    def close(self) -> None:
+        if self._checkpoints is not None:
+            self._checkpoints.close()
+
+    def _execute(self, code: Union[str, CodeUnit], cancel: threading.Event) -> ExecutionResult:
+        if self._checkpoints is not None:
+            with span("sandbox", checkpoint=True):
+                return self._checkpoints.execute(code, self.run_timeout, cancel=cancel)
+        return execute_code(as_unit(code).source, timeout=self.run_timeout, cancel=cancel)
+
+    def _check(self, code: Union[str, CodeUnit],
+               cancel: threading.Event) -> Tuple[ExecutionResult, Optional[ParsedError]]:
+        """
+        Run the pre-flight stage and, if it passes, the sandbox. The ParsedError
+        is set when the pre-flight stage produced the result.
+        """
+        start_time = time.time()
+        parsed_err = preflight(code)
+        if parsed_err is not None:
+            return preflight_result(parsed_err, start_time), parsed_err
+        return self._execute(code, cancel), None
+
+    def step(self) -> Optional[RepairIteration]:
+        """Run the next iteration. Returns None once the loop is over."""
+        if self.finished or len(self.iterations) >= self.max_iterations:
+            self.finished = True
+            return None
+
+        iteration_num = len(self.iterations) + 1
+        with span("iteration", number=iteration_num):
+            return self._step(iteration_num)
+
+    def _step(self, iteration_num: int) -> Optional[RepairIteration]:
+        # 1. Pre-flight, then execute
+        run_timeout = self.run_timeout
+        pending, self._pending = self._pending, None
+        result, parsed_err = pending or self._check(self.unit, self._cancel)
+        if self._cancel.is_set():
+            return None
+
         iteration_data = RepairIteration(
             iteration=iteration_num,
-            code=current_code,
+            diff=self._diff,
+            code=self.current_code if self.snapshots else None,
             execution=result,
-            patch=None
+            patch=None,
+            stage="sandbox" if parsed_err is None else "preflight",
+            timeout=run_timeout
         )
-        
+        self.iterations.append(iteration_data)
+
         if result.status == "success":
-            repaired = True
-            iterations.append(iteration_data)
-            break
-            
+            self.repaired = True
+            self.finished = True
+            self._remember()
+            return iteration_data
+
+        if result.status == "timeout" and self.adaptive_timeout:
+            self.run_timeout = max(ADAPTIVE_TIMEOUT_MIN, min(self.timeout, run_timeout * ADAPTIVE_TIMEOUT_FACTOR))
+        else:
+            self.run_timeout = self.timeout
+
         # 2. Parse Error
-        parsed_err = parse_error(result.stack_trace or result.error)
-        
-        # 3. Generate Patch
-        patch_response = generate_patch(current_code, parsed_err)
-        iteration_data.patch = patch_response
-        iterations.append(iteration_data)
-        
+        if parsed_err is None:
+            parsed_err = parse_error(result.stack_trace or result.error, result.exception, result.hang)
+
+        # 3. Generate Patch, unless a fix was already verified for this error
+        memo_patch = self._memo_patch(parsed_err)
+        if memo_patch is not None:
+            self._apply(iteration_data, memo_patch)
+            return iteration_data
+
+        last_iteration = iteration_num >= self.max_iterations
+        # Ranked the same either way, so one candidate is the fix a race would rank first
+        candidates = generate_patch_candidates(self.unit, parsed_err,
+                                               limit=1 if last_iteration else self.max_candidates)
+
+        if len(candidates) > 1:
+            patch_response, self._pending, iteration_data.candidates = self._race(candidates)
+            if self._cancel.is_set():
+                return None
+        else:
+            patch_response = candidates[0] if candidates else generate_patch(self.unit, parsed_err)
+
         if patch_response.confidence == 0.0:
             # Cannot fix
-            break
-            
+            iteration_data.patch = self._stored(patch_response)
+            self.finished = True
+            return iteration_data
+
         # 4. Apply Patch
-        # We use fixed_code from the patch response for reliability
-        current_code = patch_response.fixed_code
-        
-    return RepairResponse(
-        status="success",
-        iterations=iterations,
-        final_code=current_code,
-        repaired=repaired,
-        total_iterations=len(iterations)
-    )
+        self._apply(iteration_data, patch_response)
+        return iteration_data
+
+    def _apply(self, iteration_data: RepairIteration, patch_response: PatchResponse) -> None:
+        # We use fixed_code from the patch response for reliability; its diff
+        # was made from the same lines, so it is also the next iteration's diff.
+        self.unit = self.unit.derive(patch_response.fixed_code)
+        self._diff = patch_response.patch
+        iteration_data.patch = self._stored(patch_response)
+
+    def _stored(self, patch_response: PatchResponse) -> PatchResponse:
+        if self.snapshots:
+            return patch_response
+        return patch_response.model_copy(update={"fixed_code": None})
+
+    def _memo_patch(self, parsed_err: ParsedError) -> Optional[PatchResponse]:
+        if self._memo is None:
+            return None
+        if self._replayed is not None:
+            # The memoized fix ran into an error of its own
+            self._memo.reject(self._replayed)
+            self._replayed = None
+
+        key = fingerprint(self.unit, parsed_err)
+        fixed_code = self._memo.lookup(key, self.current_code)
+        if fixed_code is None:
+            self._failures.append((key, self.current_code))
+            return None
+        self._replayed = key
+        # The rest of this program may differ from the one the fix was verified on
+        fixed_lines, reasoning, confidence = with_static_fixes(
+            fixed_code.split('\n'), "Reused the fix verified for this error before.", 0.95)
+        return build_patch_response(self.unit.lines, fixed_lines, reasoning, confidence)
+
+    def _remember(self) -> None:
+        if self._memo is None:
+            return
+        for key, code in self._failures:
+            self._memo.record(key, code, self.current_code)
+        self._failures = []
+        self._replayed = None
+
+    def _race(self, candidates: List[PatchResponse]) -> Tuple[PatchResponse, Tuple[ExecutionResult, Optional[ParsedError]],
+                                                              List[CandidateOutcome]]:
+        """
+        Execute all candidates at once. The best-ranked candidate that succeeds
+        wins as soon as every better-ranked one has failed, and the rest are
+        killed. If none succeeds, the one whose error occurs furthest into the
+        program wins, ties going to the higher-confidence candidate.
+        """
+        cancels = [threading.Event() for _ in candidates]
+        # Each run keeps the request's context (e.g. its trace) in the candidate thread
+        futures = {
+            _candidate_executor.submit(contextvars.copy_context().run, self._check,
+                                       self.unit.derive(candidate.fixed_code), cancel): i
+            for i, (candidate, cancel) in enumerate(zip(candidates, cancels))
+        }
+        checked: List[Optional[Tuple[ExecutionResult, Optional[ParsedError]]]] = [None] * len(candidates)
+        results: List[Optional[ExecutionResult]] = [None] * len(candidates)
+        winner = None
+        for future in as_completed(futures):
+            if future.cancelled():
+                continue
+            i = futures[future]
+            checked[i] = future.result()
+            results[i] = checked[i][0]
+            winner = self._first_success(results)
+            if winner is not None or self._cancel.is_set():
+                for cancel in cancels:
+                    cancel.set()
+                # Queued candidates never start a sandbox; running ones are killed
+                for pending in futures:
+                    pending.cancel()
+                if self._cancel.is_set():
+                    break
+
+        if winner is None:
+            winner = max(
+                (i for i, result in enumerate(results) if result is not None),
+                key=lambda i: (self._progress(*checked[i]), -i),
+                default=0,
+            )
+
+        outcomes = [
+            CandidateOutcome(
+                reasoning=candidate.reasoning,
+                confidence=candidate.confidence,
+                status=results[i].status if results[i] is not None else "cancelled",
+                accepted=i == winner,
+            )
+            for i, candidate in enumerate(candidates)
+        ]
+        return candidates[winner], checked[winner], outcomes
+
+    @staticmethod
+    def _first_success(results: List[Optional[ExecutionResult]]) -> Optional[int]:
+        for i, result in enumerate(results):
+            if result is None:
+                return None
+            if result.status == "success":
+                return i
+        return None
+
+    @staticmethod
+    def _progress(result: ExecutionResult, parsed_err: Optional[ParsedError] = None) -> int:
+        if result.status in ("timeout", "cancelled"):
+            return -1
+        if parsed_err is None:
+            parsed_err = parse_error(result.stack_trace or result.error, result.exception, result.hang)
+        return parsed_err.line_number or 0
+
+    def response(self) -> RepairResponse:
+        return RepairResponse(
+            status="success",
+            original_code=self.original_code,
+            iterations=self.iterations,
+            final_code=self.current_code,
+            repaired=self.repaired,
+            total_iterations=len(self.iterations)
+        )
+
+def repair_code(code: Union[str, CodeUnit], max_iterations: int = 3, timeout: int = 5,
+                max_candidates: int = SPECULATIVE_CANDIDATES, checkpoint: bool = False,
+                adaptive_timeout: bool = True, snapshots: bool = False) -> RepairResponse:
+    session = RepairSession(code, max_iterations, timeout, max_candidates, checkpoint, adaptive_timeout, snapshots)
+    try:
+        while session.step() is not None:
+            pass
+    finally:
+        session.close()
+    REPAIR_ITERATIONS.observe(len(session.iterations))
+    return session.response()
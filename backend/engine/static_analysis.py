@@ -0,0 +1,252 @@
+import ast
+import builtins
+import symtable
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple, Union
+from backend.core.code_unit import CodeUnit, as_unit, start_line
+
+# Globals the sandbox provides besides the builtins
+MODULE_NAMES = {"__name__", "__builtins__"}
+KNOWN_NAMES = set(dir(builtins)) | MODULE_NAMES
+
+DIVISION_OPERATORS = (ast.Div, ast.FloorDiv, ast.Mod)
+
+class StaticIssue(NamedTuple):
+    """An error found without running the code, with the edit that fixes it."""
+    type: str  # the exception the code would raise
+    line_number: int
+    reasoning: str
+    confidence: float
+    # Either a line inserted before ``line_number``...
+    insert: Optional[str] = None
+    # ...or (col_start, col_end, text) replacing part of that line, in characters
+    replace: Optional[Tuple[int, int, str]] = None
+
+def find_issues(code: Union[str, CodeUnit]) -> List[StaticIssue]:
+    """
+    Errors that are certain from the code alone: names bound nowhere in the
+    program, literal division by zero, str + number on literals and literal
+    indexes past the end of a sequence that is never modified.
+    """
+    unit = as_unit(code)
+    if unit.tree is None:
+        return []
+
+    issues = undefined_names(unit)
+    parents = parent_map(unit.tree)
+    sequences = literal_sequences(unit, parents)
+    for node in ast.walk(unit.tree):
+        if isinstance(node, (ast.BinOp, ast.AugAssign)):
+            issue = division_by_zero(unit, node) or concatenation(unit, node)
+        elif isinstance(node, ast.Subscript):
+            issue = index_out_of_range(unit, node, sequences)
+        else:
+            continue
+        if issue is not None:
+            issues.append(issue)
+    return issues
+
+def undefined_names(unit: CodeUnit) -> List[StaticIssue]:
+    """Names read somewhere in the program but bound nowhere, initialised before their first use."""
+    if any(isinstance(node, ast.ImportFrom) and any(alias.name == "*" for alias in node.names)
+           for node in ast.walk(unit.tree)):
+        return []
+    try:
+        table = symtable.symtable(unit.source, "<string>", "exec")
+    except SyntaxError:
+        return []
+
+    bound: Set[str] = set()
+    referenced: Set[str] = set()
+    scopes = [table]
+    while scopes:
+        scope = scopes.pop()
+        scopes.extend(scope.get_children())
+        is_module = scope.get_type() == "module"
+        for symbol in scope.get_symbols():
+            name = symbol.get_name()
+            if (is_module or symbol.is_declared_global()) and (symbol.is_assigned() or symbol.is_imported()):
+                bound.add(name)
+            elif symbol.is_referenced() and (is_module or symbol.is_global()):
+                referenced.add(name)
+
+    missing = referenced - bound - KNOWN_NAMES
+    if not missing:
+        return []
+
+    first_use: Dict[str, int] = {}
+    for node in ast.walk(unit.tree):
+        if isinstance(node, ast.Name) and node.id in missing and isinstance(node.ctx, ast.Load):
+            first_use[node.id] = min(first_use.get(node.id, node.lineno), node.lineno)
+
+    issues = []
+    for name, line in sorted(first_use.items(), key=lambda item: (item[1], item[0])):
+        # Initialise at module level, before the top-level statement using it first,
+        # so every function that reads it sees the same global.
+        stmt = next(stmt for stmt in unit.tree.body if start_line(stmt) <= line <= stmt.end_lineno)
+        issues.append(StaticIssue(
+            type="NameError",
+            line_number=start_line(stmt),
+            reasoning=f"Initialized undefined variable '{name}' to 0.",
+            confidence=0.8,
+            insert=f"{name} = 0  # Auto-initialized",
+        ))
+    return issues
+
+def division_by_zero(unit: CodeUnit, node: Union[ast.BinOp, ast.AugAssign]) -> Optional[StaticIssue]:
+    divisor = node.right if isinstance(node, ast.BinOp) else node.value
+    if not isinstance(node.op, DIVISION_OPERATORS) or not is_number(divisor) or divisor.value != 0:
+        return None
+    if isinstance(node.op, ast.Mod) and not (isinstance(node, ast.BinOp) and is_number(node.left)):
+        # "%d" % 0 is formatting
+        return None
+    return replacement(unit, divisor, "1", "ZeroDivisionError",
+                       "Replaced literal division by zero with division by one.", 0.6)
+
+def concatenation(unit: CodeUnit, node: Union[ast.BinOp, ast.AugAssign]) -> Optional[StaticIssue]:
+    if not isinstance(node, ast.BinOp) or not isinstance(node.op, ast.Add):
+        return None
+    left, right = literal_type(node.left), literal_type(node.right)
+    if left is str and right in (int, float):
+        number = node.right
+    elif right is str and left in (int, float):
+        number = node.left
+    else:
+        return None
+    text = segment(unit, number)
+    if text is None:
+        return None
+    return replacement(unit, number, f"str({text})", "TypeError",
+                       "Converted number to string for concatenation.", 0.7)
+
+def index_out_of_range(unit: CodeUnit, node: ast.Subscript,
+                       sequences: Dict[str, int]) -> Optional[StaticIssue]:
+    if not isinstance(node.ctx, ast.Load) or not is_number(node.slice) or not isinstance(node.slice.value, int):
+        return None
+    if isinstance(node.value, ast.Name):
+        length = sequences.get(node.value.id)
+    else:
+        length = sequence_length(node.value)
+    index = node.slice.value
+    if length is None or -length <= index < length:
+        return None
+
+    container, text = segment(unit, node.value), segment(unit, node)
+    if container is None or text is None:
+        return None
+    guard = f"({text} if {index} < len({container}) else None)" if index >= 0 \
+        else f"({text} if {-index} <= len({container}) else None)"
+    return replacement(unit, node, guard, "IndexError",
+                       f"Added bounds check for index {index} of '{container}'.", 0.6)
+
+def literal_sequences(unit: CodeUnit, parents: Dict[ast.AST, ast.AST]) -> Dict[str, int]:
+    """
+    Module-level names bound exactly once, to a literal sequence, and only
+    ever read by constant subscripts, so their length is known everywhere.
+    """
+    lengths: Dict[str, int] = {}
+    bindings: Dict[str, int] = {}
+    for node in ast.walk(unit.tree):
+        if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+            bindings[node.id] = bindings.get(node.id, 0) + 1
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            bindings[node.name] = bindings.get(node.name, 0) + 1
+        elif isinstance(node, ast.arg):
+            bindings[node.arg] = bindings.get(node.arg, 0) + 1
+        elif isinstance(node, ast.alias):
+            name = (node.asname or node.name).split('.')[0]
+            bindings[name] = bindings.get(name, 0) + 1
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            for name in node.names:
+                bindings[name] = bindings.get(name, 0) + 2
+
+    for stmt in unit.tree.body:
+        if (isinstance(stmt, ast.Assign) and len(stmt.targets) == 1 and isinstance(stmt.targets[0], ast.Name)
+                and bindings.get(stmt.targets[0].id) == 1):
+            length = sequence_length(stmt.value)
+            if length is not None:
+                lengths[stmt.targets[0].id] = length
+
+    for node in ast.walk(unit.tree):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load) and node.id in lengths:
+            parent = parents.get(node)
+            if not (isinstance(parent, ast.Subscript) and parent.value is node and is_number(parent.slice)
+                    and not isinstance(parent.ctx, ast.Del)):
+                # Passed around, iterated, or a method called on it: it may change
+                del lengths[node.id]
+    return lengths
+
+def sequence_length(node: ast.AST) -> Optional[int]:
+    if isinstance(node, (ast.List, ast.Tuple)) and not any(isinstance(e, ast.Starred) for e in node.elts):
+        return len(node.elts)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (str, bytes)):
+        return len(node.value)
+    return None
+
+def literal_type(node: ast.AST) -> Optional[type]:
+    if isinstance(node, ast.Constant) and not isinstance(node.value, bool):
+        return type(node.value)
+    if isinstance(node, ast.JoinedStr):
+        return str
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+        left, right = literal_type(node.left), literal_type(node.right)
+        if left is str and right is str:
+            return str
+    return None
+
+def is_number(node: ast.AST) -> bool:
+    return isinstance(node, ast.Constant) and type(node.value) in (int, float)
+
+def parent_map(tree: ast.AST) -> Dict[ast.AST, ast.AST]:
+    return {child: node for node in ast.walk(tree) for child in ast.iter_child_nodes(node)}
+
+def segment(unit: CodeUnit, node: ast.AST) -> Optional[str]:
+    """Source text of a node on a single line."""
+    span = char_span(unit, node)
+    if span is None:
+        return None
+    return unit.line(node.lineno)[span[0]:span[1]]
+
+def char_span(unit: CodeUnit, node: ast.AST) -> Optional[Tuple[int, int]]:
+    if node.lineno != node.end_lineno:
+        return None
+    line = unit.line(node.lineno)
+    if line is None:
+        return None
+    # AST offsets count UTF-8 bytes
+    encoded = line.encode()
+    return len(encoded[:node.col_offset].decode()), len(encoded[:node.end_col_offset].decode())
+
+def replacement(unit: CodeUnit, node: ast.AST, text: str, error_type: str, reasoning: str,
+                confidence: float) -> Optional[StaticIssue]:
+    span = char_span(unit, node)
+    if span is None:
+        return None
+    return StaticIssue(type=error_type, line_number=node.lineno, reasoning=reasoning,
+                       confidence=confidence, replace=(span[0], span[1], text))
+
+def apply_issues(lines: List[str], issues: List[StaticIssue]) -> Tuple[List[str], List[StaticIssue]]:
+    """
+    Apply the fixes bottom-up so earlier line numbers stay valid. Replacements
+    overlapping one already applied are skipped (the next pass sees them
+    again); returns the new lines and the issues actually fixed.
+    """
+    fixed_lines = lines[:]
+    applied = []
+    taken: Dict[int, List[Tuple[int, int]]] = {}
+    # On one line, replacements go right to left; insertions come last so they don't shift the line
+    for issue in sorted(reversed(issues), key=lambda i: (i.line_number, i.replace is not None, i.replace[0] if i.replace else 0),
+                        reverse=True):
+        index = issue.line_number - 1
+        if issue.replace is not None:
+            start, end, text = issue.replace
+            if any(start < other_end and other_start < end for other_start, other_end in taken.get(index, [])):
+                continue
+            taken.setdefault(index, []).append((start, end))
+            line = fixed_lines[index]
+            fixed_lines[index] = line[:start] + text + line[end:]
+        else:
+            indent = fixed_lines[index][:len(fixed_lines[index]) - len(fixed_lines[index].lstrip())]
+            fixed_lines.insert(index, indent + issue.insert)
+        applied.append(issue)
+    applied.reverse()
+    return fixed_lines, applied
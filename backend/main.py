@@ -1,16 +1,59 @@
-from fastapi import FastAPI
-from backend.routers import run_code, patch, repair
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from backend.core.admission import AdmissionRejected
+from backend.core.limitations import SANDBOX_POOL_ENABLED
+from backend.core.worker_pool import get_pool, shutdown_pool
+from backend.routers import run_code, patch, repair, batch, stats, metrics, output, sessions, jobs
+from backend.utils.compression import CompressionMiddleware
+from backend.utils.metrics import RequestTimingMiddleware
+from backend.utils.serialization import FastJSONResponse
+from backend.utils.tracing import TracingMiddleware
 
-app = FastAPI(title="ReCodeX Backend", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The warm sandbox pool lives as long as the app
+    if SANDBOX_POOL_ENABLED:
+        get_pool()
+    try:
+        yield
+    finally:
+        shutdown_pool()
+
+app = FastAPI(title="ReCodeX Backend", version="1.0.0", default_response_class=FastJSONResponse, lifespan=lifespan)
+
+# Added first, so the timing middleware below also covers compression
+app.add_middleware(CompressionMiddleware)
+
+app.add_middleware(
+    RequestTimingMiddleware,
+    endpoints=["/run", "/run/stream", "/run/batch", "/patch", "/repair", "/repair/stream", "/repair/batch"]
+)
+
+# Outermost, so Server-Timing covers everything below and the request id is set first
+app.add_middleware(TracingMiddleware)
 
 app.include_router(run_code.router)
 app.include_router(patch.router)
 app.include_router(repair.router)
+app.include_router(batch.router)
+app.include_router(stats.router)
+app.include_router(metrics.router)
+app.include_router(output.router)
+app.include_router(sessions.router)
+app.include_router(jobs.router)
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    return FastJSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
 
 @app.get("/health")
-def health_check():
+async def health_check():
     return {
         "status": "healthy",
         "version": "1.0.0",
-        "endpoints": ["/run", "/patch", "/repair"]
+        "endpoints": ["/run", "/patch", "/repair", "/run/batch", "/repair/batch", "/stats", "/metrics", "/output/{id}", "/sessions", "/jobs"]
     }
@@ -0,0 +1,27 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from .code_request import RunCodeRequest
+from .run_response import ExecutionResult
+from .repair_response import RepairRequest, RepairResponse
+
+class BatchRunRequest(BaseModel):
+    items: List[RunCodeRequest]
+
+class BatchRunItem(BaseModel):
+    index: int
+    result: Optional[ExecutionResult] = None
+    error: Optional[str] = None
+
+class BatchRunResponse(BaseModel):
+    results: List[BatchRunItem]
+
+class BatchRepairRequest(BaseModel):
+    items: List[RepairRequest]
+
+class BatchRepairItem(BaseModel):
+    index: int
+    result: Optional[RepairResponse] = None
+    error: Optional[str] = None
+
+class BatchRepairResponse(BaseModel):
+    results: List[BatchRepairItem]
@@ -5,3 +5,5 @@ class RunCodeRequest(BaseModel):
     language: str = "python"
     timeout: int = 5
     memory_limit_mb: int = 100
+    use_cache: bool = True
+    profile: bool = False
@@ -0,0 +1,25 @@
+from pydantic import BaseModel
+from typing import Any, Optional
+from .code_request import RunCodeRequest
+from .repair_response import RepairRequest
+
+class JobSubmitRequest(BaseModel):
+    # Exactly one of the two
+    run: Optional[RunCodeRequest] = None
+    repair: Optional[RepairRequest] = None
+    snapshots: bool = False  # repair only: keep whole programs in its iterations
+    priority: int = 0  # higher runs first
+    max_attempts: Optional[int] = None  # default: JOB_MAX_ATTEMPTS
+
+class JobInfo(BaseModel):
+    job_id: str
+    kind: str
+    status: str  # queued, running, done, failed, cancelled
+    priority: int
+    attempts: int
+    max_attempts: int
+    created: float
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    error: Optional[str] = None
+    result: Optional[Any] = None  # an ExecutionResult or a RepairResponse, once done
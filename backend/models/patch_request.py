@@ -1,13 +1,20 @@
 from pydantic import BaseModel
+from typing import Optional
+from .run_response import ExceptionInfo, HangSite
 
 class PatchRequest(BaseModel):
     code: str
     error: str
     stack_trace: str
     output: str = ""
+    # ExecutionResult.exception from /run, preferred over parsing stack_trace
+    exception: Optional[ExceptionInfo] = None
+    # ExecutionResult.hang from a run that timed out
+    hang: Optional[HangSite] = None
 
 class PatchResponse(BaseModel):
     patch: str
     reasoning: str
-    fixed_code: str
+    # Left out of repair iterations without snapshots: it is the next iteration's code
+    fixed_code: Optional[str] = None
     confidence: float
@@ -1,5 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
+from backend.core.limitations import MAX_SPECULATIVE_CANDIDATES, SPECULATIVE_CANDIDATES
 from .run_response import ExecutionResult
 from .patch_request import PatchResponse
 
@@ -7,15 +8,30 @@ class RepairRequest(BaseModel):
     code: str
     max_iterations: int = 3
     timeout: int = 5
+    max_candidates: int = Field(SPECULATIVE_CANDIDATES, ge=1, le=MAX_SPECULATIVE_CANDIDATES)
+    checkpoint: bool = False  # resume unchanged prefixes from forked snapshots
+    adaptive_timeout: bool = True  # shorter timeout for the version after one that timed out
+
+class CandidateOutcome(BaseModel):
+    reasoning: str
+    confidence: float
+    status: str  # execution status, "cancelled" if it lost the race
+    accepted: bool = False
 
 class RepairIteration(BaseModel):
     iteration: int
-    code: str
+    # Unified diff from the previous iteration's code (the original code for the first)
+    diff: str = ""
+    code: Optional[str] = None  # full snapshot, only when requested
     execution: ExecutionResult
     patch: Optional[PatchResponse] = None
+    candidates: Optional[List[CandidateOutcome]] = None
+    stage: str = "sandbox"  # "preflight" when the error was found without running the code
+    timeout: Optional[float] = None  # the run's timeout, shorter after a timeout when adaptive
 
 class RepairResponse(BaseModel):
     status: str
+    original_code: str
     iterations: List[RepairIteration]
     final_code: str
     repaired: bool
@@ -1,10 +1,67 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, List, Optional
+
+class ResourceUsage(BaseModel):
+    user_cpu: float  # seconds
+    system_cpu: float  # seconds
+    max_rss_kb: int
+    voluntary_switches: int
+    involuntary_switches: int
+
+class ProfileEntry(BaseModel):
+    function: str
+    line: int
+    calls: int
+    self_time: float  # seconds
+    cumulative_time: float  # seconds
+
+class ExceptionFrame(BaseModel):
+    file: str
+    line: int
+    function: str
+    source: Optional[str] = None
+
+class ExceptionInfo(BaseModel):
+    type: str
+    message: str
+    line_number: Optional[int] = None  # innermost line in the submitted code
+    frames: List[ExceptionFrame] = []
+    frames_omitted: int = 0  # frames dropped from the middle of a deep stack
+    cause: Optional["ExceptionInfo"] = None
+    relation: Optional[str] = None  # "cause" (raise ... from) or "context" (raised while handling)
+
+class HangSite(BaseModel):
+    after: float  # seconds into the run when the stack was taken
+    line_number: Optional[int] = None  # innermost line in the submitted code
+    frames: List[ExceptionFrame] = []
+    frames_omitted: int = 0
+
+class OutputTruncation(BaseModel):
+    total_bytes: int  # what the run printed
+    kept_bytes: int  # the head and tail kept in ``output``/``stack_trace``
+    spill_id: Optional[str] = None  # GET /output/{spill_id} returns the whole stream
+    spilled_bytes: Optional[int] = None  # how much of it the spill file holds
 
 class ExecutionResult(BaseModel):
-    status: str  # "success" | "error" | "timeout"
+    status: str  # "success" | "error" | "timeout" | "cancelled"
     output: str
     error: Optional[str] = None
     stack_trace: Optional[str] = None
     execution_time: float
     exit_code: int
+    cached: bool = False
+    # "exit" | "timeout" | "memory" | "cpu" | "signal" | "cancelled"
+    termination: Optional[str] = None
+    # Sandbox overhead before the user code started (warm pool only)
+    spawn_time: Optional[float] = None
+    # Usage of the sandboxed process alone (from wait4, warm pool and cold runs)
+    resources: Optional[ResourceUsage] = None
+    # Hot spots in the user's code, when the run was profiled
+    profile: Optional[List[ProfileEntry]] = None
+    profile_truncated: Optional[bool] = None
+    # The uncaught exception as reported by the sandbox (warm pool only)
+    exception: Optional[ExceptionInfo] = None
+    # Where the code was stuck shortly before it timed out (warm pool only)
+    hang: Optional[HangSite] = None
+    # Streams ("stdout"/"stderr") whose middle was dropped to bound memory
+    truncation: Optional[Dict[str, OutputTruncation]] = None
@@ -0,0 +1,42 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from backend.core.limitations import MAX_SPECULATIVE_CANDIDATES, SPECULATIVE_CANDIDATES
+from .run_response import ExceptionInfo, HangSite
+
+class SessionCreateRequest(BaseModel):
+    code: str
+
+class SessionUpdateRequest(BaseModel):
+    base_version: int  # the version the diff was made against; must be current
+    diff: Optional[str] = None  # unified diff, e.g. from difflib.unified_diff(..., lineterm='')
+    code: Optional[str] = None  # the whole program instead of a diff
+
+class SessionInfo(BaseModel):
+    session_id: str
+    version: int
+    length: int
+    valid: bool
+    errors: List[str] = []
+    code: Optional[str] = None  # only from GET
+
+class SessionRunRequest(BaseModel):
+    version: Optional[int] = None  # fail with 409 unless this is still the current version
+    timeout: int = 5
+    memory_limit_mb: int = 100
+    use_cache: bool = True
+    profile: bool = False
+
+class SessionPatchRequest(BaseModel):
+    version: Optional[int] = None
+    error: str
+    stack_trace: str
+    exception: Optional[ExceptionInfo] = None
+    hang: Optional[HangSite] = None
+
+class SessionRepairRequest(BaseModel):
+    version: Optional[int] = None
+    max_iterations: int = 3
+    timeout: int = 5
+    max_candidates: int = Field(SPECULATIVE_CANDIDATES, ge=1, le=MAX_SPECULATIVE_CANDIDATES)
+    checkpoint: bool = False
+    adaptive_timeout: bool = True
@@ -0,0 +1,78 @@
+import asyncio
+from concurrent.futures import Future
+from functools import partial
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException
+from backend.core.admission import AdmittedStreamingResponse, admission
+from backend.core.async_sandbox import run_blocking
+from backend.core.limitations import BATCH_MAX_WORKERS, MAX_BATCH_SIZE
+from backend.engine.batch import iter_batch, repair_item, run_batch, run_item, when_done
+from backend.models.batch_request import (
+    BatchRepairItem, BatchRepairRequest, BatchRepairResponse,
+    BatchRunItem, BatchRunRequest, BatchRunResponse,
+)
+from backend.utils.logger import logger
+from backend.utils.serialization import ResponseFields, shaped_json, shaped_response
+
+router = APIRouter()
+
+def check_size(items) -> None:
+    if len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {MAX_BATCH_SIZE} items")
+
+def batch_slots(items) -> int:
+    # A batch holds a slot for every item it can run at once
+    return max(1, min(len(items), BATCH_MAX_WORKERS))
+
+def ndjson_response(func, items, item_cls, shape: ResponseFields, slots: int) -> AdmittedStreamingResponse:
+    """
+    Stream one JSON line per item, in completion order (each line carries its
+    ``index``). ``fields``/``exclude`` paths are relative to the item.
+    The batch's ``slots`` are released once the items still running when the
+    response ends have returned.
+    """
+    loop = asyncio.get_running_loop()
+    futures: List[Future] = []
+
+    async def lines():
+        async for item in iter_batch(func, items, item_cls, futures):
+            yield shaped_json(item, shape) + "\n"
+
+    def release() -> None:
+        when_done(futures, partial(loop.call_soon_threadsafe, admission.release, slots))
+
+    return AdmittedStreamingResponse(lines(), media_type="application/x-ndjson", release=release)
+
+@router.post("/run/batch", response_model=BatchRunResponse)
+async def run_batch_endpoint(request: BatchRunRequest, stream: bool = False,
+                             shape: ResponseFields = Depends()):
+    logger.info(f"Received batch run request with {len(request.items)} items")
+    check_size(request.items)
+
+    # The batch is admitted once, for as many slots as it runs items at a time
+    slots = batch_slots(request.items)
+    await admission.acquire(slots)
+    if stream:
+        return ndjson_response(run_item, request.items, BatchRunItem, shape, slots)
+    try:
+        results = await run_blocking(run_batch, run_item, request.items, BatchRunItem)
+    finally:
+        admission.release(slots)
+    return shaped_response(BatchRunResponse(results=results), shape)
+
+@router.post("/repair/batch", response_model=BatchRepairResponse)
+async def repair_batch_endpoint(request: BatchRepairRequest, stream: bool = False, snapshots: bool = False,
+                                shape: ResponseFields = Depends()):
+    logger.info(f"Received batch repair request with {len(request.items)} items")
+    check_size(request.items)
+
+    repair = partial(repair_item, snapshots=snapshots)
+    slots = batch_slots(request.items)
+    await admission.acquire(slots)
+    if stream:
+        return ndjson_response(repair, request.items, BatchRepairItem, shape, slots)
+    try:
+        results = await run_blocking(run_batch, repair, request.items, BatchRepairItem)
+    finally:
+        admission.release(slots)
+    return shaped_response(BatchRepairResponse(results=results), shape)
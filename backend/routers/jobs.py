@@ -0,0 +1,57 @@
+import time
+import asyncio
+from fastapi import APIRouter, HTTPException, Query
+from starlette.concurrency import run_in_threadpool
+from backend.core.job_queue import get_job_queue
+from backend.core.limitations import JOB_MAX_ATTEMPTS, JOB_MAX_WAIT_SECONDS, JOB_POLL_INTERVAL_SECONDS
+from backend.models.job import JobInfo, JobSubmitRequest
+from backend.utils.logger import logger
+
+router = APIRouter()
+
+FINISHED = ("done", "failed", "cancelled")
+
+def job_info(job: dict) -> JobInfo:
+    return JobInfo(job_id=job.pop("id"), **job)
+
+def get_job(job_id: str) -> dict:
+    job = get_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job")
+    return job
+
+@router.post("/jobs", response_model=JobInfo, status_code=202)
+def submit_job_endpoint(request: JobSubmitRequest):
+    """
+    Queue a run or a repair for the job workers (python -m backend.engine.job_worker).
+    Returns once the job is stored, so it survives a restart of the API.
+    """
+    if (request.run is None) == (request.repair is None):
+        raise HTTPException(status_code=422, detail="Send exactly one of 'run' and 'repair'")
+    if request.run is not None:
+        kind, payload = "run", {"request": request.run.model_dump()}
+    else:
+        kind, payload = "repair", {"request": request.repair.model_dump(), "snapshots": request.snapshots}
+    queue = get_job_queue()
+    job_id = queue.submit(kind, payload, request.priority, request.max_attempts or JOB_MAX_ATTEMPTS)
+    logger.info(f"Queued {kind} job {job_id} (priority {request.priority})")
+    return job_info(queue.get(job_id))
+
+@router.get("/jobs/{job_id}", response_model=JobInfo)
+async def get_job_endpoint(job_id: str, wait: float = Query(0, ge=0, description="Seconds to wait for the job to finish")):
+    """The job's status, and its result once done. With ``wait``, returns as soon as it finishes."""
+    deadline = time.monotonic() + min(wait, JOB_MAX_WAIT_SECONDS)
+    # The lookups hit SQLite, which may be waiting on a writer; the wait in between stays on the loop
+    job = await run_in_threadpool(get_job, job_id)
+    while job["status"] not in FINISHED and time.monotonic() < deadline:
+        await asyncio.sleep(JOB_POLL_INTERVAL_SECONDS)
+        job = await run_in_threadpool(get_job, job_id)
+    return job_info(job)
+
+@router.delete("/jobs/{job_id}", response_model=JobInfo)
+def cancel_job_endpoint(job_id: str):
+    """Cancel a queued job; 409 once it has started."""
+    if not get_job_queue().cancel(job_id):
+        job = get_job(job_id)
+        raise HTTPException(status_code=409, detail={"message": f"Job is {job['status']}", "status": job["status"]})
+    return job_info(get_job(job_id))
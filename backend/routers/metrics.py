@@ -0,0 +1,36 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from backend.core.admission import admission
+from backend.core.cpu_scheduler import cpu_scheduler
+from backend.core.result_cache import result_cache
+from backend.engine.patch_memo import patch_memo
+from backend.utils.metrics import Gauge, LabeledGauge, registry
+
+router = APIRouter()
+
+registry.register(Gauge(
+    "recodex_admission_in_flight", "Requests currently holding an admission slot.",
+    lambda: admission.stats()["in_flight"]))
+registry.register(Gauge(
+    "recodex_admission_queue_depth", "Requests waiting for an admission slot.",
+    lambda: admission.stats()["queue_depth"]))
+registry.register(Gauge(
+    "recodex_result_cache_hit_rate", "Result cache hit rate since start.",
+    lambda: result_cache.stats()["hit_rate"]))
+registry.register(Gauge(
+    "recodex_patch_memo_hit_rate", "Patch memo hit rate since start.",
+    lambda: patch_memo.stats()["hit_rate"]))
+registry.register(Gauge(
+    "recodex_patch_memo_entries", "Verified fixes held in memory by the patch memo.",
+    lambda: patch_memo.stats()["entries"]))
+registry.register(LabeledGauge(
+    "recodex_cpu_slot_utilization", "Share of wall time since start each core slot had a sandbox run.",
+    lambda: [({"core": str(slot["core"])}, slot["utilization"]) for slot in cpu_scheduler.stats()["slots"]]))
+registry.register(LabeledGauge(
+    "recodex_cpu_slot_active_runs", "Sandbox runs currently pinned to each core slot.",
+    lambda: [({"core": str(slot["core"])}, slot["active"]) for slot in cpu_scheduler.stats()["slots"]]))
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus text exposition format."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,13 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+from backend.core.output_capture import spill_store
+
+router = APIRouter()
+
+@router.get("/output/{spill_id}")
+async def output_endpoint(spill_id: str):
+    """The full stream of a run whose output was truncated (``truncation.<stream>.spill_id``)."""
+    path = spill_store.find(spill_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired output id")
+    return FileResponse(path, media_type="text/plain; charset=utf-8")
@@ -1,15 +1,81 @@
-from fastapi import APIRouter
+import asyncio
+import contextlib
+import anyio
+from fastapi import APIRouter, Depends
 from backend.models.repair_response import RepairRequest, RepairResponse
-from backend.engine.repair_loop import repair_code
+from backend.core.admission import AdmittedStreamingResponse, admission
+from backend.core.async_sandbox import run_blocking
+from backend.engine.repair_loop import RepairSession, repair_code
+from backend.utils.formatter import format_sse
 from backend.utils.logger import logger
+from backend.utils.metrics import REPAIR_ITERATIONS
+from backend.utils.serialization import ResponseFields, shaped_json, shaped_response
 
 router = APIRouter()
 
 @router.post("/repair", response_model=RepairResponse)
-def repair_code_endpoint(request: RepairRequest):
+async def repair_code_endpoint(request: RepairRequest, snapshots: bool = False,
+                               shape: ResponseFields = Depends()):
+    """
+    Each iteration carries the diff from the previous one's code; ``snapshots``
+    adds the full code to every iteration and patch. ``fields``/``exclude``
+    trim the response further (e.g. ``exclude=iterations.execution.stack_trace``).
+    """
     logger.info("Received repair request")
     
-    result = repair_code(request.code, request.max_iterations, request.timeout)
+    # A slot for every candidate the repair may run at once
+    async with admission.slot(request.max_candidates):
+        result = await run_blocking(repair_code, request.code, request.max_iterations, request.timeout,
+                                    request.max_candidates, request.checkpoint, request.adaptive_timeout, snapshots)
     
     logger.info(f"Repair finished. Repaired: {result.repaired}, Iterations: {result.total_iterations}")
-    return result
+    return shaped_response(result, shape)
+
+@router.post("/repair/stream")
+async def repair_code_stream_endpoint(request: RepairRequest, snapshots: bool = False,
+                                      shape: ResponseFields = Depends()):
+    """
+    Server-Sent Events variant of /repair: one ``iteration`` event per finished
+    RepairIteration, then a ``result`` event with ``original_code``, ``final_code``
+    and ``repaired``.
+    Disconnecting cancels the session: the running sandbox is killed and no
+    further iterations are started. The admission slot is held until the
+    iteration that was running has returned. ``fields``/``exclude`` paths
+    apply to each ``iteration`` event.
+    """
+    logger.info("Received streaming repair request")
+    await admission.acquire(request.max_candidates)
+    session = RepairSession(request.code, request.max_iterations, request.timeout,
+                            request.max_candidates, request.checkpoint, request.adaptive_timeout, snapshots)
+
+    async def events():
+        step = None
+        try:
+            while True:
+                # Shielded: a disconnect must not abandon the thread running the step
+                step = asyncio.ensure_future(run_blocking(session.step))
+                iteration = await asyncio.shield(step)
+                if iteration is None:
+                    break
+                yield format_sse("iteration", shaped_json(iteration, shape))
+            result = session.response()
+            REPAIR_ITERATIONS.observe(result.total_iterations)
+            logger.info(f"Streaming repair finished. Repaired: {result.repaired}, Iterations: {result.total_iterations}")
+            yield format_sse("result", result.model_dump_json(exclude={"iterations"}))
+        except asyncio.CancelledError:
+            logger.info("Streaming repair cancelled by client")
+            raise
+        finally:
+            session.cancel()
+            if step is not None and not step.done():
+                # The cancelled step returns once its sandbox is killed
+                with anyio.CancelScope(shield=True), contextlib.suppress(Exception):
+                    await step
+
+    # Released by the response after the body is closed, i.e. after the step thread is done
+    return AdmittedStreamingResponse(
+        events(),
+        slots=request.max_candidates,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,29 +1,79 @@
-from fastapi import APIRouter, HTTPException
+import json
+import codecs
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from backend.models.code_request import RunCodeRequest
 from backend.models.run_response import ExecutionResult
-from backend.core.sandbox import execute_code
-from backend.core.validator import validate_code
+from backend.core.admission import AdmittedStreamingResponse, admission
+from backend.core.async_sandbox import execute_code_async, stream_code
+from backend.core.code_unit import CodeUnit
+from backend.core.validator import validate_unit
+from backend.utils.formatter import format_sse
 from backend.utils.logger import logger
+from backend.utils.serialization import ResponseFields, shaped_response
 
 router = APIRouter()
 
+def validation_error_result(errors) -> ExecutionResult:
+    return ExecutionResult(
+        status="error",
+        output="",
+        error="Validation Error: " + "; ".join(errors),
+        stack_trace=None,
+        execution_time=0.0,
+        exit_code=1
+    )
+
 @router.post("/run", response_model=ExecutionResult)
-def run_code_endpoint(request: RunCodeRequest):
+async def run_code_endpoint(request: RunCodeRequest, shape: ResponseFields = Depends()):
     logger.info("Received run request")
     
-    # Validate code first
-    is_valid, errors = validate_code(request.code)
+    # Analyse the code once; validation reuses the unit's AST
+    unit = CodeUnit(request.code)
+    is_valid, errors = validate_unit(unit)
     if not is_valid:
         logger.warning(f"Validation failed: {errors}")
-        return ExecutionResult(
-            status="error",
-            output="",
-            error="Validation Error: " + "; ".join(errors),
-            stack_trace=None,
-            execution_time=0.0,
-            exit_code=1
-        )
-
-    result = execute_code(request.code, request.timeout, request.memory_limit_mb)
-    logger.info(f"Execution finished with status: {result.status}")
-    return result
+        return shaped_response(validation_error_result(errors), shape)
+
+    async with admission.slot():
+        result = await execute_code_async(unit.source, request.timeout, request.memory_limit_mb, request.use_cache,
+                                          request.profile)
+    logger.info(f"Execution finished with status: {result.status} (cached: {result.cached})")
+    return shaped_response(result, shape)
+
+@router.post("/run/stream")
+async def run_code_stream_endpoint(request: RunCodeRequest):
+    """
+    Server-Sent Events variant of /run: ``stdout``/``stderr`` events carry output
+    chunks as they are produced, and a final ``result`` event carries the
+    ExecutionResult. A client disconnect kills the child immediately.
+    """
+    logger.info("Received streaming run request")
+
+    is_valid, errors = validate_unit(CodeUnit(request.code))
+    if not is_valid:
+        logger.warning(f"Validation failed: {errors}")
+        result = validation_error_result(errors)
+        return StreamingResponse(iter([format_sse("result", result.model_dump_json())]), media_type="text/event-stream")
+
+    # Admission is taken before the response starts so a full queue is still a 429;
+    # the response releases it once the stream is closed.
+    await admission.acquire()
+
+    async def events():
+        decoders = {name: codecs.getincrementaldecoder("utf-8")(errors="replace") for name in ("stdout", "stderr")}
+        async for kind, payload in stream_code(request.code, request.timeout, request.memory_limit_mb,
+                                               request.profile):
+            if kind == "result":
+                logger.info(f"Streaming execution finished with status: {payload.status}")
+                yield format_sse("result", payload.model_dump_json())
+            else:
+                text = decoders[kind].decode(payload)
+                if text:
+                    yield format_sse(kind, json.dumps({"data": text}))
+
+    return AdmittedStreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
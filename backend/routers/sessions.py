@@ -0,0 +1,126 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from backend.core.admission import admission
+from backend.core.async_sandbox import execute_code_async, run_blocking
+from backend.core.parser import parse_error
+from backend.core.sessions import CodeVersion, EditSession, SessionNotFound, VersionConflict, session_store
+from backend.core.validator import validate_unit
+from backend.engine.diff_apply import DiffError
+from backend.engine.patch_generator import generate_patch
+from backend.engine.repair_loop import repair_code
+from backend.models.patch_request import PatchResponse
+from backend.models.repair_response import RepairResponse
+from backend.models.run_response import ExecutionResult
+from backend.models.session import (
+    SessionCreateRequest, SessionInfo, SessionPatchRequest, SessionRepairRequest, SessionRunRequest,
+    SessionUpdateRequest,
+)
+from backend.routers.run_code import validation_error_result
+from backend.utils.logger import logger
+from backend.utils.serialization import ResponseFields, shaped_response
+
+router = APIRouter()
+
+def get_session(session_id: str) -> EditSession:
+    try:
+        return session_store.get(session_id)
+    except SessionNotFound:
+        raise HTTPException(status_code=404, detail="Unknown or expired session")
+
+def current_version(session_id: str, expected: Optional[int]) -> CodeVersion:
+    version = get_session(session_id).current
+    if expected is not None and expected != version.number:
+        raise HTTPException(status_code=409, detail={"message": "Session has moved on", "version": version.number})
+    return version
+
+def session_info(session: EditSession, version: CodeVersion, include_code: bool = False) -> SessionInfo:
+    # Cached on the unit, so an unchanged version is never validated twice
+    is_valid, errors = validate_unit(version.unit)
+    return SessionInfo(
+        session_id=session.id,
+        version=version.number,
+        length=len(version.unit.source),
+        valid=is_valid,
+        errors=errors,
+        code=version.unit.source if include_code else None,
+    )
+
+@router.post("/sessions", response_model=SessionInfo)
+def create_session_endpoint(request: SessionCreateRequest):
+    session = session_store.create(request.code)
+    logger.info(f"Created editing session {session.id}")
+    info = session_info(session, session.current)
+    session_store.updated()
+    return info
+
+@router.get("/sessions/{session_id}", response_model=SessionInfo)
+def get_session_endpoint(session_id: str):
+    session = get_session(session_id)
+    return session_info(session, session.current, include_code=True)
+
+@router.post("/sessions/{session_id}/versions", response_model=SessionInfo)
+def update_session_endpoint(session_id: str, request: SessionUpdateRequest):
+    """
+    Upload the next version as a unified diff against ``base_version`` (or as
+    whole ``code``). 409 if ``base_version`` isn't current, 422 if the diff's
+    context doesn't match it exactly.
+    """
+    session = get_session(session_id)
+    if (request.diff is None) == (request.code is None):
+        raise HTTPException(status_code=422, detail="Send exactly one of 'diff' and 'code'")
+    try:
+        version = session.update(request.base_version, request.diff, request.code)
+    except VersionConflict as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "version": e.current})
+    except DiffError as e:
+        raise HTTPException(status_code=422, detail=f"Diff does not apply: {e}")
+    info = session_info(session, version)
+    session_store.updated()
+    return info
+
+@router.delete("/sessions/{session_id}")
+def delete_session_endpoint(session_id: str):
+    try:
+        session_store.delete(session_id)
+    except SessionNotFound:
+        raise HTTPException(status_code=404, detail="Unknown or expired session")
+    return {"deleted": session_id}
+
+@router.post("/sessions/{session_id}/run", response_model=ExecutionResult)
+async def run_session_endpoint(session_id: str, request: SessionRunRequest, shape: ResponseFields = Depends()):
+    """/run on the session's current version; an unchanged version reuses its last result."""
+    version = current_version(session_id, request.version)
+    is_valid, errors = validate_unit(version.unit)
+    if not is_valid:
+        return shaped_response(validation_error_result(errors), shape)
+
+    key = (request.timeout, request.memory_limit_mb)
+    if request.use_cache and not request.profile:
+        result = version.result(key)
+        if result is not None:
+            return shaped_response(result, shape)
+
+    async with admission.slot():
+        result = await execute_code_async(version.unit.source, request.timeout, request.memory_limit_mb,
+                                          request.use_cache, request.profile)
+    if not request.profile:
+        version.store_result(key, result)
+        session_store.updated()
+    logger.info(f"Session run finished with status: {result.status} (cached: {result.cached})")
+    return shaped_response(result, shape)
+
+@router.post("/sessions/{session_id}/patch", response_model=PatchResponse)
+def patch_session_endpoint(session_id: str, request: SessionPatchRequest, shape: ResponseFields = Depends()):
+    version = current_version(session_id, request.version)
+    parsed_err = parse_error(request.stack_trace or request.error, request.exception, request.hang)
+    return shaped_response(generate_patch(version.unit, parsed_err), shape)
+
+@router.post("/sessions/{session_id}/repair", response_model=RepairResponse)
+async def repair_session_endpoint(session_id: str, request: SessionRepairRequest, snapshots: bool = False,
+                                  shape: ResponseFields = Depends()):
+    version = current_version(session_id, request.version)
+    # A slot for every candidate the repair may run at once, as on /repair
+    async with admission.slot(request.max_candidates):
+        result = await run_blocking(repair_code, version.unit, request.max_iterations, request.timeout,
+                                    request.max_candidates, request.checkpoint, request.adaptive_timeout, snapshots)
+    return shaped_response(result, shape)
@@ -0,0 +1,22 @@
+from fastapi import APIRouter
+from starlette.concurrency import run_in_threadpool
+from backend.core.admission import admission
+from backend.core.cpu_scheduler import cpu_scheduler
+from backend.core.job_queue import job_queue_stats
+from backend.core.result_cache import result_cache
+from backend.core.sessions import session_store
+from backend.engine.patch_memo import patch_memo
+
+router = APIRouter()
+
+@router.get("/stats")
+async def stats_endpoint():
+    return {
+        "admission": admission.stats(),
+        "result_cache": result_cache.stats(),
+        "patch_memo": patch_memo.stats(),
+        "cpu_scheduler": cpu_scheduler.stats(),
+        "sessions": session_store.stats(),
+        # SQLite, which may be waiting on a writer
+        "jobs": await run_in_threadpool(job_queue_stats),
+    }
@@ -0,0 +1,97 @@
+import asyncio
+import pytest
+from backend.core.admission import AdmissionController, AdmissionRejected, AdmittedStreamingResponse
+from backend.core.async_sandbox import execute_subprocess_async
+from backend.engine.repair_loop import repair_code
+
+def test_rejects_when_queue_is_full():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=1)
+        await controller.acquire()
+        waiter = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+        assert controller.stats()["queue_depth"] == 1
+        with pytest.raises(AdmissionRejected):
+            await controller.acquire()
+        controller.release()
+        await waiter
+        assert controller.stats()["in_flight"] == 1
+        assert controller.stats()["rejected_total"] == 1
+
+    asyncio.run(scenario())
+
+def test_cancelled_waiter_gives_up_its_place():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=1)
+        await controller.acquire()
+        waiter = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        controller.release()
+        assert controller.stats()["in_flight"] == 0
+        assert controller.stats()["queue_depth"] == 0
+
+    asyncio.run(scenario())
+
+def test_async_subprocess_timeout():
+    result = asyncio.run(execute_subprocess_async("while True: pass", timeout=1))
+    assert result.status == "timeout"
+
+def test_stream_slot_is_released_when_client_leaves_before_the_body():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=0)
+        await controller.acquire()
+        started = []
+
+        async def body():
+            started.append(True)
+            yield b"never sent"
+
+        async def receive():
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            await asyncio.sleep(1)  # the client is gone; the body never gets going
+
+        response = AdmittedStreamingResponse(body(), controller=controller)
+        await response({"type": "http"}, receive, send)
+        assert controller.stats()["in_flight"] == 0 and not started
+
+    asyncio.run(scenario())
+
+def test_batch_takes_its_slots_all_at_once_in_line():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=4, max_queue=2)
+        await controller.acquire()
+        batch = asyncio.ensure_future(controller.acquire(4))
+        await asyncio.sleep(0)
+        single = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+        # Three slots are free, but the batch is first in line and needs four
+        assert controller.stats()["in_flight"] == 1 and controller.stats()["queue_depth"] == 2
+        controller.release()
+        await batch
+        assert controller.stats()["in_flight"] == 4 and not single.done()
+        controller.release(4)
+        await single
+        assert controller.stats()["in_flight"] == 1
+
+    asyncio.run(scenario())
+
+def test_repair_takes_a_slot_per_candidate(monkeypatch):
+    from fastapi.testclient import TestClient
+    from backend.core.admission import admission
+    from backend.main import app
+    from backend.routers import repair
+
+    held = []
+
+    def fake_repair(*args):
+        held.append(admission.stats()["in_flight"])
+        return repair_code("print(1)", max_candidates=1)
+
+    monkeypatch.setattr(repair, "repair_code", fake_repair)
+    response = TestClient(app).post("/repair", json={"code": "print(1)", "max_candidates": 2})
+    assert response.status_code == 200
+    assert held == [min(2, admission.max_in_flight)] and admission.stats()["in_flight"] == 0
@@ -0,0 +1,60 @@
+import asyncio
+import contextlib
+import threading
+from backend.engine.batch import run_batch, run_item, repair_item
+from backend.models.batch_request import BatchRunItem, BatchRepairItem
+from backend.models.code_request import RunCodeRequest
+from backend.models.repair_response import RepairRequest
+from backend.utils.serialization import ResponseFields
+
+def test_results_keep_input_order():
+    requests = [RunCodeRequest(code=f"print({i})") for i in range(5)]
+    items = run_batch(run_item, requests, BatchRunItem)
+    assert [item.index for item in items] == list(range(5))
+    assert [item.result.output.strip() for item in items] == [str(i) for i in range(5)]
+
+def test_invalid_item_does_not_fail_batch():
+    requests = [RunCodeRequest(code="import os"), RunCodeRequest(code="print('ok')")]
+    items = run_batch(run_item, requests, BatchRunItem)
+    assert "Validation Error" in items[0].result.error
+    assert items[1].result.status == "success"
+
+def test_repair_batch():
+    items = run_batch(repair_item, [RepairRequest(code="print(x)")], BatchRepairItem)
+    assert items[0].result.repaired
+
+def test_stream_holds_its_slots_until_running_items_return(monkeypatch):
+    from backend.core.admission import admission
+    from backend.routers import batch as batch_router
+
+    started, finish = threading.Event(), threading.Event()
+
+    def slow_item(request):
+        started.set()
+        finish.wait(10)
+        return run_item(request)
+
+    async def scenario():
+        items = [RunCodeRequest(code="print(1)")]
+        await admission.acquire(1)
+        response = batch_router.ndjson_response(slow_item, items, BatchRunItem, ResponseFields(None, None), 1)
+        lines = response.body_iterator
+        task = asyncio.ensure_future(lines.__anext__())
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 10)
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+        await lines.aclose()
+        response.release()
+        await asyncio.sleep(0.05)
+        held = admission.stats()["in_flight"]
+        finish.set()
+        for _ in range(100):
+            if admission.stats()["in_flight"] == held - 1:
+                break
+            await asyncio.sleep(0.01)
+        return held, admission.stats()["in_flight"]
+
+    before = admission.stats()["in_flight"]
+    held, after = asyncio.run(scenario())
+    assert held == before + 1 and after == before
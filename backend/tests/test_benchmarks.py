@@ -0,0 +1,31 @@
+from backend.benchmarks.corpus import CORPUS
+from backend.benchmarks.runner import compare, measure, run_suite
+from backend.core.limitations import MAX_CODE_LENGTH
+
+def suite(stage, case, p50, p90=None):
+    return {"results": {stage: {case: {"p50": p50, "p90": p90 if p90 is not None else p50}}}}
+
+def test_measure_reports_percentiles():
+    stats = measure(lambda: None, iterations=20, warmup=0)
+    assert stats["iterations"] == 20
+    assert stats["p50"] <= stats["p90"] <= stats["p99"]
+    assert stats["throughput"] > 0
+
+def test_compare_flags_regressions_beyond_threshold():
+    baseline = suite("sandbox", "clean", 2.0)
+    assert compare(suite("sandbox", "clean", 2.4), baseline, threshold=0.25) == []
+    regressions = compare(suite("sandbox", "clean", 3.0), baseline, threshold=0.25)
+    assert len(regressions) == 2
+    assert regressions[0].startswith("sandbox/clean p50")
+
+def test_compare_ignores_noise_and_unknown_cases():
+    assert compare(suite("parser", "clean", 0.02), suite("parser", "clean", 0.01)) == []
+    assert compare(suite("parser", "new_case", 5.0), suite("parser", "clean", 1.0)) == []
+
+def test_corpus_covers_large_inputs():
+    assert MAX_CODE_LENGTH * 0.9 < len(CORPUS["large"].code) <= MAX_CODE_LENGTH
+
+def test_suite_runs_in_process_stages():
+    results = run_suite(stages=["parser", "patch"], iterations=3, cases=["name_error", "clean"])["results"]
+    assert set(results["parser"]) == {"name_error"}
+    assert results["patch"]["name_error"]["iterations"] == 3
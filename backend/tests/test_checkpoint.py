@@ -0,0 +1,45 @@
+import time
+from backend.core.checkpoint import CheckpointSession
+from backend.engine.repair_loop import repair_code
+
+SLOW_PREFIX = "import time\nprint('loading')\ntime.sleep(0.5)\ndata = [1, 2, 3]\n"
+
+def test_patched_run_resumes_from_snapshot():
+    session = CheckpointSession(min_interval=0.1)
+    try:
+        first = session.execute(SLOW_PREFIX + "print(sum(data) / zero)\n")
+        assert first.status == "error"
+        assert [s.index for s in session.snapshots] == [3]
+
+        start = time.time()
+        second = session.execute(SLOW_PREFIX + "zero = 1\nprint(sum(data) / zero)\n")
+        assert time.time() - start < 0.4
+        assert second.status == "success"
+        # Output and run time of the skipped prefix are carried over
+        assert second.output == "loading\n6.0\n"
+        assert second.execution_time >= 0.5
+    finally:
+        session.close()
+
+def test_changed_prefix_runs_from_the_start():
+    session = CheckpointSession(min_interval=0.1)
+    try:
+        session.execute(SLOW_PREFIX + "print(data[5])\n")
+        result = session.execute(SLOW_PREFIX.replace("[1, 2, 3]", "[1, 2, 3, 4, 5, 6]") + "print(data[5])\n")
+        assert result.output == "loading\n6\n"
+    finally:
+        session.close()
+
+def test_snapshots_are_bounded_and_released():
+    session = CheckpointSession(max_snapshots=2, min_interval=0.0)
+    try:
+        session.execute("a = 1\nb = 2\nc = 3\nd = 4\nprint(a + b + c + d)\n")
+        assert len(session.snapshots) == 2
+    finally:
+        session.close()
+    assert session.snapshots == []
+
+def test_repair_with_checkpoints():
+    result = repair_code(SLOW_PREFIX + "print(total)\n", max_iterations=3, checkpoint=True)
+    assert result.repaired
+    assert result.iterations[-1].execution.output.startswith("loading\n")
@@ -0,0 +1,47 @@
+import ast
+from concurrent.futures import ThreadPoolExecutor
+from backend.core.code_unit import CodeUnit
+from backend.core.validator import validate_unit
+from backend.engine.patch_generator import generate_patch
+from backend.core.parser import ParsedError
+
+def test_derive_reuses_unchanged_prefix():
+    unit = CodeUnit("a = 1\nb = 2\nprint(c)")
+    first = unit.tree.body[0]
+    derived = unit.derive("a = 1\nb = 2\nc = 0\nprint(c)")
+    assert derived.tree.body[0] is first
+    assert [stmt.lineno for stmt in derived.tree.body] == [1, 2, 3, 4]
+    assert ast.dump(derived.tree) == ast.dump(ast.parse(derived.source))
+
+def test_derive_reparses_extended_compound_statement():
+    unit = CodeUnit("if True:\n    a = 1\nprint(a)")
+    derived = unit.derive("if True:\n    a = 1\n    b = 2\nprint(a)")
+    assert ast.dump(derived.tree) == ast.dump(ast.parse(derived.source))
+
+def test_derive_reports_syntax_error_line():
+    unit = CodeUnit("a = 1\nb = 2")
+    derived = unit.derive("a = 1\nb = = 2")
+    assert derived.tree is None
+    assert derived.syntax_error.lineno == 2
+
+def test_validation_is_cached_per_statement():
+    unit = CodeUnit("import os\nprint(1)")
+    assert validate_unit(unit) == (False, ["Importing 'os' is forbidden."])
+    derived = unit.derive("import os\nprint(2)")
+    assert "import os" in derived.statement_errors
+    assert validate_unit(derived)[0] is False
+
+def test_statement_at_and_patch_from_unit():
+    unit = CodeUnit("def f():\n    return x\nf()")
+    assert isinstance(unit.statement_at(2), ast.Return)
+    patch = generate_patch(unit, ParsedError(type="NameError", message="name 'x' is not defined", line_number=2))
+    assert "    x = 0" in patch.fixed_code
+
+def test_tree_is_never_seen_half_parsed():
+    source = "\n".join(f"x{i} = {i}" for i in range(2000))
+    for _ in range(5):
+        unit = CodeUnit(source)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            seen = list(pool.map(lambda _: (unit.tree, unit.syntax_error), range(16)))
+        assert all(tree is not None and error is None for tree, error in seen)
+        assert validate_unit(unit) == (True, [])
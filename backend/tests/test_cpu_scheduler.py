@@ -0,0 +1,63 @@
+import os
+import time
+import asyncio
+import contextlib
+from backend.core import async_sandbox, sandbox
+from backend.core.cpu_scheduler import CgroupManager, CpuScheduler, cpu_scheduler
+from backend.core.sandbox import execute_code
+
+def test_runs_spread_over_slots_and_share_the_least_busy():
+    scheduler = CpuScheduler(cores=[2, 5], pinning=True, cpu_seconds=3, cgroups=CgroupManager(root=None))
+    with scheduler.placement(timeout=5) as first, scheduler.placement(timeout=2) as second:
+        assert {first.options["core"], second.options["core"]} == {2, 5}
+        assert (first.options["seconds"], second.options["seconds"]) == (3, 2)
+        with scheduler.placement(timeout=5) as third:
+            assert third.options["core"] in (2, 5)
+            third.record({"user_cpu": 0.25, "system_cpu": 0.25})
+    stats = scheduler.stats()
+    assert [slot["active"] for slot in stats["slots"]] == [0, 0]
+    assert sum(slot["runs"] for slot in stats["slots"]) == 3
+    assert sum(slot["cpu_seconds"] for slot in stats["slots"]) == 0.5
+    assert all(0 < slot["utilization"] <= 1 for slot in stats["slots"])
+
+def test_cgroups_fall_back_when_the_root_is_not_cgroup_v2(tmp_path):
+    cgroups = CgroupManager(root=str(tmp_path))
+    assert not cgroups.enabled
+    assert cgroups.create(100) is None
+
+def test_cpu_time_limit_stops_busy_threads(monkeypatch):
+    monkeypatch.setattr(cpu_scheduler, "cpu_seconds", 1)
+    code = (
+        "import threading\n"
+        "def spin():\n"
+        "    while True:\n"
+        "        pass\n"
+        "for _ in range(3):\n"
+        "    threading.Thread(target=spin, daemon=True).start()\n"
+        "spin()\n"
+    )
+    result = execute_code(code, timeout=10, use_cache=False)
+    assert result.termination == "cpu"
+    assert result.error == "CPU time limit exceeded"
+    assert result.execution_time < 5
+
+def test_cold_runs_charge_their_cpu_time(monkeypatch):
+    scheduler = CpuScheduler(cores=sorted(os.sched_getaffinity(0))[:1], pinning=True, cpu_seconds=10,
+                             cgroups=CgroupManager(root=None))
+    monkeypatch.setattr(sandbox, "cpu_scheduler", scheduler)
+    monkeypatch.setattr(async_sandbox, "cpu_scheduler", scheduler)
+    code = "total = 0\nfor i in range(2_000_000):\n    total += i\n"
+
+    async def streamed():
+        async with contextlib.aclosing(async_sandbox._stream_subprocess(code, 10, 100)) as stream:
+            return [event async for event in stream][-1][1]
+
+    results = [
+        sandbox._execute_cold(code, 10, 100, time.time()),
+        asyncio.run(async_sandbox.execute_subprocess_async(code, timeout=10)),
+        asyncio.run(streamed()),
+    ]
+    assert all(result.status == "success" and result.resources.user_cpu > 0 for result in results)
+    [slot] = scheduler.stats()["slots"]
+    assert slot["runs"] == 3
+    assert slot["cpu_seconds"] >= sum(result.resources.user_cpu for result in results)
@@ -0,0 +1,19 @@
+import pytest
+from backend.engine.diff_apply import DiffError, apply_diff, make_diff
+
+def test_multi_hunk_diff_round_trips_exactly():
+    code = "\n".join(f"line{i}" for i in range(40)) + "\n"
+    fixed = code.replace("line3\n", "line3\nadded\n").replace("line30\n", "").replace("line39", "--line39")
+    diff = make_diff(code, fixed)
+    assert diff.count("@@ -") == 3
+    assert apply_diff(code, diff) == fixed
+    assert apply_diff(code, "") == code
+
+def test_moved_hunks_are_found_and_mismatches_rejected():
+    code = "a\nb\nc\nd"
+    diff = make_diff(code, "a\nb\nC\nd")
+    assert apply_diff("x\ny\n" + code, diff) == "x\ny\na\nb\nC\nd"
+    with pytest.raises(DiffError):
+        apply_diff("a\nb\nz\nd", diff)
+    with pytest.raises(DiffError):
+        apply_diff("x\ny\n" + code, diff, max_offset=1)
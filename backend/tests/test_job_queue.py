@@ -0,0 +1,71 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fastapi.testclient import TestClient
+from backend.core import job_queue
+from backend.core.job_queue import JobQueue
+from backend.engine import job_worker
+from backend.engine.job_worker import job_outcome, work_once
+from backend.main import app
+
+def test_submissions_are_batched_and_claimed_by_priority(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        ids = list(pool.map(lambda i: queue.submit("run", {"i": i}, priority=i % 3), range(64)))
+    assert len(set(ids)) == 64 and queue.stats()["queued"] == 64
+    claimed = queue.claim("w1", limit=8)
+    assert [job["priority"] for job in claimed] == [2] * 8
+    queue.complete([(job["id"], "done", {"ok": True}, None) for job in claimed], "w1")
+    assert queue.stats()["done"] == 8
+    assert queue.get(claimed[0]["id"])["result"] == {"ok": True}
+    queue.close()
+
+def test_infrastructure_failures_are_retried_then_fail(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), lease=0.05, result_ttl=0)
+    job_id = queue.submit("repair", {}, max_attempts=2)
+    [job] = queue.claim("w1")
+    queue.complete([(job_id, "retry", None, "OSError: pool died")], "w1")
+    assert queue.get(job_id)["status"] == "queued"
+    assert queue.claim("w1") == []  # backing off
+    queue._connection().execute("UPDATE jobs SET not_before = 0")
+    # The second attempt's worker dies; its lease runs out and the job is out of attempts
+    [job] = queue.claim("w2")
+    assert job["attempts"] == 2
+    time.sleep(0.06)
+    assert queue.claim("w3") == []
+    job = queue.get(job_id)
+    assert job["status"] == "failed" and job["error"] == "Worker lease expired"
+    # A queued job can be cancelled; finished jobs past the TTL are removed
+    other = queue.submit("run", {})
+    assert queue.cancel(other) and not queue.cancel(job_id)
+    assert queue.cleanup() == 2 and queue.get(job_id) is None
+    queue.close()
+
+def test_job_endpoints_return_the_worker_result(tmp_path, monkeypatch):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(job_queue, "_queue", queue)
+    client = TestClient(app)
+    assert client.post("/jobs", json={}).status_code == 422
+    submitted = client.post("/jobs", json={"run": {"code": "print(6 * 7)"}, "priority": 5})
+    assert submitted.status_code == 202 and submitted.json()["status"] == "queued"
+    job_id = submitted.json()["job_id"]
+
+    assert work_once(queue, "test-worker") == 1
+    job = client.get(f"/jobs/{job_id}", params={"wait": 1}).json()
+    assert job["status"] == "done" and job["attempts"] == 1
+    assert job["result"]["output"].strip() == "42"
+    assert client.delete(f"/jobs/{job_id}").status_code == 409
+    assert client.get("/jobs/missing").status_code == 404
+    assert client.get("/stats").json()["jobs"]["done"] == 1
+    queue.close()
+
+def test_only_bad_payloads_fail_for_good(monkeypatch):
+    job = {"id": "j1", "attempts": 1}
+    assert job_outcome({**job, "kind": "compile", "payload": {}})[1] == "failed"
+    assert job_outcome({**job, "kind": "run", "payload": {"request": {"timeout": 5}}})[1] == "failed"
+
+    def broken(request):
+        raise ValueError("pool handed back a truncated result")
+
+    monkeypatch.setattr(job_worker, "run_item", broken)
+    status, _, error = job_outcome({**job, "kind": "run", "payload": {"request": {"code": "print(1)"}}})[1:]
+    assert status == "retry" and error.startswith("ValueError")
@@ -0,0 +1,29 @@
+import asyncio
+import httpx
+from backend.benchmarks.load import run_load, sandbox_cpu_seconds
+from backend.main import app
+
+def test_load_replays_corpus_in_process():
+    corpus = [
+        {"path": "/run", "json": {"code": "print(1)"}},
+        {"path": "/repair", "json": {"code": "print(x)"}},
+    ]
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://recodex") as client:
+            return await run_load(client, corpus, total=6, concurrency=3, sample_interval=0.05)
+
+    summary = asyncio.run(scenario()).summary()
+    assert summary["overall"]["requests"] == 6
+    assert summary["endpoints"]["/run"]["requests"] == 3
+    assert summary["overall"]["error_rate"] == 0.0
+    assert summary["overall"]["p50_ms"] <= summary["overall"]["p99_ms"]
+
+def test_cpu_counter_is_summed_across_modes():
+    text = (
+        "# TYPE recodex_sandbox_cpu_seconds_total counter\n"
+        'recodex_sandbox_cpu_seconds_total{mode="system"} 0.5\n'
+        'recodex_sandbox_cpu_seconds_total{mode="user"} 1.25\n'
+    )
+    assert sandbox_cpu_seconds(text) == 1.75
@@ -0,0 +1,41 @@
+from fastapi.testclient import TestClient
+from backend.core.sandbox import execute_code
+from backend.main import app
+from backend.utils.metrics import Counter, Histogram
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("test_latency_seconds", "Test.", buckets=(0.1, 1.0))
+    histogram.observe(0.05, endpoint="/run")
+    histogram.observe(0.5, endpoint="/run")
+    lines = histogram.render()
+    assert 'test_latency_seconds_bucket{endpoint="/run",le="0.1"} 1' in lines
+    assert 'test_latency_seconds_bucket{endpoint="/run",le="1"} 2' in lines
+    assert 'test_latency_seconds_bucket{endpoint="/run",le="+Inf"} 2' in lines
+    assert 'test_latency_seconds_count{endpoint="/run"} 2' in lines
+
+def test_counter_labels():
+    counter = Counter("test_total", "Test.")
+    counter.inc(termination="exit")
+    counter.inc(2, termination="exit")
+    assert 'test_total{termination="exit"} 3' in counter.render()
+
+def test_execution_reports_resources_and_termination():
+    result = execute_code("total = sum(range(100000))\nprint(total)", use_cache=False)
+    assert result.termination == "exit"
+    assert result.resources is not None
+    assert result.resources.max_rss_kb > 0
+    assert result.spawn_time is not None and result.spawn_time < result.execution_time
+
+def test_limit_kills_are_classified():
+    assert execute_code("while True: pass", timeout=1, use_cache=False).termination == "timeout"
+    assert execute_code("x = bytearray(500 * 1024 * 1024)", use_cache=False).termination == "memory"
+    assert execute_code("import os\nos.kill(os.getpid(), 11)",
+                        use_cache=False).termination == "signal"
+
+def test_metrics_endpoint():
+    client = TestClient(app)
+    client.post("/run", json={"code": "print(1)", "use_cache": False})
+    body = client.get("/metrics").text
+    assert 'recodex_request_duration_seconds_count{endpoint="/run"}' in body
+    assert "recodex_sandbox_cpu_seconds_total" in body
+    assert "recodex_admission_in_flight" in body
@@ -0,0 +1,29 @@
+from backend.core.output_capture import OutputBuffer, SpillStore
+from backend.core.sandbox import execute_code
+
+def test_buffer_keeps_head_and_tail():
+    buffer = OutputBuffer(head_bytes=4, tail_bytes=4)
+    for chunk in (b"abc", b"defgh", b"ijklmn"):
+        buffer.write(chunk)
+    assert buffer.getvalue() == b"abcdklmn"
+    assert buffer.text() == "abcd\n... [6 bytes truncated] ...\nklmn"
+    assert buffer.truncation() == {"total_bytes": 14, "kept_bytes": 8, "spill_id": None, "spilled_bytes": None}
+
+def test_overflow_spills_the_whole_stream(tmp_path):
+    store = SpillStore(str(tmp_path), max_bytes=10)
+    buffer = OutputBuffer(head_bytes=2, tail_bytes=2, spill=store)
+    buffer.write(b"abc")
+    buffer.write(b"defghijkl")
+    buffer.close()
+    with open(store.find(buffer.spill_id), 'rb') as f:
+        assert f.read() == b"abcdefghij"
+    assert buffer.truncation()["spilled_bytes"] == 10
+    assert store.find("../../etc/passwd") is None
+
+def test_sandbox_output_is_bounded():
+    result = execute_code("for i in range(100000):\n    print(i)\nprint(1/0)", use_cache=False)
+    assert result.truncation["stdout"].total_bytes == 588890
+    assert result.output.startswith("0\n1\n")
+    assert result.output.endswith("99998\n99999\n")
+    assert len(result.output) < 140 * 1024
+    assert result.error == "ZeroDivisionError: division by zero"
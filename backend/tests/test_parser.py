@@ -0,0 +1,44 @@
+from backend.core.parser import parse_error
+from backend.core.sandbox import execute_code
+from backend.engine.patch_generator import generate_patch
+from backend.models.run_response import ExceptionFrame, HangSite
+
+def run(code):
+    return execute_code(code, use_cache=False)
+
+def test_structured_and_text_parsing_agree():
+    for code in ["print(x)", "1/0", "a = [1]\nprint(a[3])", 'print("n: " + 1)']:
+        result = run(code)
+        structured = parse_error(result.stack_trace, result.exception)
+        text = parse_error(result.stack_trace)
+        assert (structured.type, structured.message, structured.line_number) == \
+               (text.type, text.message, text.line_number)
+        assert structured.frames
+
+def test_chained_exception_keeps_cause():
+    result = run("try:\n    {}['a']\nexcept KeyError as k:\n    raise ValueError('bad: value') from k")
+    exception = result.exception
+    assert (exception.type, exception.message, exception.line_number) == ("ValueError", "bad: value", 4)
+    assert exception.relation == "cause"
+    assert exception.cause.type == "KeyError"
+    assert exception.cause.frames[0].source == "{}['a']"
+
+def test_deep_recursion_is_trimmed():
+    result = run("def f(n):\n    return f(n - 1)\nf(1)")
+    assert len(result.exception.frames) == 50
+    assert result.exception.frames_omitted > 0
+
+def test_recursion_patch_targets_the_recursing_function():
+    code = "def helper(n):\n    return n\n\ndef walk(n):\n    return walk(helper(n) - 1)\n\nwalk(3)"
+    result = run(code)
+    patch = generate_patch(code, parse_error(result.stack_trace, result.exception))
+    assert "def walk(n):\n    if n == 0: return 1" in patch.fixed_code
+
+def test_hang_site_is_a_diagnosable_error():
+    hang = HangSite(after=4.75, line_number=3,
+                    frames=[ExceptionFrame(file="<string>", line=3, function="<module>", source="while x:")])
+    parsed = parse_error("Execution timed out", hang=hang)
+    assert (parsed.type, parsed.category, parsed.line_number) == ("Hang", "hang", 3)
+    text = parse_error('Stack 4.75s into the run (most recent call last):\n  File "<string>", line 3, in <module>\n'
+                       'Hang: still running at line 3')
+    assert (text.type, text.category, text.line_number) == ("Hang", "hang", 3)
@@ -0,0 +1,40 @@
+from backend.core.code_unit import CodeUnit
+from backend.core.parser import ParsedError
+from backend.core.result_cache import result_cache
+from backend.engine.patch_memo import PatchMemo, apply_memo_diff, fingerprint, make_diff, patch_memo
+from backend.engine.repair_loop import repair_code
+
+NAME_ERROR = ParsedError(type="NameError", message="name 'x' is not defined", line_number=2)
+
+def test_fingerprint_ignores_formatting_but_not_code():
+    key = fingerprint(CodeUnit("y = 1\nprint(x)"), NAME_ERROR)
+    assert fingerprint(CodeUnit("y = 1\nprint( x )  # comment"), NAME_ERROR) == key
+    assert fingerprint(CodeUnit("y = 1\nprint(x + 1)"), NAME_ERROR) != key
+
+def test_lookup_applies_the_diff_only_when_its_context_matches():
+    memo = PatchMemo(max_entries=1, disk_dir=None)
+    memo.record("k", "a\nprint(x)\nb", "a\nx = 0\nprint(x)\nb")
+    assert memo.lookup("k", "a\nprint(x)\nb") == "a\nx = 0\nprint(x)\nb"
+    assert memo.lookup("k", "a\nprint(y)\nb") is None
+    memo.record("other", "c", "d")
+    assert memo.lookup("k", "a\nprint(x)\nb") is None
+    assert memo.stats()["evictions"] == 1
+    assert apply_memo_diff("c\n", make_diff("c\n", "d\n")) == "d\n"
+
+def test_strategy_change_invalidates_disk_entries(tmp_path):
+    PatchMemo(disk_dir=str(tmp_path), version="old").record("k", "print(x)", "x = 0\nprint(x)")
+    memo = PatchMemo(disk_dir=str(tmp_path), version="new")
+    assert memo.lookup("k", "print(x)") is None
+    assert memo.stats()["invalidations"] == 1
+
+def test_repeated_failure_is_fixed_from_the_memo():
+    code = "print(width)\nprint(height)"
+    patch_memo.clear()
+    first = repair_code(code)
+    result_cache.clear()
+    hits = patch_memo.stats()["hits"]
+    second = repair_code(code, max_candidates=1)
+    assert patch_memo.stats()["hits"] == hits + 1
+    assert second.iterations[0].patch.reasoning.startswith("Reused the fix verified")
+    assert second.repaired and second.final_code == first.final_code
+    assert second.total_iterations == 2
@@ -1,4 +1,11 @@
-from backend.engine.repair_loop import repair_code
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from pydantic import ValidationError
+from backend.core.limitations import MAX_SPECULATIVE_CANDIDATES, SPECULATIVE_CANDIDATES
+from backend.engine import repair_loop
+from backend.engine.diff_apply import apply_diff
+from backend.engine.repair_loop import RepairSession, repair_code
+from backend.models.repair_response import RepairRequest
 
 def test_single_iteration_repair():
     code = "print(x)"  # NameError
@@ -12,3 +19,100 @@ def test_max_iterations_limit():
     result = repair_code(code, max_iterations=2)
     assert result.repaired == False
     assert result.total_iterations == 2
+
+def test_session_steps_one_iteration_at_a_time():
+    session = RepairSession("print(x)", max_iterations=3)
+    first = session.step()
+    assert first.iteration == 1
+    assert first.execution.status == "error"
+    assert not session.finished
+    while session.step() is not None:
+        pass
+    assert session.response().repaired
+
+def test_cancelled_session_stops_launching():
+    session = RepairSession("print(x)", max_iterations=3)
+    session.cancel()
+    assert session.step() is None
+    assert session.response().total_iterations == 0
+
+def test_speculative_candidates_pick_the_working_fix():
+    code = "total = 5\nprint(totl + 1)"  # the rename works, the init fix would print 1
+    result = repair_code(code, max_iterations=3, max_candidates=3)
+    assert result.repaired
+    assert "print(total + 1)" in result.final_code
+    first = result.iterations[0]
+    accepted = [c for c in first.candidates if c.accepted]
+    assert len(accepted) == 1 and accepted[0].status == "success"
+
+def test_speculative_winner_result_is_reused():
+    code = "x = 0\nprint(10 / x)"
+    result = repair_code(code, max_iterations=3, max_candidates=3)
+    assert result.repaired
+    # The winning candidate's run becomes the next iteration without re-executing
+    assert result.total_iterations == 2
+    assert result.iterations[1].execution.status == "success"
+
+def test_single_candidate_mode_has_no_candidates():
+    result = repair_code("print(x)", max_iterations=3, max_candidates=1)
+    assert result.repaired
+    assert result.iterations[0].candidates is None
+
+def test_preflight_failures_never_start_a_sandbox(monkeypatch):
+    def no_sandbox(*args, **kwargs):
+        raise AssertionError("sandbox started")
+    monkeypatch.setattr("backend.engine.repair_loop.execute_code", no_sandbox)
+
+    for code, error_type in [("syntax error !@#", "SyntaxError"),
+                             ("def f():\n  pass\n    return 1", "IndentationError"),
+                             ("print(1)\nreturn 2", "SyntaxError"),
+                             ("import os\nprint(os.getcwd())", "ValidationError")]:
+        result = repair_code(code, max_iterations=2)
+        first = result.iterations[0]
+        assert first.stage == "preflight"
+        assert first.execution.termination == "preflight"
+        assert first.execution.error.startswith(error_type)
+        assert not result.repaired
+
+def test_code_passing_preflight_runs_in_the_sandbox():
+    result = repair_code("print(x)", max_iterations=3)
+    assert all(iteration.stage == "sandbox" for iteration in result.iterations)
+
+def test_hanging_loop_is_repaired_with_a_shorter_timeout():
+    code = "i = 0\nwhile i < 3:\n    print(i)\nprint('done')"
+    result = repair_code(code, max_iterations=3, timeout=2)
+    assert result.repaired
+    assert [iteration.timeout for iteration in result.iterations] == [2, 1]
+    assert "    i += 1" in result.final_code.split('\n')
+
+def test_iterations_are_diffs_that_rebuild_each_version():
+    code = "total = 0\nfor i in range(3):\n    total += i\nprint(total / 0)\nprint(missing)"
+    result = repair_code(code, max_iterations=5, max_candidates=1)
+    snapshots = repair_code(code, max_iterations=5, max_candidates=1, snapshots=True)
+    assert result.original_code == code and result.iterations[0].diff == ""
+    assert all(it.code is None and (it.patch is None or it.patch.fixed_code is None) for it in result.iterations)
+
+    rebuilt = code
+    for compact, full in zip(result.iterations, snapshots.iterations):
+        rebuilt = apply_diff(rebuilt, compact.diff)
+        assert rebuilt == full.code
+    assert apply_diff(rebuilt, result.iterations[-1].patch.patch if result.iterations[-1].patch else "") \
+        == result.final_code
+
+def test_max_candidates_defaults_to_the_setting_and_is_bounded():
+    assert RepairRequest(code="print(1)").max_candidates == SPECULATIVE_CANDIDATES
+    for value in (0, MAX_SPECULATIVE_CANDIDATES + 1):
+        with pytest.raises(ValidationError):
+            RepairRequest(code="print(1)", max_candidates=value)
+
+def test_queued_candidates_are_dropped_once_one_wins(monkeypatch):
+    monkeypatch.setattr(repair_loop, "_candidate_executor", ThreadPoolExecutor(max_workers=1))
+    # Code no other test repairs, so the fix isn't replayed from the patch memo
+    result = repair_code("count = 5\nprint(cont * 2)", max_iterations=3, max_candidates=3)
+    first, *rest = result.iterations[0].candidates
+    assert first.accepted and first.status == "success"
+    assert rest and all(candidate.status == "cancelled" for candidate in rest)
+
+def test_single_candidate_tries_the_fix_a_race_ranks_first():
+    result = repair_code("limit = 5\nprint(limt - 1)", max_iterations=3, max_candidates=1)
+    assert result.repaired and "print(limit - 1)" in result.final_code
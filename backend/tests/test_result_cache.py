@@ -0,0 +1,53 @@
+import time
+import importlib
+from backend.core import limitations, result_cache
+from backend.core.result_cache import ResultCache, cache_key, is_cacheable
+from backend.core.sandbox import execute_code
+from backend.models.run_response import ExecutionResult
+
+def make_result(output="ok\n", status="success", exit_code=0):
+    return ExecutionResult(status=status, output=output, execution_time=0.01, exit_code=exit_code)
+
+def test_lru_eviction_and_hit_flag():
+    cache = ResultCache(max_entries=2, disk_dir=None)
+    cache.put("a", make_result())
+    cache.put("b", make_result())
+    assert cache.get("a").cached is True
+    cache.put("c", make_result())
+    assert cache.get("b") is None
+    assert cache.stats()["evictions"] == 1
+
+def test_ttl_expiry():
+    cache = ResultCache(ttl=0.05, disk_dir=None)
+    cache.put("a", make_result())
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+def test_disk_tier_survives_restart(tmp_path):
+    ResultCache(disk_dir=str(tmp_path)).put("a", make_result("from disk\n"))
+    restarted = ResultCache(disk_dir=str(tmp_path))
+    assert restarted.get("a").output == "from disk\n"
+    assert restarted.stats()["disk_hits"] == 1
+
+def test_nondeterministic_code_is_not_cacheable():
+    assert not is_cacheable("import random\nprint(random.random())", make_result())
+    assert not is_cacheable("print(1)", make_result(status="timeout", exit_code=124))
+    assert is_cacheable("print(1)", make_result())
+
+def test_execute_code_reports_cache_hits():
+    code = "print('cache me')"
+    assert cache_key(code, 5, 100) != cache_key(code, 6, 100)
+    execute_code(code, use_cache=True)
+    assert execute_code(code, use_cache=True).cached is True
+    assert execute_code(code, use_cache=False).cached is False
+
+def test_timeouts_can_be_cached_when_configured(monkeypatch):
+    monkeypatch.setenv("RECODEX_RESULT_CACHE_EXCLUDE_TIMEOUTS", "0")
+    try:
+        assert not importlib.reload(limitations).RESULT_CACHE_EXCLUDE_TIMEOUTS
+    finally:
+        monkeypatch.delenv("RECODEX_RESULT_CACHE_EXCLUDE_TIMEOUTS")
+        importlib.reload(limitations)
+    monkeypatch.setattr(result_cache, "RESULT_CACHE_EXCLUDE_TIMEOUTS", False)
+    assert is_cacheable("print(1)", make_result(status="timeout", exit_code=124))
@@ -13,3 +13,23 @@ def test_error_capture():
     result = execute_code("1/0")
     assert result.status == "error"
     assert "ZeroDivisionError" in (result.error or "")
+
+def test_profile_reports_user_functions_only():
+    code = "def square(n):\n    return n * n\nprint(sum(square(i) for i in range(1000)))"
+    result = execute_code(code, profile=True)
+    assert result.status == "success"
+    functions = {entry.function: entry for entry in result.profile}
+    assert functions["square"].calls == 1000
+    assert functions["square"].line == 1
+    assert "sum" not in functions
+
+def test_profile_is_off_by_default():
+    assert execute_code("print(1)").profile is None
+
+def test_timeout_keeps_partial_output_and_hang_site():
+    code = "print('started', flush=True)\ni = 0\nwhile True:\n    i += 1"
+    result = execute_code(code, timeout=1, use_cache=False)
+    assert result.status == "timeout"
+    assert result.output == "started\n"
+    assert result.hang.line_number in (3, 4)
+    assert result.stack_trace.splitlines()[-1] == f"Hang: still running at line {result.hang.line_number}"
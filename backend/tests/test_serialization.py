@@ -0,0 +1,43 @@
+from fastapi.testclient import TestClient
+from backend.main import app
+from backend.utils.compression import CompressionMiddleware, negotiate
+from backend.utils.serialization import exclude_fields, field_tree, include_fields
+
+def test_field_paths_apply_to_every_list_item():
+    data = {"final_code": "x", "iterations": [{"code": "a", "execution": {"stack_trace": "t", "status": "error"}}]}
+    assert exclude_fields(data, field_tree("iterations.execution.stack_trace, iterations.code")) == \
+        {"final_code": "x", "iterations": [{"execution": {"status": "error"}}]}
+    assert include_fields(data, field_tree("iterations.execution.status,missing")) == \
+        {"iterations": [{"execution": {"status": "error"}}]}
+    assert field_tree("iterations,iterations.code") == {"iterations": {}}
+
+def test_large_responses_are_compressed_when_accepted():
+    assert negotiate("gzip;q=0, br") is None
+    assert negotiate("deflate, gzip;q=0.5") == "gzip"
+    client = TestClient(app)
+    code = "\n".join(f"value_{i} = {i}" for i in range(300)) + "\nprint(value_299)"
+    body = {"code": code, "use_cache": False}
+
+    plain = client.post("/run", json=body, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    raw = client.post("/run?fields=status,output", json=body, headers={"Accept-Encoding": "gzip"})
+    assert raw.json() == {"status": "success", "output": "299\n"}
+    assert "content-encoding" not in raw.headers  # below the threshold
+
+    compressed = client.post("/patch", json={"code": code, "error": "NameError: name 'x' is not defined",
+                                             "stack_trace": ""}, headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert int(compressed.headers["content-length"]) < len(compressed.content)
+    assert compressed.json()["fixed_code"].startswith("value_0 = 0")
+
+def test_compressible_responses_vary_and_large_ones_compress_in_a_thread():
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+        await send({"type": "http.response.body", "body": b"x" * 4096})
+
+    client = TestClient(CompressionMiddleware(app, minimum_size=1024, thread_size=2048))
+    plain = client.get("/", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers and plain.headers["vary"] == "Accept-Encoding"
+    compressed = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["content-encoding"] == "gzip" and compressed.headers["vary"] == "Accept-Encoding"
+    assert compressed.content == b"x" * 4096
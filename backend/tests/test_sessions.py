@@ -0,0 +1,76 @@
+import time
+import pytest
+from fastapi.testclient import TestClient
+from backend.core.sessions import AST_BYTES_PER_SOURCE_BYTE, SessionNotFound, SessionStore, VersionConflict
+from backend.core.validator import validate_unit
+from backend.engine.diff_apply import DiffError, make_diff
+from backend.main import app
+
+def test_diffs_must_match_the_current_version():
+    store = SessionStore()
+    session = store.create("a = 1\nprint(a)")
+    first = session.current
+    second = session.update(1, make_diff("a = 1\nprint(a)", "a = 1\nprint(a + 1)"))
+    assert second.number == 2 and second.unit.source == "a = 1\nprint(a + 1)"
+    # The untouched statement's AST is reused
+    assert second.unit.tree.body[0] is first.unit.tree.body[0]
+    with pytest.raises(VersionConflict):
+        session.update(1, make_diff("a = 1\nprint(a)", "a = 3\nprint(a)"))
+    with pytest.raises(DiffError):
+        session.update(2, make_diff("a = 1\nprint(a)", "a = 3\nprint(a)"))
+    assert session.update(2, code="a = 1\nprint(a + 1)") is second
+
+def test_validation_cache_only_holds_the_current_statements():
+    store = SessionStore()
+    session = store.create("a = 0\nprint(a)")
+    for i in range(1, 50):
+        previous = session.current.unit.source
+        session.update(i, make_diff(previous, f"a = {i}\nprint(a)"))
+        validate_unit(session.current.unit)
+    assert sorted(session.current.unit.statement_errors) == ["a = 49", "print(a)"]
+    source = "a = 49\nprint(a)"
+    assert store.stats()["bytes"] == 2 * len(source) - 1 + AST_BYTES_PER_SOURCE_BYTE * len(source)
+
+def test_parsed_sessions_are_evicted_for_their_ast():
+    code = "\n".join(f"value_{i} = {i}" for i in range(100))
+    store = SessionStore(max_bytes=20 * len(code))
+    first = store.create(code)
+    assert store.stats()["bytes"] == len(code)
+    validate_unit(first.current.unit)
+    store.updated()
+    with pytest.raises(SessionNotFound):
+        store.get(first.id)
+
+def test_sessions_expire_and_are_evicted():
+    store = SessionStore(max_entries=2, idle_ttl=0.05)
+    old, kept = store.create("x"), store.create("y")
+    store.get(old.id)
+    store.create("z")
+    with pytest.raises(SessionNotFound):
+        store.get(kept.id)
+    time.sleep(0.06)
+    with pytest.raises(SessionNotFound):
+        store.get(old.id)
+    assert store.stats()["evictions"] == 1 and store.stats()["expired"] == 1
+
+def test_session_endpoints_run_the_uploaded_version():
+    client = TestClient(app)
+    code = "total = 0\nprint(total + 1)"
+    created = client.post("/sessions", json={"code": code}).json()
+    assert created["version"] == 1 and created["valid"]
+    session = f"/sessions/{created['session_id']}"
+
+    first = client.post(f"{session}/run", json={}).json()
+    assert first["output"] == "1\n"
+    assert client.post(f"{session}/run", json={}).json()["cached"]
+
+    fixed = code.replace("+ 1", "+ 2")
+    updated = client.post(f"{session}/versions", json={"base_version": 1, "diff": make_diff(code, fixed)})
+    assert updated.json()["version"] == 2
+    assert client.post(f"{session}/run", json={"version": 2}).json()["output"] == "2\n"
+    assert client.post(f"{session}/run", json={"version": 1}).status_code == 409
+    stale = client.post(f"{session}/versions", json={"base_version": 2, "diff": make_diff(code, fixed)})
+    assert stale.status_code == 422
+    assert client.get(session).json()["code"] == fixed
+    assert client.delete(session).status_code == 200
+    assert client.get(session).status_code == 404
@@ -0,0 +1,37 @@
+from backend.engine.static_analysis import apply_issues, find_issues
+from backend.engine.repair_loop import repair_code
+
+def test_finds_every_undefined_name():
+    code = "def show():\n    print(total)\n\nprint(width + height)\nshow()"
+    issues = find_issues(code)
+    assert [issue.type for issue in issues] == ["NameError"] * 3
+    fixed_lines, applied = apply_issues(code.split('\n'), issues)
+    assert fixed_lines[:2] == ["total = 0  # Auto-initialized", "def show():"]
+    assert "width = 0  # Auto-initialized" in fixed_lines
+    assert "height = 0  # Auto-initialized" in fixed_lines
+    assert len(applied) == 3
+
+def test_literal_errors_are_fixed_in_place():
+    code = 'data = [1, 2, 3]\nprint(data[5], "n: " + 2)\nx = 4 / 0'
+    fixed_lines, _ = apply_issues(code.split('\n'), find_issues(code))
+    assert fixed_lines[1] == 'print((data[5] if 5 < len(data) else None), "n: " + str(2))'
+    assert fixed_lines[2] == "x = 4 / 1"
+
+def test_defined_or_uncertain_code_is_left_alone():
+    code = (
+        "import math\n"
+        "data = [1]\n"
+        "data.append(2)\n"
+        "def f(n):\n"
+        "    global seen\n"
+        "    seen = n\n"
+        "    return [i for i in range(n)]\n"
+        "print(f(2), seen, data[1], '%d' % 0, math.pi, __name__)"
+    )
+    assert find_issues(code) == []
+
+def test_repair_fixes_several_errors_in_one_iteration():
+    code = "print(width)\nprint(height)\nprint(depth)\nprint('n: ' + 1)\nprint(1 / 0)"
+    result = repair_code(code, max_iterations=3)
+    assert result.repaired
+    assert result.total_iterations == 2
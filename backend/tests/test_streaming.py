@@ -0,0 +1,62 @@
+import os
+import asyncio
+import pytest
+from backend.core.admission import admission
+from backend.core.async_sandbox import stream_code
+from backend.engine.repair_loop import RepairSession
+from backend.models.repair_response import RepairRequest
+from backend.routers.repair import repair_code_stream_endpoint
+from backend.utils.serialization import ResponseFields
+
+def collect(code, timeout=5):
+    async def scenario():
+        return [event async for event in stream_code(code, timeout=timeout)]
+    return asyncio.run(scenario())
+
+def test_stream_ends_with_result():
+    events = collect("print('a')\nprint('b')")
+    kinds = [kind for kind, _ in events]
+    assert kinds[-1] == "result"
+    assert b"".join(data for kind, data in events if kind == "stdout") == b"a\nb\n"
+    assert events[-1][1].status == "success"
+
+def test_closing_stream_stops_the_run():
+    async def scenario():
+        stream = stream_code("import os, time\nprint(os.getpid(), flush=True)\nwhile True:\n    time.sleep(0.05)",
+                             timeout=10)
+        kind, pid = await stream.__anext__()
+        await stream.aclose()
+        return kind, int(pid)
+    kind, pid = asyncio.run(scenario())
+    assert kind == "stdout"
+    # Killed and reaped by the time aclose() returns
+    with pytest.raises(ProcessLookupError):
+        os.kill(pid, 0)
+
+def test_repair_stream_holds_its_slot_until_the_step_returns(monkeypatch):
+    steps_done = []
+    step = RepairSession.step
+    def recorded_step(self):
+        try:
+            return step(self)
+        finally:
+            steps_done.append(admission.stats()["in_flight"])
+    monkeypatch.setattr(RepairSession, "step", recorded_step)
+
+    async def scenario():
+        response = await repair_code_stream_endpoint(
+            RepairRequest(code="import time\ntime.sleep(5)\nprint(x)", timeout=10), shape=ResponseFields(None, None))
+
+        async def receive():
+            await asyncio.sleep(0.3)
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            pass
+
+        await response({"type": "http"}, receive, send)
+        return admission.stats()["in_flight"]
+
+    assert asyncio.run(scenario()) == 0
+    # The step was cancelled and returned while the slot was still held
+    assert steps_done == [1]
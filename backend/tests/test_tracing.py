@@ -0,0 +1,51 @@
+import glob
+from fastapi.testclient import TestClient
+from backend.benchmarks.traces import read_traces, summarize
+from backend.main import app
+from backend.utils.tracing import NO_SPAN, Trace, TraceSink, _trace, span, traced
+
+def test_spans_are_only_recorded_inside_a_trace():
+    add = traced("add")(lambda a, b: a + b)
+    assert span("idle") is NO_SPAN and add(1, 2) == 3
+    trace = Trace("req-1", "POST /test")
+    token = _trace.set(trace)
+    try:
+        with span("outer", n=1):
+            assert add(2, 3) == 5
+    finally:
+        _trace.reset(token)
+    inner, outer = trace.spans
+    assert (inner["name"], inner["parent"]) == ("add", outer["id"])
+    assert outer["attrs"] == {"n": 1} and outer["parent"] is None
+    assert trace.server_timing(0.01).startswith("add;dur=") and trace.server_timing(0.01).endswith("total;dur=10.00")
+
+def test_repair_response_has_server_timing_per_stage():
+    client = TestClient(app)
+    response = client.post("/repair", json={"code": "x = 1 / 0\nprint(x)", "max_candidates": 1},
+                           headers={"X-Request-ID": "trace-me"})
+    assert response.status_code == 200 and response.headers["x-request-id"] == "trace-me"
+    stages = {entry.split(";")[0].strip() for entry in response.headers["server-timing"].split(",")}
+    assert {"iteration", "preflight", "sandbox", "parse_error", "generate_patch", "render", "total"} <= stages
+
+def test_sampled_traces_rotate_and_aggregate(tmp_path):
+    path = str(tmp_path / "traces.jsonl")
+    sink = TraceSink(path, sample_rate=0.0, slow_ms=5, max_bytes=2000, backups=3)
+    for i in range(40):
+        trace = Trace(f"r{i}", "POST /run")
+        trace.add("sandbox", trace.start, 0.002 * i, None, {})
+        # Only the slow ones are written when nothing is sampled
+        trace.duration = 0.003 * i
+        sink.offer(trace)
+    sink.close()
+    assert sink.written == 38 and len(glob.glob(path + ".*")) == 3
+    summary = summarize(read_traces(sorted(glob.glob(path + "*"))), request="POST /run")
+    stages = summary["POST /run"]["stages"]
+    assert list(stages) == ["total", "sandbox"] and round(stages["sandbox"]["share"], 3) == 0.667
+
+def test_traces_are_named_after_the_route(monkeypatch):
+    traces = []
+    monkeypatch.setattr(TraceSink, "offer", lambda self, trace: traces.append(trace.name))
+    client = TestClient(app)
+    client.get("/sessions/abc123")
+    client.get("/no/such/page")
+    assert traces == ["GET /sessions/{session_id}", "GET /no/such/page"]
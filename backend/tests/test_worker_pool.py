@@ -0,0 +1,82 @@
+import os
+import sys
+import signal
+import socket
+import threading
+import subprocess
+from fastapi.testclient import TestClient
+from backend import main
+from backend.core import worker_pool
+from backend.core.sandbox_child import recv_message, send_message
+from backend.core.worker_pool import WorkerPool
+
+def test_worker_is_reused_between_jobs():
+    pool = WorkerPool(size=1, max_jobs=10)
+    try:
+        pool.run("print(1)", timeout=5, memory_limit_mb=100)
+        first = pool._idle[0]
+        outcome = pool.run("print(2)", timeout=5, memory_limit_mb=100)
+        assert outcome.stdout.strip() == "2"
+        assert pool._idle[0] is first
+    finally:
+        pool.shutdown()
+
+def test_jobs_do_not_share_state():
+    pool = WorkerPool(size=1, max_jobs=10)
+    try:
+        pool.run("import math; math.pi = 3", timeout=5, memory_limit_mb=100)
+        outcome = pool.run("import math; print(math.pi)", timeout=5, memory_limit_mb=100)
+        assert outcome.stdout.strip().startswith("3.14")
+    finally:
+        pool.shutdown()
+
+def test_builtins_are_stripped():
+    pool = WorkerPool(size=1, max_jobs=10)
+    try:
+        outcome = pool.run("open('x')", timeout=5, memory_limit_mb=100)
+        assert outcome.exit_code == 1
+        assert "NameError" in outcome.stderr
+    finally:
+        pool.shutdown()
+
+def test_worker_recycled_after_timeout():
+    pool = WorkerPool(size=1, max_jobs=10)
+    try:
+        pool.run("print(1)", timeout=5, memory_limit_mb=100)
+        first = pool._idle[0]
+        outcome = pool.run("while True: pass", timeout=1, memory_limit_mb=100)
+        assert outcome.timed_out
+        assert pool._idle[0] is not first
+    finally:
+        pool.shutdown()
+
+def test_app_lifespan_starts_and_stops_the_pool(monkeypatch):
+    monkeypatch.setattr(main, "SANDBOX_POOL_ENABLED", True)
+    with TestClient(main.app) as client:
+        assert client.get("/health").status_code == 200
+        assert worker_pool._pool is not None
+    assert worker_pool._pool is None
+
+def test_killed_run_whose_worker_goes_silent_is_a_timeout(monkeypatch):
+    monkeypatch.setattr(worker_pool, "FINISH_TIMEOUT", 0.2)
+    monkeypatch.setattr(worker_pool, "HANG_REPORT_MARGIN", 0)
+    victim = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"], start_new_session=True)
+    ours, zygote = socket.socketpair()
+    held = []
+
+    def silent_zygote():
+        # Reports the run's pid, then never says it finished
+        _, fds = recv_message(zygote)
+        held.extend(fds)
+        send_message(zygote, {"pid": victim.pid})
+
+    threading.Thread(target=silent_zygote, daemon=True).start()
+    try:
+        outcome = worker_pool.dispatch_job(ours, {"code": "", "memory_limit_mb": 100}, timeout=0.3)
+    finally:
+        for fd in held:
+            os.close(fd)
+        ours.close()
+        zygote.close()
+    assert outcome.timed_out and outcome.worker_lost and outcome.limit_violation
+    assert victim.wait(5) == -signal.SIGKILL
@@ -0,0 +1,110 @@
+import gzip
+from typing import Optional
+
+import anyio.to_thread
+from starlette.datastructures import Headers, MutableHeaders
+
+from backend.core.limitations import COMPRESSION_MIN_BYTES, COMPRESSION_THREAD_MIN_BYTES, GZIP_LEVEL, ZSTD_LEVEL
+from backend.utils.tracing import span
+
+try:
+    import zstandard
+except ImportError:  # optional: without it only gzip is offered
+    zstandard = None
+
+
+def accepted_encodings(header: str) -> dict:
+    """``Accept-Encoding`` as ``{coding: q}``."""
+    accepted = {}
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def negotiate(header: str) -> Optional[str]:
+    """The encoding to use for a client sending ``header``: zstd if possible, then gzip, else None."""
+    accepted = accepted_encodings(header)
+    wildcard = accepted.get("*", 0.0)
+    for coding in ("zstd", "gzip"):
+        if coding == "zstd" and zstandard is None:
+            continue
+        if accepted.get(coding, wildcard) > 0:
+            return coding
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing responses sent as a single body of at least
+    ``minimum_size`` bytes, with the encoding negotiated from Accept-Encoding.
+    Every such response gets ``Vary: Accept-Encoding``, compressed or not.
+    Bodies of ``thread_size`` bytes and more are compressed in a worker
+    thread, so a large batch response doesn't stall the event loop.
+    Streamed responses (SSE, NDJSON, files) pass through untouched, so events
+    are never held back in a compressor's buffer.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_BYTES,
+                 thread_size: int = COMPRESSION_THREAD_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.thread_size = thread_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        start = None
+
+        async def send_compressed(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message  # held until we know whether the body is compressed
+                return
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            headers = MutableHeaders(scope=start)
+            if message.get("more_body", False) or len(body) < self.minimum_size or "content-encoding" in headers:
+                await send(start)
+                start = None
+                await send(message)
+                return
+
+            # Another client's Accept-Encoding may get this response compressed
+            headers.add_vary_header("Accept-Encoding")
+            if encoding is not None:
+                with span("compress", encoding=encoding, thread=len(body) >= self.thread_size):
+                    if len(body) >= self.thread_size:
+                        compressed = await anyio.to_thread.run_sync(compress, body, encoding)
+                    else:
+                        compressed = compress(body, encoding)
+                if len(compressed) < len(body):
+                    headers["Content-Encoding"] = encoding
+                    headers["Content-Length"] = str(len(compressed))
+                    body = compressed
+            await send(start)
+            start = None
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
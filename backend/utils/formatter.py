@@ -10,3 +10,7 @@ def format_execution_result(result: ExecutionResult) -> str:
     if result.error:
         output += f"Error:\n{result.error}\n"
     return output
+
+def format_sse(event: str, data: str) -> str:
+    """Format one Server-Sent Events message. ``data`` must not contain newlines (send JSON)."""
+    return f"event: {event}\ndata: {data}\n\n"
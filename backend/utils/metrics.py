@@ -0,0 +1,178 @@
+import threading
+import time
+from typing import Callable, Dict, List, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SPAWN_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+MEMORY_BUCKETS = tuple(mb * 1024 * 1024 for mb in (8, 16, 32, 64, 128, 256, 512))
+ITERATION_BUCKETS = (1, 2, 3, 4, 5, 7, 10)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(key: LabelKey, extra: Sequence[Tuple[str, str]] = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in pairs) + "}"
+
+
+def format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}", *self.samples()]
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str):
+        super().__init__(name, help)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(tuple(sorted(labels.items())), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{format_labels(key)} {format_value(value)}" for key, value in values]
+
+
+class Gauge(Metric):
+    """A value read from ``func`` at scrape time."""
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, func: Callable[[], float]):
+        super().__init__(name, help)
+        self.func = func
+
+    def samples(self) -> List[str]:
+        return [f"{self.name} {format_value(self.func())}"]
+
+
+class LabeledGauge(Metric):
+    """Values per label set, read from ``func`` at scrape time as ``[(labels, value), ...]``."""
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, func: Callable[[], List[Tuple[Dict[str, str], float]]]):
+        super().__init__(name, help)
+        self.func = func
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{format_labels(tuple(sorted(labels.items())))} {format_value(value)}"
+                for labels, value in self.func()]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: (count per bucket, sum, count)
+        self._series: Dict[LabelKey, Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counts, total, count = self._series.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._series[key] = (counts, total + value, count + 1)
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            series = self._series.get(tuple(sorted(labels.items())))
+        return series[2] if series else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            series = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items())
+        lines = []
+        for key, (counts, total, count) in series:
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{format_labels(key, [('le', format_value(bound))])} {bucket_count}")
+            lines.append(f"{self.name}_bucket{format_labels(key, [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{format_labels(key)} {format_value(total)}")
+            lines.append(f"{self.name}_count{format_labels(key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            # Re-registering (e.g. on module reload) keeps the existing series
+            return self._metrics.setdefault(metric.name, metric)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+registry = Registry()
+
+REQUEST_LATENCY = registry.register(Histogram(
+    "recodex_request_duration_seconds", "End-to-end request latency by endpoint."))
+SANDBOX_SPAWN = registry.register(Histogram(
+    "recodex_sandbox_spawn_seconds", "Time from dispatching a job until the sandbox child runs.", SPAWN_BUCKETS))
+SANDBOX_EXECUTIONS = registry.register(Counter(
+    "recodex_sandbox_executions_total", "Sandbox executions by termination reason."))
+SANDBOX_CPU = registry.register(Counter(
+    "recodex_sandbox_cpu_seconds_total", "CPU time used by sandboxed code, by mode (user/system)."))
+SANDBOX_MAX_RSS = registry.register(Histogram(
+    "recodex_sandbox_max_rss_bytes", "Peak resident memory of sandboxed processes.", MEMORY_BUCKETS))
+REPAIR_ITERATIONS = registry.register(Histogram(
+    "recodex_repair_iterations", "Iterations used per repair.", ITERATION_BUCKETS))
+
+
+class RequestTimingMiddleware:
+    """
+    ASGI middleware recording the latency of the given endpoints until their
+    response is fully sent (including streamed bodies). A plain ASGI wrapper
+    rather than BaseHTTPMiddleware, so client disconnects still reach the
+    streaming endpoints.
+    """
+
+    def __init__(self, app, endpoints: Sequence[str]):
+        self.app = app
+        self.endpoints = set(endpoints)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.endpoints:
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            REQUEST_LATENCY.observe(time.perf_counter() - start, endpoint=scope["path"])
@@ -0,0 +1,108 @@
+import json
+from typing import Any, Dict, Optional, Union
+
+from fastapi import Query
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import BaseModel
+
+from backend.utils.tracing import span
+
+try:
+    import orjson
+except ImportError:  # optional: the standard library encoder is used instead
+    orjson = None
+
+
+class FastJSONResponse(ORJSONResponse if orjson is not None else JSONResponse):
+    """The app's default response class: orjson when installed, timed as the ``render`` stage."""
+
+    def render(self, content: Any) -> bytes:
+        with span("render"):
+            return super().render(content)
+
+# {field: subtree}; an empty subtree selects the whole field
+FieldTree = Dict[str, "FieldTree"]
+
+
+def field_tree(paths: Optional[str]) -> FieldTree:
+    """Comma-separated dotted paths (``iterations.execution.stack_trace,final_code``) as a tree."""
+    tree: FieldTree = {}
+    for path in (paths or "").split(","):
+        parts = [part for part in path.strip().split(".") if part]
+        node = tree
+        for i, part in enumerate(parts):
+            if i == len(parts) - 1:
+                node[part] = {}
+            elif part in node and not node[part]:
+                break  # a shorter path already selects all of it
+            else:
+                node = node.setdefault(part, {})
+    return tree
+
+
+def include_fields(data: Any, tree: FieldTree) -> Any:
+    """``data`` reduced to the fields in ``tree``; lists are filtered item by item."""
+    if isinstance(data, list):
+        return [include_fields(item, tree) for item in data]
+    if not isinstance(data, dict):
+        return data
+    return {key: include_fields(data[key], subtree) if subtree else data[key]
+            for key, subtree in tree.items() if key in data}
+
+
+def exclude_fields(data: Any, tree: FieldTree) -> Any:
+    """``data`` without the fields in ``tree``; lists are filtered item by item."""
+    if isinstance(data, list):
+        return [exclude_fields(item, tree) for item in data]
+    if not isinstance(data, dict):
+        return data
+    return {key: exclude_fields(value, tree[key]) if tree.get(key) else value
+            for key, value in data.items() if key not in tree or tree[key]}
+
+
+class ResponseFields:
+    """
+    ``fields`` / ``exclude`` query parameters selecting which parts of a JSON
+    response are sent, as comma-separated dotted paths. A path through a list
+    applies to each of its items, so ``exclude=iterations.execution.stack_trace``
+    drops the stack trace of every iteration. Unknown fields are ignored.
+    """
+
+    def __init__(
+        self,
+        fields: Optional[str] = Query(None, description="Comma-separated dotted paths to keep"),
+        exclude: Optional[str] = Query(None, description="Comma-separated dotted paths to drop"),
+    ):
+        self.fields = field_tree(fields)
+        self.exclude = field_tree(exclude)
+
+    def __bool__(self) -> bool:
+        return bool(self.fields or self.exclude)
+
+    def apply(self, data: Any) -> Any:
+        if self.fields:
+            data = include_fields(data, self.fields)
+        if self.exclude:
+            data = exclude_fields(data, self.exclude)
+        return data
+
+
+def shaped_json(model: BaseModel, shape: ResponseFields) -> str:
+    """``model`` as a JSON string, trimmed by ``shape``, e.g. for one NDJSON line or SSE event."""
+    if not shape:
+        return model.model_dump_json()
+    data = shape.apply(model.model_dump(mode="json"))
+    if orjson is not None:
+        return orjson.dumps(data).decode()
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def shaped_response(model: BaseModel, shape: ResponseFields) -> Union[BaseModel, FastJSONResponse]:
+    """
+    ``model`` as the endpoint's response. Without field selection it is left
+    to FastAPI (serialized by pydantic-core for its response_model); with one,
+    the pruned dict is rendered directly, since it no longer matches the model.
+    """
+    if not shape:
+        return model
+    return FastJSONResponse(shape.apply(model.model_dump(mode="json")))
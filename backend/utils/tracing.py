@@ -0,0 +1,241 @@
+import json
+import time
+import uuid
+import random
+import functools
+import itertools
+import logging
+import logging.handlers
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from backend.core.limitations import (
+    TRACE_BACKUPS,
+    TRACE_MAX_BYTES,
+    TRACE_PATH,
+    TRACE_SAMPLE_RATE,
+    TRACE_SLOW_MS,
+    TRACING_ENABLED,
+)
+
+# The trace of the request being handled, and the span code runs in. Context
+# variables follow the request into run_blocking and the repair candidate threads.
+_trace: ContextVar[Optional["Trace"]] = ContextVar("recodex_trace", default=None)
+_parent: ContextVar[Optional[int]] = ContextVar("recodex_span", default=None)
+
+
+class Trace:
+    """The spans of one request, with their offsets from its start in seconds."""
+
+    def __init__(self, request_id: str, name: str):
+        self.request_id = request_id
+        self.name = name
+        self.timestamp = time.time()
+        self.start = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.status: Optional[int] = None
+        self.spans: List[dict] = []
+        self._ids = itertools.count()
+
+    def add(self, name: str, start: float, duration: float, parent: Optional[int], attrs: dict,
+            span_id: Optional[int] = None) -> None:
+        # list.append is atomic, so threads of the same request can add spans
+        self.spans.append({
+            "id": next(self._ids) if span_id is None else span_id,
+            "parent": parent,
+            "name": name,
+            "start": start - self.start,
+            "duration": duration,
+            **({"attrs": attrs} if attrs else {}),
+        })
+
+    def totals(self) -> Dict[str, dict]:
+        """Time and count per span name, in the order the names first finished."""
+        totals: Dict[str, dict] = {}
+        for span in self.spans:
+            total = totals.setdefault(span["name"], {"duration": 0.0, "count": 0})
+            total["duration"] += span["duration"]
+            total["count"] += 1
+        return totals
+
+    def server_timing(self, total: float) -> str:
+        entries = [
+            f'{name};dur={stage["duration"] * 1000:.2f}' + (f';desc="x{stage["count"]}"' if stage["count"] > 1 else "")
+            for name, stage in self.totals().items()
+        ]
+        entries.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(entries)
+
+    def to_dict(self) -> dict:
+        return {
+            "request_id": self.request_id,
+            "name": self.name,
+            "timestamp": self.timestamp,
+            "duration": self.duration,
+            "status": self.status,
+            "spans": self.spans,
+        }
+
+
+class Span:
+    __slots__ = ("trace", "name", "attrs", "id", "parent", "start", "_token")
+
+    def __init__(self, trace: Trace, name: str, attrs: dict):
+        self.trace = trace
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def __enter__(self) -> "Span":
+        self.id = next(self.trace._ids)
+        self.parent = _parent.get()
+        self._token = _parent.set(self.id)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        duration = time.perf_counter() - self.start
+        _parent.reset(self._token)
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.trace.add(self.name, self.start, duration, self.parent, self.attrs, span_id=self.id)
+        return False
+
+
+class _NoSpan:
+    """What ``span`` returns outside a traced request: does nothing."""
+
+    def set(self, **attrs) -> None:
+        pass
+
+    def __enter__(self) -> "_NoSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+NO_SPAN = _NoSpan()
+
+
+def span(name: str, **attrs):
+    """
+    Time a stage of the current request: ``with span("parse_error"): ...``.
+    Outside a traced request (tracing off, or code not run for a request)
+    this is a context variable lookup.
+    """
+    trace = _trace.get()
+    if trace is None:
+        return NO_SPAN
+    return Span(trace, name, attrs)
+
+
+def record(name: str, duration: float, **attrs) -> None:
+    """Add a span that just ended and was timed elsewhere (e.g. in the sandbox child)."""
+    trace = _trace.get()
+    if trace is not None:
+        trace.add(name, time.perf_counter() - duration, duration, _parent.get(), attrs)
+
+
+def traced(name: str):
+    """Decorator running the function in a span named ``name``."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _trace.get() is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_request_id() -> Optional[str]:
+    trace = _trace.get()
+    return trace.request_id if trace is not None else None
+
+
+class TraceSink:
+    """
+    Writes sampled traces as JSON lines to ``path``, rotated at ``max_bytes``
+    with ``backups`` old files kept. Requests slower than ``slow_ms`` are
+    always written.
+    """
+
+    def __init__(self, path: Optional[str] = TRACE_PATH, sample_rate: float = TRACE_SAMPLE_RATE,
+                 slow_ms: float = TRACE_SLOW_MS, max_bytes: int = TRACE_MAX_BYTES, backups: int = TRACE_BACKUPS):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.written = 0
+        self._logger = None
+        if path:
+            handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self._logger = logging.getLogger(f"ReCodeX.traces.{path}")
+            self._logger.propagate = False
+            self._logger.setLevel(logging.INFO)
+            self._logger.addHandler(handler)
+
+    def sampled(self, trace: Trace) -> bool:
+        if self._logger is None:
+            return False
+        return trace.duration * 1000 >= self.slow_ms or random.random() < self.sample_rate
+
+    def offer(self, trace: Trace) -> None:
+        if self.sampled(trace):
+            self._logger.info(json.dumps(trace.to_dict(), separators=(",", ":")))
+            self.written += 1
+
+    def close(self) -> None:
+        if self._logger is not None:
+            for handler in self._logger.handlers[:]:
+                handler.close()
+                self._logger.removeHandler(handler)
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware tracing every HTTP request. The request id comes from
+    ``X-Request-ID`` (or is generated) and is echoed back; the response gets
+    a ``Server-Timing`` header with the time per stage so far, so for a
+    streamed response it only covers the stages before the first byte.
+    Traces are named after the matched route (``GET /sessions/{session_id}``), or
+    the raw path if none matched. Finished traces go to the sink.
+    """
+
+    def __init__(self, app, enabled: bool = TRACING_ENABLED, sink: Optional[TraceSink] = None):
+        self.app = app
+        self.enabled = enabled
+        self.sink = sink if sink is not None else TraceSink()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+        request_id = Headers(scope=scope).get("x-request-id") or uuid.uuid4().hex
+        trace = Trace(request_id, f'{scope["method"]} {scope["path"]}')
+
+        async def send_traced(message):
+            if message["type"] == "http.response.start":
+                trace.status = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", trace.server_timing(time.perf_counter() - trace.start))
+                headers.append("X-Request-ID", request_id)
+            await send(message)
+
+        token = _trace.set(trace)
+        try:
+            await self.app(scope, receive, send_traced)
+        finally:
+            _trace.reset(token)
+            trace.duration = time.perf_counter() - trace.start
+            # The router records the route it matched in the (shared) scope
+            route = scope.get("route")
+            if route is not None:
+                trace.name = f'{scope["method"]} {getattr(route, "path", scope["path"])}'
+            self.sink.offer(trace)